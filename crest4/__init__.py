@@ -18,4 +18,12 @@ project_url = 'https://github.com/xapple/crest4'
 
 # Expose our main object at the module level
 # So that you can just do `from crest4 import Classify` later
-from .classify import Classify
+# It is only imported when first accessed so that `import crest4` stays fast
+def __getattr__(name):
+    if name == 'Classify':
+        from .classify import Classify
+        return Classify
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(list(globals()) + ['Classify'])
@@ -7,6 +7,9 @@ GNUv3 Licensed.
 Contact at www.sinclair.bio
 """
 
+# Built-in modules #
+import sys
+
 # Use the optmagic library to make a command line tool automatically #
 from optmagic import OptMagic
 
@@ -15,8 +18,68 @@ from crest4 import Classify
 
 # The main function to run when we are called #
 def main():
+    # Check for a sub-command as the first argument #
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'serve':      return serve()
+    if command == 'submit':     return submit()
+    if command == 'prepare-db': return prepare_db()
+    if command == 'cache':      return cache()
+    if command == 'samples':    return samples()
+    # Otherwise, classify directly #
+    magic = OptMagic(Classify)
+    return magic()
+
+def serve():
+    """Start a server that keeps databases loaded (see `crest4.server`)."""
+    from crest4.server import Server
+    del sys.argv[1]
+    magic = OptMagic(Server)
+    magic.prog_string = 'crest4 serve'
+    return magic()
+
+def submit():
+    """Send a job to a running server, with the same options as `crest4`."""
+    from crest4.server import submit
+    del sys.argv[1]
     magic = OptMagic(Classify)
+    magic.prog_string = 'crest4 submit'
+    # No short flag, since all the letters might be used by `Classify` #
+    magic.parser.add_argument('--socket_path', default=None,
+                              help="The path of the Unix socket on which the"
+                                   " server is listening.")
+    return submit(**magic.kwargs)
+
+def samples():
+    """Classify many FASTA files with a single search (`crest4.samples`)."""
+    from crest4.samples import classify_samples
+    del sys.argv[1]
+    magic = OptMagic(Classify)
+    magic.prog_string = 'crest4 samples'
+    magic.parser.add_argument('--num_workers', '-j', default=None,
+                              help="The number of processes used to write"
+                                   " the outputs of the samples. By default,"
+                                   " the number of CPUs.")
+    return classify_samples(**magic.kwargs)
+
+def prepare_db():
+    """Build the indexes and caches of databases ahead of time."""
+    from crest4.prepare import prepare_db
+    del sys.argv[1]
+    magic = OptMagic(prepare_db)
+    magic.prog_string = 'crest4 prepare-db'
+    return magic()
+
+def cache():
+    """Inspect or shrink the cache of search results (`crest4.hit_cache`)."""
+    from crest4.hit_cache import cache_stats, cache_prune
+    actions = {'stats': cache_stats, 'prune': cache_prune}
+    action  = sys.argv[2] if len(sys.argv) > 2 else None
+    if action not in actions:
+        sys.exit("usage: crest4 cache {stats,prune} [--help] [options]")
+    del sys.argv[1:3]
+    magic = OptMagic(actions[action])
+    magic.prog_string = 'crest4 cache ' + action
     return magic()
 
 # Execute when run, not when imported #
-if __name__ == "__main__": main()
\ No newline at end of file
+if __name__ == "__main__": main()
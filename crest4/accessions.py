@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import array, hashlib
+
+###############################################################################
+def hash_accession(accession):
+    """
+    Return two 64-bit integers computed from a 128-bit hash of an accession
+    string. The first is used as the sorting key and the second to tell
+    apart the extremely rare accessions that share the same key.
+    """
+    digest = hashlib.blake2b(accession.encode(), digest_size=16).digest()
+    return (int.from_bytes(digest[:8], 'little'),
+            int.from_bytes(digest[8:], 'little'))
+
+def build_accession_index(path, node_index):
+    """
+    Parse a `.map` file line by line and return a dictionary of NumPy arrays
+    sorted by accession hash, giving the index of the corresponding node in
+    the compiled tree for every accession. Nodes that are not present in the
+    tree get the value `-1`. The `node_index` argument is a dictionary
+    linking node names to node indices.
+
+    The accession strings themselves are not stored. Compact arrays are used
+    while parsing so that even very large `.map` files can be processed.
+    """
+    import numpy
+    # Initialize #
+    keys, checks, nodes = array.array('Q'), array.array('Q'), array.array('i')
+    # Parse the file #
+    with open(path, 'rt') as handle:
+        for line in handle:
+            if line.startswith('#') or not line.strip(): continue
+            num, name = line.strip().split(',')
+            key, check = hash_accession(name)
+            keys.append(key)
+            checks.append(check)
+            nodes.append(node_index.get(num, -1))
+    # Convert to arrays #
+    keys   = numpy.frombuffer(keys,   dtype=numpy.uint64)
+    checks = numpy.frombuffer(checks, dtype=numpy.uint64)
+    nodes  = numpy.frombuffer(nodes,  dtype=numpy.int32)
+    # Sort by hash while keeping the order of the file for equal hashes #
+    order = numpy.lexsort((numpy.arange(len(keys)), checks, keys))
+    keys, checks, nodes = keys[order], checks[order], nodes[order]
+    # If an accession appears several times, the last line wins #
+    if len(keys):
+        last = numpy.ones(len(keys), dtype=bool)
+        last[:-1] = (keys[1:] != keys[:-1]) | (checks[1:] != checks[:-1])
+        keys, checks, nodes = keys[last], checks[last], nodes[last]
+    # Return #
+    return {'keys': keys, 'checks': checks, 'nodes': nodes}
+
+###############################################################################
+class AccessionIndex:
+    """
+    A compact replacement for the `acc_to_node` dictionary of a database.
+    Instead of holding every accession string in memory, it only holds two
+    sorted arrays of 64-bit hashes along with the node indices, typically
+    memory-mapped from a cache file next to the `.map` file. Lookups are done
+    by bisection, so that the memory used stays flat no matter how large
+    the database is.
+    """
+
+    def __init__(self, arrays):
+        # The arrays, typically memory-mapped from a cache file #
+        self.arrays = arrays
+        self.keys   = arrays['keys']
+        self.checks = arrays['checks']
+        self.nodes  = arrays['nodes']
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object with %i accessions>"
+        return msg % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, accession):
+        return self.get(accession) is not None
+
+    def get(self, accession, default=None):
+        """
+        Return the index of the node in the compiled tree for the given
+        accession. If the accession is unknown, return `default` instead.
+        If the accession is known but its node is not in the tree, `-1` is
+        returned.
+        """
+        import numpy
+        key, check = hash_accession(accession)
+        key = numpy.uint64(key)
+        pos = int(numpy.searchsorted(self.keys, key))
+        # Several accessions could share the same key in theory #
+        while pos < len(self.keys) and self.keys[pos] == key:
+            if self.checks[pos] == check: return int(self.nodes[pos])
+            pos += 1
+        # Not found #
+        return default
+
+    def get_many(self, accessions, default=-1):
+        """
+        Same as the `get` method above, but for a whole list of accessions
+        at once, returning a NumPy array of node indices. Only the hashing
+        of the strings is done one by one, the search is done in bulk.
+        """
+        import numpy
+        result = numpy.full(len(accessions), default, dtype=numpy.int64)
+        if not len(self.keys) or not len(accessions): return result
+        # Hash every accession #
+        hashes = numpy.array([hash_accession(a) for a in accessions],
+                             dtype=numpy.uint64)
+        keys, checks = hashes[:, 0], hashes[:, 1]
+        # Find them all by bisection #
+        pos   = numpy.searchsorted(self.keys, keys)
+        pos   = numpy.minimum(pos, len(self.keys) - 1)
+        same  = self.keys[pos] == keys
+        found = same & (self.checks[pos] == checks)
+        result[found] = self.nodes[pos[found]]
+        # Several accessions could share the same key in theory #
+        for i in numpy.flatnonzero(same & ~found):
+            result[i] = self.get(accessions[i], default)
+        # Return #
+        return result
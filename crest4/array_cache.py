@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, json, struct
+
+# First party modules #
+from autopaths.file_path import FilePath
+
+###############################################################################
+class ArrayCache:
+    """
+    A single binary file holding several named NumPy arrays that were
+    computed from one or more text files of a database (e.g. the `.tre` file).
+
+    The file is written next to the database the first time it is needed.
+    On every later load, the arrays are simply memory-mapped instead of being
+    recomputed, which means that only the pages actually accessed are read
+    from disk, and that several processes share the same physical memory.
+
+    The cache is automatically invalidated when any of the source files
+    changes size or modification time, or when the `version` is incremented.
+
+    The layout of the file is the following:
+
+        * 8 bytes of magic string.
+        * 8 bytes giving the length of the header as a little-endian integer.
+        * A JSON header describing the sources and every array stored.
+        * The raw data of every array, each aligned on 64 bytes.
+    """
+
+    # The first bytes of every cache file #
+    magic = b'CREST4AC'
+
+    # Arrays are aligned in the file so that memory-mapping them is cheap #
+    alignment = 64
+
+    def __init__(self, path, sources, version=1):
+        # Where the cache file will be written #
+        self.path = FilePath(path)
+        # The text files that the arrays are computed from #
+        self.sources = [FilePath(source) for source in sources]
+        # Increment this when the content of the arrays changes #
+        self.version = version
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.path)
+
+    #------------------------------ Properties -------------------------------#
+    @property
+    def signature(self):
+        """
+        The size and modification time of every source file. If any of these
+        values differ from the ones stored in the header, the cache is stale.
+        """
+        result = {}
+        for source in self.sources:
+            stat = os.stat(source)
+            result[source.name] = [stat.st_size, stat.st_mtime_ns]
+        return result
+
+    @property
+    def header(self):
+        """
+        Read and return the JSON header of the cache file as a dictionary.
+        Returns `None` if the file doesn't exist or is not a valid cache.
+        """
+        try:
+            with open(self.path, 'rb') as handle:
+                if handle.read(8) != self.magic: return None
+                length, = struct.unpack('<Q', handle.read(8))
+                return json.loads(handle.read(length))
+        except (OSError, ValueError, struct.error):
+            return None
+
+    @property
+    def valid(self):
+        """Is there an up-to-date cache file on disk?"""
+        header = self.header
+        if header is None: return False
+        if header.get('version') != self.version: return False
+        return header.get('sources') == self.signature
+
+    #------------------------------- Methods ---------------------------------#
+    def load(self):
+        """
+        Memory-map every array of the cache file in read-only mode and return
+        them in a dictionary.
+        """
+        import numpy
+        result = {}
+        for name, info in self.header['arrays'].items():
+            dtype = numpy.dtype(info['dtype'])
+            shape = tuple(info['shape'])
+            # Zero-sized arrays cannot be memory-mapped #
+            if 0 in shape:
+                result[name] = numpy.zeros(shape, dtype=dtype)
+                continue
+            result[name] = numpy.memmap(str(self.path), mode='r',
+                                        dtype=dtype, shape=shape,
+                                        offset=info['offset'])
+        return result
+
+    def save(self, arrays):
+        """
+        Write the given dictionary of arrays to disk. The file is first written
+        to a temporary path and then atomically renamed, so that another
+        process never sees a partially written cache.
+        """
+        import numpy
+        # Compute the signature before writing, in case a source changes #
+        signature = self.signature
+        # Make sure every array is contiguous #
+        arrays = {name: numpy.ascontiguousarray(array)
+                  for name, array in arrays.items()}
+        # Lay out the arrays one after the other #
+        infos, offset = {}, 0
+        for name, array in arrays.items():
+            offset = -(-offset // self.alignment) * self.alignment
+            infos[name] = {'dtype':  array.dtype.str,
+                           'shape':  list(array.shape),
+                           'offset': offset}
+            offset += array.nbytes
+        # The header length depends on the offsets and vice versa, so we
+        # reserve a fixed amount of room for the offsets to be shifted by #
+        header = {'version': self.version,
+                  'sources': signature,
+                  'arrays':  infos}
+        start = len(json.dumps(header)) + 16 + 64 * (len(infos) + 1)
+        start = -(-start // self.alignment) * self.alignment
+        for info in infos.values(): info['offset'] += start
+        encoded = json.dumps(header).encode()
+        assert len(encoded) + 16 <= start
+        # Write to a temporary file #
+        temp_path = self.path + '.%i.tmp' % os.getpid()
+        try:
+            with open(temp_path, 'wb') as handle:
+                handle.write(self.magic)
+                handle.write(struct.pack('<Q', len(encoded)))
+                handle.write(encoded)
+                for name, array in arrays.items():
+                    handle.seek(infos[name]['offset'])
+                    handle.write(array.tobytes())
+            # Rename it atomically #
+            os.replace(temp_path, self.path)
+        # Don't leave a partial file behind #
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+
+    def get(self, build):
+        """
+        Return the arrays from the cache if it is up-to-date. Otherwise call
+        the `build` function to compute them and save the result to disk for
+        the next time. If the directory is not writable, the arrays are simply
+        kept in memory. When several processes need the same cache at the
+        same time, only one of them builds it while the others wait.
+        """
+        # Easy case where the cache exists #
+        if self.valid: return self.load()
+        # Take the lock, unless the directory is not writable #
+        from crest4.locking import FileLock
+        lock = FileLock(self.path + '.lock')
+        try: lock.acquire()
+        except OSError: return build()
+        # Another process might have built it while we were waiting #
+        try:
+            if self.valid: return self.load()
+            # Compute the arrays #
+            arrays = build()
+            # Try to write them next to the sources #
+            try:
+                self.save(arrays)
+            except OSError:
+                return arrays
+            # Return the memory-mapped version #
+            return self.load()
+        finally:
+            lock.release()
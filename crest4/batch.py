@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import itertools
+
+###############################################################################
+def hit_columns(records):
+    """
+    Convert a list of `QueryHits` objects to a dictionary of NumPy columns
+    with one row per hit, plus the information needed per query:
+
+    * `query`: the index of the query that every hit belongs to.
+    * `score`: the bit-score of every hit (the identity with VSEARCH).
+    * `hit_ids`: the name of the target of every hit, as a list.
+    * `start`: the row of the first hit of every query.
+    * `count`: the number of hits of every query.
+    * `similarity`: the similarity of the first hit of every query.
+    """
+    import numpy
+    chain = itertools.chain.from_iterable
+    count = numpy.fromiter(map(len, records), dtype=numpy.int64,
+                           count=len(records))
+    start = numpy.zeros(len(records), dtype=numpy.int64)
+    numpy.cumsum(count[:-1], out=start[1:])
+    total = int(count.sum())
+    return {
+        'query':      numpy.repeat(numpy.arange(len(records)), count),
+        'score':      numpy.fromiter(chain(r.scores for r in records),
+                                     dtype=numpy.float64, count=total),
+        'hit_ids':    list(chain(r.hit_ids for r in records)),
+        'start':      start,
+        'count':      count,
+        'similarity': numpy.fromiter((r.similarity for r in records),
+                                     dtype=numpy.float64, count=len(records)),
+    }
+
+def kept_hits(columns, min_score, score_frac):
+    """
+    Return a boolean mask of the hits that are used for the assignment.
+    The best score of every query is the one of its first hit. Queries for
+    which it is under `min_score` keep nothing. Otherwise, hits are kept
+    until the first one that falls below the score-drop threshold.
+    """
+    import numpy
+    query, score = columns['query'], columns['score']
+    start, count = columns['start'], columns['count']
+    # The best score of every query that has hits #
+    top = numpy.full(len(count), -numpy.inf)
+    top[count > 0] = score[start[count > 0]]
+    threshold = top * score_frac
+    # The hits below the threshold #
+    below = score < threshold[query]
+    # The number of those seen in the same query before every hit #
+    before = numpy.cumsum(below) - below
+    before = before - before[start[query]]
+    # Return #
+    return (top >= min_score)[query] & ~below & (before == 0)
+
+def climb(tree, tables, nodes, similarity):
+    """
+    Move every node up the tree until the similarity of its query is above
+    the minimum similarity of the node, or the root is reached. This is the
+    same walk as in `Query.assigned_node`, done one level at a time for
+    all the nodes that still need to move.
+    """
+    import numpy
+    nodes = nodes.copy()
+    todo  = numpy.arange(len(nodes))
+    while len(todo):
+        current = nodes[todo]
+        # Nodes at the root stay there #
+        inner = tree.parent[current] >= 0
+        todo, current = todo[inner], current[inner]
+        # Every node must have an entry in the `.names` file #
+        unknown = numpy.flatnonzero(~tables.known[current])
+        if len(unknown): tables.check(int(current[unknown[0]]))
+        # The ones that are not similar enough go up one level #
+        move = ~(similarity[todo] > tables.smlrty[current])
+        todo = todo[move]
+        nodes[todo] = tree.parent[current[move]]
+    # Return #
+    return nodes
+
+def assign_nodes(db, records, min_score, score_frac, min_smlrty):
+    """
+    Compute the node at which every query given as a `QueryHits` object
+    is assigned, all at once, using NumPy arrays and the array-backed
+    structures of the database `db`. Returns an array of node indices with
+    `-1` for queries that are not assigned. The results are identical to
+    the ones of `Query.assigned_node` computed one query at a time.
+    """
+    import numpy
+    result  = numpy.full(len(records), -1, dtype=numpy.int64)
+    columns = hit_columns(records)
+    # Only the hits that count #
+    rows = numpy.flatnonzero(kept_hits(columns, min_score, score_frac))
+    if not len(rows): return result
+    # Find their nodes in bulk #
+    hit_ids = columns['hit_ids']
+    nodes   = db.acc_index.get_many([hit_ids[i] for i in rows])
+    missing = numpy.flatnonzero(nodes < 0)
+    if len(missing):
+        hit_id = hit_ids[rows[missing[0]]]
+        msg = f"The search hit '{hit_id}' was not found in the tree." \
+              f" The database '{db.dir_name}' is probably corrupted."
+        raise LookupError(msg)
+    # The smallest and largest node of every query give the common ancestor #
+    query  = columns['query'][rows]
+    bounds = numpy.flatnonzero(numpy.r_[True, query[1:] != query[:-1]])
+    query  = query[bounds]
+    lowest = numpy.minimum.reduceat(nodes, bounds)
+    high   = numpy.maximum.reduceat(nodes, bounds)
+    nodes  = db.lca.pairs(lowest, high)
+    # Go up the tree until the similarity is high enough #
+    if min_smlrty:
+        similarity = columns['similarity'][query]
+        nodes = climb(db.compiled_tree, db.node_tables, nodes, similarity)
+    # Return #
+    result[query] = nodes
+    return result
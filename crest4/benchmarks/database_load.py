@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to benchmark the time it takes to load the tree of every built-in
+database, comparing:
+
+* Parsing the `.tre` file with `ete4` (what was done before).
+* A cold load, where the compiled tree cache doesn't exist yet and is built.
+* A warm load, where the compiled tree cache is simply memory-mapped.
+
+Run it like this:
+
+    $ python -m crest4.benchmarks.database_load
+"""
+
+# Built-in modules #
+import os, sys, time
+
+# Internal modules #
+from crest4.classify import all_db_choices
+from crest4.databases import CrestDatabase
+import crest4.databases
+
+###############################################################################
+def timed(function):
+    """Call a function and return the number of seconds it took."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def fresh(db):
+    """A new database object pointing to the same files, with no caches."""
+    return CrestDatabase(name=db.dir_name, desc=db.desc, base_dir=db.base_dir)
+
+def benchmark(db):
+    """Return the three timings for a given database."""
+    # Download the database if it has not been done already #
+    if not db.downloaded: db.download()
+    # Remove any existing cache #
+    cache = db.path.replace_extension('tre') + '.cache'
+    if os.path.exists(cache): os.remove(cache)
+    # Time the three different ways of loading #
+    ete  = timed(lambda: fresh(db).tree)
+    cold = timed(lambda: fresh(db).compiled_tree)
+    warm = timed(lambda: fresh(db).compiled_tree)
+    # Return #
+    return ete, cold, warm
+
+###############################################################################
+if __name__ == '__main__':
+    # Optionally, restrict to the databases given on the command line #
+    names = sys.argv[1:] or all_db_choices
+    # Print a header #
+    row = "%-16s %12s %12s %12s"
+    print(row % ('Database', 'ete4 (s)', 'Cold (s)', 'Warm (s)'))
+    # Iterate over databases #
+    for name in names:
+        timings = benchmark(getattr(crest4.databases, name))
+        print(row % (name, *('%.4f' % t for t in timings)))
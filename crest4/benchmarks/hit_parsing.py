@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to benchmark the parsing of a large hits file in the BLAST tabular
+format with comments, keeping every query in memory like the `queries`
+property of `Classify` does. It compares:
+
+* Biopython's `SearchIO.parse` (what was done before).
+* The `parse_hits` function of `crest4.hits`.
+
+Every parser runs in a new process, so that the peak memory reported is
+its own. Run it like this, optionally with the number of hit lines:
+
+    $ python -m crest4.benchmarks.hit_parsing 10000000
+"""
+
+# Built-in modules #
+import os, sys, time, random, resource
+from concurrent.futures import ProcessPoolExecutor
+
+# Constants #
+this_dir = os.path.dirname(os.path.abspath(__file__)) + '/'
+
+###############################################################################
+def make_hits(path, count, per_query=100):
+    """
+    Write a hits file with `count` hit lines in total, and `per_query`
+    hits with decreasing scores for every query.
+    """
+    rand   = random.Random(0)
+    fields = 'query id, subject id, bit score, alignment length, identical'
+    with open(path, 'wt') as handle:
+        queries = count // per_query
+        for i in range(queries):
+            name = 'query_%i' % i
+            handle.write('# BLASTN 2.11.0+\n# Query: %s\n' % name)
+            handle.write('# Database: bench\n# Fields: %s\n' % fields)
+            handle.write('# %i hits found\n' % per_query)
+            for j in range(per_query):
+                length = rand.randint(1200, 1500)
+                handle.write('%s\tACC%08i\t%i\t%i\t%i\n' %
+                             (name, rand.randrange(10**8), 2700 - 10 * j,
+                              length, length - rand.randint(0, 50)))
+        handle.write('# BLAST processed %i queries\n' % queries)
+
+def with_searchio(path):
+    """Parse all the queries with biopython."""
+    from Bio import SearchIO
+    with open(path, 'rt') as handle:
+        return list(SearchIO.parse(handle, 'blast-tab', comments=True))
+
+def with_crest4(path):
+    """Parse all the queries with our own parser."""
+    from crest4.hits import parse_hits
+    with open(path, 'rt') as handle:
+        return list(parse_hits(handle, 'blast'))
+
+def measure(name, path):
+    """
+    Run in a new process. Return the seconds taken by the parser and the
+    growth in peak memory in megabytes.
+    """
+    parser = globals()[name]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start  = time.perf_counter()
+    result = parser(path)
+    took   = time.perf_counter() - start
+    after  = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    assert len(result) > 0
+    return took, (after - before) / 1024
+
+###############################################################################
+if __name__ == '__main__':
+    # Parse the command line #
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    # Create the input #
+    output_dir = this_dir + 'results/'
+    os.makedirs(output_dir, exist_ok=True)
+    hits_path = output_dir + 'many_hits.hits'
+    make_hits(hits_path, count)
+    # Time both parsers #
+    print("Parsing %i hit lines:" % count)
+    row = "  %-20s %10.2f s %10.0f MB"
+    for name in ('with_searchio', 'with_crest4'):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            took, memory = pool.submit(measure, name, hits_path).result()
+        print(row % (name, took, memory))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to benchmark the built-in `kmer` search (see `crest4.kmer`) with
+different values of `max_postings`, the number of sequences above which a
+word is considered too common to be indexed. For every value, it reports:
+
+* The time taken to build the index and the peak memory used to do so.
+* The number of milliseconds needed to search one query.
+* The fraction of queries whose best hit is the sequence they were made
+  from, the queries being database sequences with 1% of random changes.
+
+By default, the database is simulated so that it looks like a marker gene
+such as the 16S: sequences of 1500 bases that evolve along a tree, with
+conserved regions that change twenty times slower than the variable ones.
+Every conserved word is then found in almost every sequence, which is the
+worst case for an inverted index. Any FASTA file can be given instead:
+
+    $ python -m crest4.benchmarks.kmer_search
+    $ python -m crest4.benchmarks.kmer_search ~/.crest4/ssuome/ssuome.fasta
+"""
+
+# Built-in modules #
+import os, sys, time, random, tracemalloc
+
+# Internal modules #
+from crest4.kmer import KmerIndex, build_kmer_index
+from crest4.sharding import read_records
+from crest4.dereplicate import record_id
+
+# Constants #
+this_dir = os.path.dirname(os.path.abspath(__file__)) + '/'
+limits   = (10 ** 9, 10000, 1000)
+
+###############################################################################
+def simulate(path, branching=(10, 10, 10, 10, 5), length=1500, seed=0):
+    """
+    Write a FASTA file of sequences evolved along a tree with the given
+    number of children at every level. The default makes 50'000 sequences.
+    """
+    import numpy
+    rng = numpy.random.default_rng(seed)
+    # Nine variable regions of 80 bases, the rest is conserved #
+    rates = numpy.full(length, 0.002, dtype=numpy.float32)
+    for start in numpy.linspace(50, length - 130, 9).astype(int):
+        rates[start:start + 80] = 0.04
+    # Every level changes some bases of its parent #
+    seqs = rng.integers(0, 4, (1, length), dtype=numpy.uint8)
+    for width in branching:
+        seqs = numpy.repeat(seqs, width, axis=0)
+        hits = rng.random(seqs.shape, dtype=numpy.float32) < rates
+        shift = rng.integers(1, 4, int(hits.sum()), dtype=numpy.uint8)
+        seqs[hits] = (seqs[hits] + shift) % 4
+    # Write them #
+    letters = numpy.frombuffer(b'ACGT', dtype=numpy.uint8)
+    with open(path, 'wt') as handle:
+        for i, seq in enumerate(seqs):
+            text = letters[seq].tobytes().decode()
+            handle.write('>SEQ%08i\n%s\n' % (i, text))
+
+def make_queries(path, count=200, changes=0.01, seed=1):
+    """Pick sequences of the database and change some of their bases."""
+    rand = random.Random(seed)
+    records = [(record_id(text), ''.join(text.split('\n', 1)[1].split()))
+               for text, length in read_records(path)]
+    queries = []
+    for name, seq in rand.sample(records, min(count, len(records))):
+        seq = list(seq)
+        for i in rand.sample(range(len(seq)), int(len(seq) * changes)):
+            seq[i] = rand.choice('ACGT'.replace(seq[i], ''))
+        queries.append((name, ''.join(seq)))
+    return queries
+
+def benchmark(path, queries, limit):
+    """Return the build time, peak memory, time per query and agreement."""
+    # Build the index #
+    tracemalloc.start()
+    start  = time.perf_counter()
+    arrays = build_kmer_index(path, max_postings=limit)
+    build  = time.perf_counter() - start
+    peak   = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    # Search every query #
+    index = KmerIndex(arrays)
+    start = time.perf_counter()
+    found = [index.best_hits(seq, 0.75) for name, seq in queries]
+    search = (time.perf_counter() - start) / len(queries) * 1000
+    # Check the best hits #
+    same = sum(bool(hits) and index.name(hits[0][0]) == name
+               for (name, seq), hits in zip(queries, found))
+    # Return #
+    return build, peak, search, 100 * same / len(queries)
+
+###############################################################################
+if __name__ == '__main__':
+    # Use the FASTA file given or simulate one #
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        os.makedirs(this_dir + 'results/', exist_ok=True)
+        path = this_dir + 'results/simulated.fasta'
+        if not os.path.exists(path): simulate(path)
+    queries = make_queries(path)
+    count   = sum(1 for record in read_records(path))
+    print("%s (%i sequences, %i queries):" % (path, count, len(queries)))
+    # Every limit #
+    header = "  %-14s %10s %10s %10s %10s"
+    row    = "  %-14s %10.1f %10.0f %10.2f %9.1f%%"
+    print(header % ('max_postings', 'build (s)', 'peak (MB)', 'ms/query',
+                    'same best'))
+    for limit in limits:
+        name = 'unlimited' if limit == limits[0] else str(limit)
+        print(row % (name, *benchmark(path, queries, limit)))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to benchmark the search profiles (see `Classify.search_profile`) on
+the FASTA files that come with the tests. For every search algorithm that
+is installed and every profile, it reports:
+
+* The time taken by the search and the number of sequences searched per
+  second, with every result computed from scratch.
+* The fraction of sequences that receive exactly the same assignment as
+  with the `balanced` profile, which keeps the defaults of the programs.
+
+Run it like this, optionally with a database name and a number of threads:
+
+    $ python -m crest4.benchmarks.search_profiles ssuome 8
+"""
+
+# Built-in modules #
+import os, sys, time, shutil
+
+# Internal modules #
+from crest4 import Classify
+from crest4.classify import search_profiles
+
+# Constants #
+this_dir  = os.path.dirname(os.path.abspath(__file__)) + '/'
+tests_dir = os.path.dirname(this_dir.rstrip('/')) + '/tests/'
+datasets  = ('gio_hundred_seqs/gio.fasta',
+             'hmp_mock_dataset/hmp_mock_v35.fasta',
+             'long_otus_confident/consensus.fasta')
+
+###############################################################################
+def classify(fasta, algo, profile, db, threads, output_dir):
+    """Run the whole classification and return the time the search took."""
+    c = Classify(fasta          = fasta,
+                 search_algo    = algo,
+                 search_db      = db,
+                 num_threads    = threads,
+                 search_profile = profile,
+                 output_dir     = output_dir)
+    # Make sure the database and its index are ready beforehand #
+    c.database.prepare(search_algo=(algo,))
+    # Only time the search #
+    start = time.perf_counter()
+    c.search()
+    took = time.perf_counter() - start
+    # Return #
+    return took, [query.tax_string for query in c.queries]
+
+###############################################################################
+if __name__ == '__main__':
+    # Parse the command line #
+    db      = sys.argv[1] if len(sys.argv) > 1 else 'ssuome'
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    # Only the algorithms that are installed #
+    algos = [algo for algo in ('blast', 'vsearch')
+             if shutil.which('blastn' if algo == 'blast' else algo)]
+    if not algos: sys.exit("Neither BLAST nor VSEARCH could be found.")
+    # Every dataset with every algorithm and every profile #
+    output_dir = this_dir + 'results/profiles/'
+    header = "  %-10s %-10s %10s %12s %10s"
+    row    = "  %-10s %-10s %10.2f %12.1f %9.1f%%"
+    for dataset in datasets:
+        fasta = tests_dir + dataset
+        if not os.path.exists(fasta): continue
+        count = sum(1 for line in open(fasta) if line.startswith('>'))
+        print("%s (%i sequences, %i threads):" % (dataset, count, threads))
+        print(header % ('algorithm', 'profile', 'seconds', 'seqs/second',
+                        'agreement'))
+        for algo in algos:
+            results = {}
+            for profile in search_profiles:
+                results[profile] = classify(fasta, algo, profile, db,
+                                            threads, output_dir)
+            reference = results['balanced'][1]
+            for profile, (took, assignments) in results.items():
+                same = sum(a == b for a, b in zip(assignments, reference))
+                print(row % (algo, profile, took, count / took,
+                             100 * same / count))
+        print()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to benchmark the assignment stage on a hits file where every query
+has a single hit, which means that the node has to be found by its name in
+the tree every time. It compares:
+
+* Searching the `ete4` tree with `search_nodes` (what was done before),
+  measured on a sample of queries and extrapolated.
+* Searching the compiled tree by bisection of its sorted names.
+* Using the `node_index` dictionary of the database.
+* The full assignment stage, starting from the hits file.
+
+Run it like this, optionally with a database name and a number of queries:
+
+    $ python -m crest4.benchmarks.single_hit_assignment ssuome 100000
+"""
+
+# Built-in modules #
+import os, sys, time, random
+
+# Internal modules #
+from crest4 import Classify
+from crest4.classify import all_db_choices
+from crest4.databases import CrestDatabase
+from crest4.query import Query
+import crest4.databases
+
+# Constants #
+this_dir = os.path.dirname(os.path.abspath(__file__)) + '/'
+
+###############################################################################
+def make_inputs(db, count, fasta_path, hits_path):
+    """
+    Write a fake FASTA file and a hits file in the BLAST tabular format with
+    comments, where every query has exactly one hit picked at random.
+    """
+    accessions = random.Random(0).choices(list(db.acc_to_node), k=count)
+    fields = 'query id, subject id, bit score, alignment length, identical'
+    with open(fasta_path, 'wt') as fasta, open(hits_path, 'wt') as hits:
+        for i, accession in enumerate(accessions):
+            name = 'query_%i' % i
+            fasta.write('>%s\nACGT\n' % name)
+            hits.write('# BLASTN 2.11.0+\n# Query: %s\n' % name)
+            hits.write('# Database: %s\n# Fields: %s\n' % (db.path, fields))
+            hits.write('# 1 hits found\n')
+            hits.write('%s\t%s\t500\t300\t300\n' % (name, accession))
+        hits.write('# BLAST processed %i queries\n' % count)
+
+def timed(function):
+    """Call a function and return the number of seconds it took."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+###############################################################################
+if __name__ == '__main__':
+    # Parse the command line #
+    db_name = sys.argv[1] if len(sys.argv) > 1 else 'ssuome'
+    count   = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    if db_name in all_db_choices: db = getattr(crest4.databases, db_name)
+    else: db = CrestDatabase(custom_path=os.path.abspath(db_name))
+    # Create the inputs #
+    output_dir = this_dir + 'results/'
+    os.makedirs(output_dir, exist_ok=True)
+    fasta_path = output_dir + 'single_hit.fasta'
+    hits_path  = output_dir + 'single_hit.hits'
+    make_inputs(db, count, fasta_path, hits_path)
+    # The node names we will be looking up #
+    names = [db.acc_to_node[line.split('\t')[1]]
+             for line in open(hits_path) if not line.startswith('#')]
+    # Make sure everything is loaded before timing #
+    db.tree, db.compiled_tree, db.node_index, db.node_to_name
+    # Time the different lookups #
+    sample = names[:min(count, 500)]
+    ete    = timed(lambda: [next(db.tree.search_nodes(name=name))
+                            for name in sample])
+    ete    = ete * len(names) / len(sample)
+    bisect = timed(lambda: [db.compiled_tree.index(n) for n in names])
+    index  = timed(lambda: [db.find_node(n) for n in names])
+    # Time the full assignment stage #
+    classify = Classify(fasta       = fasta_path,
+                        search_hits = hits_path,
+                        search_db   = db_name,
+                        output_dir  = output_dir)
+    classify.database = db
+    def assign():
+        from crest4.hits import parse_hits
+        with open(hits_path, 'rt') as handle:
+            for hits in parse_hits(handle, 'blast'):
+                Query(classify, hits).tax_string
+    full = timed(assign)
+    # Report #
+    print("Node lookups for %i single-hit queries in '%s':" % (count, db_name))
+    print("  ete4 search_nodes (extrapolated): %10.3f s" % ete)
+    print("  Compiled tree bisection:          %10.3f s" % bisect)
+    print("  Node index dictionary:            %10.3f s" % index)
+    print("Full assignment stage:              %10.3f s" % full)
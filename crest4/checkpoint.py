@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os
+
+# Internal modules #
+from crest4.sharding import blast_footer
+from crest4.compression import open_text, compression
+from crest4.streaming import hit_blocks
+
+###############################################################################
+def block_name(block):
+    """The ID of the query that a block of search results is about."""
+    for line in block.splitlines():
+        if line.startswith('# Query: '): return line[9:].split()[0]
+        if not line.startswith('#'):     return line.split('\t', 1)[0]
+
+def completed_part(path):
+    """
+    Look at a search results file that might have been cut short because
+    the search was interrupted. Returns a tuple of three elements: the IDs
+    of the queries whose results are complete, the number of bytes that
+    these results take at the start of the file, and `True` if BLAST wrote
+    its last line, meaning that the search had finished.
+    A block of results is only known to be complete once the next one has
+    started, so the last one is always considered to be incomplete, unless
+    the search had finished.
+    """
+    finished = False
+    # Only the lines that were completely written #
+    def lines():
+        nonlocal finished
+        with open(str(path), 'rb') as handle:
+            for line in handle:
+                if not line.endswith(b'\n'): return
+                line = line.decode()
+                if blast_footer.match(line.rstrip('\n')): finished = True
+                yield line
+    # Go through the blocks, with the last one pending #
+    names, size, last = [], 0, None
+    for block in hit_blocks(lines()):
+        if last is not None:
+            names.append(block_name(last))
+            size += len(last.encode())
+        last = block
+    if last is not None and finished:
+        names.append(block_name(last))
+        size += len(last.encode())
+    # Return #
+    return names, size, finished
+
+def append_hits(path, size, count, new_path):
+    """
+    Continue the search results file at `path` with the ones in the file at
+    `new_path`. The first file is cut to its first `size` bytes beforehand,
+    which contain `count` queries. When BLAST was used, the line reporting
+    the number of queries processed is updated to include both files.
+    """
+    # Remove the incomplete results #
+    os.truncate(str(path), size)
+    # Add the new ones #
+    total, footer = count, False
+    with open(str(path), 'at') as output:
+        with open(str(new_path), 'rt') as handle:
+            for line in handle:
+                match = blast_footer.match(line.rstrip('\n'))
+                if match:
+                    total += int(match.group(1))
+                    footer = True
+                    continue
+                output.write(line)
+        if footer: output.write('# BLAST processed %i queries\n' % total)
+    # Return #
+    return path
+
+def replace_hits(path, new_path):
+    """
+    Replace the results of some queries in the search results file at
+    `path` with the ones found in the file at `new_path`, which can only
+    contain queries that are already in the first file. Their order and the
+    line reporting the number of queries processed stay the same.
+    """
+    # The new blocks of results by query #
+    with open_text(new_path) as handle:
+        new = {block_name(block): block for block in hit_blocks(handle)}
+    # The line counting the queries is not part of any block #
+    footer = None
+    def lines(handle):
+        nonlocal footer
+        for line in handle:
+            if blast_footer.match(line.rstrip('\n')): footer = line
+            yield line
+    # Write the updated file next to the old one, compressed the same way #
+    temp = str(path) + '.tmp' + compression(path)
+    with open_text(path) as handle, open_text(temp, 'wt') as output:
+        for block in hit_blocks(lines(handle)):
+            output.write(new.get(block_name(block), block))
+        if footer is not None: output.write(footer)
+    # Take its place #
+    os.replace(temp, str(path))
+    # Return #
+    return path
@@ -8,7 +8,7 @@ Contact at www.sinclair.bio
 """
 
 # Built-in modules #
-import os, multiprocessing
+import os
 
 # Internal modules #
 import crest4
@@ -24,6 +24,37 @@ from autopaths.dir_path  import DirectoryPath
 # Constants #
 all_db_choices = ('midori253darn', 'silvamod138pr2', 'mitofish', 'ssuome')
 
+# The extra options of every search profile for each search algorithm #
+search_profiles = {
+    'fast':      {'blast':   {'-word_size': 32, '-mt_mode': 1},
+                  'vsearch': {'--maxrejects': 8}},
+    'balanced':  {'blast':   {},
+                  'vsearch': {}},
+    'sensitive': {'blast':   {'-word_size': 16},
+                  'vsearch': {'--maxrejects': 256}},
+}
+
+# The options of the search programs that change their speed but not their
+# results, and are therefore left out of the key of the hit cache
+speed_params = ('-mt_mode', '--threads', 'num_threads')
+
+###############################################################################
+def find_database(search_db):
+    """
+    Return the database object corresponding to the `search_db` option.
+    This is either one of the built-in databases, a new object pointing to
+    a custom path, or the object itself if one was passed.
+    """
+    if isinstance(search_db, CrestDatabase):
+        return search_db
+    if search_db not in all_db_choices:
+        # Take the absolute path #
+        user_path = os.path.abspath(search_db)
+        # Make the object #
+        return CrestDatabase(custom_path=user_path)
+    else:
+        return getattr(crest4.databases, search_db)
+
 ###############################################################################
 class Classify:
     """
@@ -50,19 +81,36 @@ class Classify:
                  score_drop  = 2.0,
                  min_smlrty  = True,
                  otu_table   = None,
+                 num_shards  = 1,
+                 dereplicate = True,
+                 reuse_hits  = False,
+                 progressive = False,
+                 keep_partial = False,
+                 bulk_assign = False,
+                 adaptive_targets = False,
+                 search_profile = 'balanced',
+                 screen_with = None,
+                 exact_matches = False,
+                 zip_outputs = None,
                  ):
         """
         Args:
 
             fasta: The path to a single FASTA file as a string.
                    These are the sequences that will be taxonomically
-                   classified.
+                   classified. The file can be compressed with `gzip`,
+                   `bzip2` or `zstd`, judging by its extension.
 
             search_algo: The algorithm used for the sequence similarity search
                          that will be run to match the sequences against the
-                         database chosen. Either `blast` or `vsearch`. No
-                         other values are currently supported. By default,
-                         `blast`.
+                         database chosen. Either `blast`, `vsearch` or
+                         `kmer`. No other values are currently supported.
+                         The `kmer` search is built into `crest4` and needs
+                         no external program. It is a rough screening method
+                         that only estimates the identity between sequences
+                         from the short words they share, ignoring the words
+                         found in too many sequences of the database. By
+                         default, `blast`.
 
             num_threads: The number of processors to use for the sequence
                          similarity search. By default, parallelism is turned
@@ -77,6 +125,8 @@ class Classify:
                        specifying the full path to a directory containing all
                        required files under `search_db`.
                        See the README for more information.
+                       From python, a `CrestDatabase` object can also be
+                       passed directly, for instance one that was preloaded.
 
             output_dir: The directory into which all the classification
                         results will be written to. This defaults to a
@@ -90,7 +140,8 @@ class Classify:
                          sequence similarity search step and go directly to
                          the taxonomy step. If a hits file exists in the output
                          directory and this option is not specified, it is
-                         deleted and regenerated.
+                         deleted and regenerated (see `keep_partial`).
+                         A compressed hits file can be given too.
 
             min_score: The minimum bit-score for a search hit to be considered
                        when using BLAST as the search algorithm. All hits below
@@ -121,6 +172,125 @@ class Classify:
                        assignment counts per taxa. Secondly, a table
                        propagating the sequence counts upwards
                        in a cumulative fashion.
+
+            num_shards: The number of sequence similarity searches to run at
+                        the same time, each on a different part of the FASTA
+                        file and each using `num_threads` processors. This is
+                        useful on machines with many CPUs, as the search
+                        programs stop making good use of extra threads long
+                        before that. If you pass the value `True`, we will
+                        run as many searches as fit on the CPUs available.
+                        The results are identical to running a single
+                        search. By default, `1`.
+
+            dereplicate: Determines if identical sequences are only searched
+                         once. The taxonomic assignment of the first one is
+                         then given to all the others, so the results are
+                         the same, only faster. Pass any value like `False`
+                         to turn it off. The default is `True`.
+
+            reuse_hits: Optionally, keep the search results of every sequence
+                        in a file between runs, so that sequences that were
+                        already searched against the same database, with the
+                        same algorithm and options, are not searched again.
+                        Pass `True` to use the file `hit_cache.sqlite` in the
+                        directory where databases are stored, or the path to
+                        another file. Use `crest4 cache stats` and
+                        `crest4 cache prune` to manage it. By default, no
+                        cache is used.
+
+            progressive: Determines if the taxonomic assignments are written
+                         while the sequence similarity search is still
+                         running. Every sequence is classified as soon as
+                         its search results are complete, and the output
+                         file grows progressively, which gives partial
+                         results early on long runs. Pass `True` to turn it
+                         on. The results are the same. By default, `False`.
+
+            keep_partial: Determines if the search results left by a previous
+                          run that was interrupted are kept. Only the
+                          sequences that had not been searched yet are then
+                          searched, and their results are added to the hits
+                          file. This is useful when jobs can be stopped
+                          before they finish, such as on some clusters. Pass
+                          `True` to turn it on. By default, `False`, and an
+                          existing hits file in the output directory is
+                          deleted.
+
+            bulk_assign: Determines if the taxonomic assignments of all the
+                         sequences are computed together with NumPy arrays,
+                         instead of one sequence after the other. This is
+                         faster when there are many sequences. Pass `True` to
+                         turn it on. The results are the same. This has no
+                         effect with the `progressive` option, which assigns
+                         every sequence as soon as it is searched. By
+                         default, `False`.
+
+            adaptive_targets: Determines if the number of hits reported for
+                              every sequence adapts to what is needed,
+                              instead of being fixed to 100. The search is
+                              first run with only 10 targets per sequence.
+                              The sequences whose hits are all still within
+                              the score drop of their best hit might have
+                              more of them, and are searched again with ten
+                              times more targets, until none are left. This
+                              saves time and space. The assignments are
+                              approximately the same as with a fixed number
+                              of targets, but not always identical, since
+                              BLAST and VSEARCH do not necessarily report
+                              the best targets first. Pass `True` to turn it
+                              on. By default, `False`.
+
+            search_profile: The profile of the sequence similarity search,
+                            trading speed for sensitivity. Either `fast`,
+                            `balanced` or `sensitive`. With BLAST, this
+                            changes the word size, and `fast` also splits
+                            the work between threads by query. With
+                            VSEARCH, this changes the number of candidates
+                            rejected before giving up on a query. The
+                            `balanced` profile keeps the defaults of both
+                            programs. It has no effect on the `kmer`
+                            search. The speed and agreement of every
+                            profile can be measured with the
+                            `crest4.benchmarks.search_profiles` script.
+                            By default, `balanced`.
+
+            screen_with: The algorithm of a faster search used to screen
+                         all the sequences first, before the search with
+                         `search_algo`. Either `vsearch` or `kmer`. The
+                         sequences that the screening assigns confidently,
+                         meaning that the similarity of their best hit is
+                         above the minimum similarity of the common
+                         ancestor of their hits, keep that assignment. Only
+                         the others, such as the ones with no hits or a low
+                         similarity, are searched again with `search_algo`.
+                         The screening has its own minimum score, the
+                         default of its algorithm, and its results are
+                         placed in a `screening` subdirectory of the output
+                         directory. By default, `None`, meaning that every
+                         sequence is searched with `search_algo` only.
+
+            exact_matches: Determines if the sequences that are identical to
+                           one or more sequences of the database are
+                           assigned directly, without being searched. Their
+                           assignment is the common ancestor of all the
+                           identical references, as if the search had only
+                           found those. This differs from a search when
+                           other references, that are almost identical, are
+                           within the score drop. An index of the database
+                           by sequence is built the first time and saved
+                           next to it. Pass `True` to turn it on. By
+                           default, `False`.
+
+            zip_outputs: The compression format of the files written to the
+                         output directory, which are the search results,
+                         the assignments and the OTU outputs. Either `gz`,
+                         `bz2` or `zst`, the latter needing the `zstandard`
+                         module. The search programs still write plain
+                         text, which is compressed on the fly through a
+                         pipe. This cannot be combined with `progressive`
+                         nor with `keep_partial`. By default, `None`,
+                         meaning that files are not compressed.
                        """
         # Save attributes #
         self.fasta       = fasta
@@ -133,6 +303,17 @@ class Classify:
         self.score_drop  = score_drop
         self.min_smlrty  = min_smlrty
         self.otu_table   = otu_table
+        self.num_shards  = num_shards
+        self.dereplicate = dereplicate
+        self.reuse_hits  = reuse_hits
+        self.progressive = progressive
+        self.keep_partial = keep_partial
+        self.bulk_assign = bulk_assign
+        self.adaptive_targets = adaptive_targets
+        self.search_profile = search_profile
+        self.screen_with = screen_with
+        self.exact_matches = exact_matches
+        self.zip_outputs = zip_outputs
         # Assign default values and change others #
         self.transform()
         # Validate attributes #
@@ -150,13 +331,24 @@ class Classify:
         # Default for the number of threads #
         if not isinstance(self.num_threads, int):
             if self.num_threads is True:
-                self.num_threads = min(multiprocessing.cpu_count(), 32)
+                self.num_threads = min(os.cpu_count(), 32)
             elif self.num_threads is False:
                 self.num_threads = 1
             elif self.num_threads.lower() == 'true':
-                self.num_threads = min(multiprocessing.cpu_count(), 32)
-        # The database is always a string #
-        self.search_db = str(self.search_db)
+                self.num_threads = min(os.cpu_count(), 32)
+        # Default for the number of shards, which is based on the threads #
+        if str(self.num_shards).lower() == 'true':
+            self.num_shards = max(1, os.cpu_count() // int(self.num_threads))
+        if str(self.num_shards).lower() == 'false':
+            self.num_shards = 1
+        try:
+            self.num_shards = int(self.num_shards)
+        except (ValueError, TypeError):
+            msg = "The number of shards must be an integer (not '%s')."
+            raise ValueError(msg % self.num_shards)
+        # The database is always a string, unless it's a database object #
+        if not isinstance(self.search_db, CrestDatabase):
+            self.search_db = str(self.search_db)
         # Default for the output directory #
         if self.output_dir is None:
             self.output_dir = self.fasta + '.crest4/'
@@ -164,15 +356,26 @@ class Classify:
         # The search hits is a file somewhere if passed #
         if self.search_hits is not None:
             self.search_hits = FilePath(self.search_hits)
+        # Only keep the results of a previous run if the user passed `True` #
+        self.keep_partial = str(self.keep_partial).lower() == 'true'
+        if self.fasta is None: self.keep_partial = False
+        # No compression of the outputs unless a format is given #
+        if str(self.zip_outputs).lower() in ('none', 'false', ''):
+            self.zip_outputs = None
+        else:
+            self.zip_outputs = str(self.zip_outputs).lower().lstrip('.')
         # Default for the search hits file if not passed #
         if self.search_hits is None:
-            self.search_hits = FilePath(self.output_dir + 'search.hits')
-            self.search_hits.remove()
+            path = self.output_dir + 'search.hits' + self.zip_extension
+            self.search_hits = FilePath(path)
+            if not self.keep_partial: self.search_hits.remove()
+        # A new search is not finished until it says so #
+        if not self.keep_partial: self.search_done.remove()
         # Default for the minimum score #
         if self.min_score is None:
             if self.search_algo == 'blast':
                 self.min_score = 155
-            if self.search_algo == 'vsearch':
+            if self.search_algo in ('vsearch', 'kmer'):
                 self.min_score = 0.75
         # The minimum score has to be a number, not a string #
         try:
@@ -188,6 +391,28 @@ class Classify:
             raise ValueError(msg % self.score_drop)
         # Turn off the minimum similarity filter if the user passed any value #
         if self.min_smlrty is not True: self.min_smlrty = False
+        # Turn off dereplication if the user passed any other value #
+        if str(self.dereplicate).lower() != 'true': self.dereplicate = False
+        if self.fasta is None: self.dereplicate = False
+        # The hit cache is either off, at the default location, or a path #
+        if str(self.reuse_hits).lower() in ('false', 'none', ''):
+            self.reuse_hits = False
+        elif str(self.reuse_hits).lower() == 'true':
+            from crest4.hit_cache import default_path
+            self.reuse_hits = default_path()
+        # Turn on the progressive output only if the user passed `True` #
+        self.progressive = str(self.progressive).lower() == 'true'
+        # Turn on the vectorized assignment only if the user passed `True` #
+        self.bulk_assign = str(self.bulk_assign).lower() == 'true'
+        # Turn on the adaptive number of targets only if the user passed `True`
+        self.adaptive_targets = str(self.adaptive_targets).lower() == 'true'
+        # No screening unless an algorithm is given and there is a FASTA #
+        if str(self.screen_with).lower() in ('none', 'false', ''):
+            self.screen_with = None
+        if self.fasta is None: self.screen_with = None
+        # Turn on the exact matches only if the user passed `True` #
+        self.exact_matches = str(self.exact_matches).lower() == 'true'
+        if self.fasta is None: self.exact_matches = False
         # The OTU table is a file somewhere if passed #
         if self.otu_table is not None:
             self.otu_table = FilePath(self.otu_table)
@@ -206,12 +431,49 @@ class Classify:
             msg = "Neither the FASTA file at '%s' nor the search hits file" \
                   " at '%s' contain any data. Cannot proceed."
             raise Exception(msg % (self.fasta, self.search_hits))
+        # Check the compression of the outputs #
+        if self.zip_outputs is not None:
+            from crest4.compression import compressions
+            if '.' + self.zip_outputs not in compressions:
+                msg = "The compression format '%s' is not supported." \
+                      " Choose from: gz, bz2, zst."
+                raise ValueError(msg % self.zip_outputs)
+            if self.progressive or self.keep_partial:
+                msg = "Compressed outputs cannot be combined with the" \
+                      " `progressive` or `keep_partial` options."
+                raise ValueError(msg)
+        # Partial results can only be continued in a plain file #
+        if self.keep_partial:
+            from crest4.compression import is_compressed
+            if is_compressed(self.search_hits):
+                msg = "The search results at '%s' are compressed and" \
+                      " cannot be continued with `keep_partial`."
+                raise ValueError(msg % self.search_hits)
+        # Check the number of shards #
+        if self.num_shards < 1:
+            msg = "The number of shards cannot be smaller than one ('%s')."
+            raise ValueError(msg % self.num_shards)
         # Check the search algorithm #
-        if self.search_algo not in ('blast', 'vsearch'):
+        if self.search_algo not in ('blast', 'vsearch', 'kmer'):
             msg = "The search algorithm '%s' is not supported."
             raise ValueError(msg % self.search_algo)
+        # Check the search profile #
+        if self.search_profile not in search_profiles:
+            msg = "The search profile '%s' is not supported. Choose from: %s."
+            choices = ', '.join(search_profiles)
+            raise ValueError(msg % (self.search_profile, choices))
+        # Check the screening algorithm #
+        if self.screen_with is not None:
+            if self.screen_with not in ('vsearch', 'kmer'):
+                msg = "The screening algorithm '%s' is not supported."
+                raise ValueError(msg % self.screen_with)
+            if self.screen_with == self.search_algo:
+                msg = "The screening algorithm cannot be the same as the" \
+                      " search algorithm ('%s')."
+                raise ValueError(msg % self.screen_with)
         # The search database is a known entry or exists on the filesystem #
-        if self.search_db not in all_db_choices:
+        if isinstance(self.search_db, CrestDatabase): pass
+        elif self.search_db not in all_db_choices:
             if not os.path.exists(self.search_db):
                 msg = "The search database '%s' is not supported."
                 raise ValueError(msg % self.search_db)
@@ -221,11 +483,12 @@ class Classify:
             raise ValueError(msg % self.min_score)
         # Check the minimum score value is below one #
         if self.min_score > 1.0:
-            if self.search_algo == 'vsearch':
+            if self.search_algo in ('vsearch', 'kmer'):
                 msg = "The minimum score cannot be more than 1.0 when" \
-                      " using VSEARCH ('%s') because it represents the" \
+                      " using %s ('%s') because it represents the" \
                       " the minimum identity between two sequences."
-                raise ValueError(msg % self.min_score)
+                algo = self.search_algo.upper()
+                raise ValueError(msg % (algo, self.min_score))
         # Check the score drop value #
         if self.score_drop < 0.0:
             msg = "The score drop value cannot be smaller than zero ('%s')."
@@ -244,50 +507,608 @@ class Classify:
         Retrieve the database object that the user has selected.
         This can be either a standard database or a custom-specified path.
         """
-        if self.search_db not in all_db_choices:
-            # Take the absolute path #
-            user_path = os.path.abspath(self.search_db)
-            # Make the object #
-            return CrestDatabase(custom_path=user_path)
-        else:
-            return getattr(crest4.databases, self.search_db)
+        return find_database(self.search_db)
+
+    @property
+    def zip_extension(self):
+        """The extension added to the output files, e.g. '.gz' or ''."""
+        if self.zip_outputs is None: return ''
+        return '.' + self.zip_outputs
 
     #------------------------------ Searching --------------------------------#
     @cached_property
     def seqsearch(self):
         """
-        An object representing the sequence similarity search.
+        An object representing the sequence similarity search of the whole
+        FASTA file. The results are parsed by `crest4.hits` instead.
+        """
+        # The search index is only needed if we run the search ourselves #
+        database = self.database
+        if self.search_hits:
+            if not database.downloaded: database.download()
+            database = database.path
+        # Build and return the object #
+        return self.make_search(self.fasta, self.search_hits, database)
+
+    def make_search(self, fasta, out_path, database, max_targets=None):
+        """
+        Make an object representing a sequence similarity search of the
+        given FASTA file, with results written to `out_path`. The number of
+        targets reported per sequence can be changed with `max_targets`.
         Makes use of the `seqsearch` module. For reference:
 
         * Setting `-outfmt` to 5 means XML output.
         * Setting `-outfmt` to 6 means tabular output.
         * Setting `-outfmt` to 7 means tabular output with comments.
+
+        The `kmer` algorithm is not part of the `seqsearch` module and uses
+        a `KmerSearch` object instead, which offers the same interface.
         """
-        # Initialize #
-        params = {}
+        filtering = dict(self.search_filtering)
+        if max_targets is not None: filtering['max_targets'] = max_targets
+        if self.search_algo == 'kmer':
+            from crest4.kmer import KmerSearch
+            return KmerSearch(input_fasta  = fasta,
+                              database     = database,
+                              out_path     = out_path,
+                              min_identity = self.min_score,
+                              max_targets  = filtering['max_targets'])
+        from seqsearch.search import SeqSearch
+        return SeqSearch(input_fasta = fasta,
+                         database    = database,
+                         seq_type    = 'nucl',
+                         algorithm   = self.search_algo,
+                         filtering   = filtering,
+                         num_threads = self.num_threads,
+                         out_path    = out_path,
+                         params      = dict(self.search_params))
+
+    @cached_property
+    def search_params(self):
+        """The options given to the search algorithm on the command line."""
         # If the user chose BLAST then we have to specify tabular output #
         if self.search_algo == 'blast':
             params = {'-outfmt': '7 qseqid sseqid bitscore length nident'}
+            params.update(search_profiles[self.search_profile]['blast'])
+            # Splitting by query only makes sense with several threads #
+            if self.num_threads == 1: params.pop('-mt_mode', None)
+            return params
         # In case the user chose VSEARCH we specify the minimum identity
         # and the minimum sequence match length
         if self.search_algo == 'vsearch':
             params = {'--id':      self.min_score,
                       '--mincols': 25}
-        # Build and return the object #
-        from seqsearch.search import SeqSearch
-        return SeqSearch(input_fasta = self.fasta,
-                         database    = self.database,
-                         seq_type    = 'nucl',
-                         algorithm   = self.search_algo,
-                         filtering   = {'max_targets': 100},
-                         num_threads = self.num_threads,
-                         out_path    = self.search_hits,
-                         params      = params)
+            params.update(search_profiles[self.search_profile]['vsearch'])
+            return params
+        # The k-mer search only needs the minimum identity and the word size
+        if self.search_algo == 'kmer':
+            from crest4.kmer import kmer_size
+            return {'min_identity': self.min_score,
+                    'kmer_size':    kmer_size}
+
+    @cached_property
+    def search_filtering(self):
+        """The options that limit the number of hits reported."""
+        return {'max_targets': 100}
+
+    @property
+    def search_done(self):
+        """
+        The empty file written next to the search results once the search
+        has finished. Unlike BLAST, VSEARCH and the k-mer search do not end
+        their results with a line saying so, and they leave out sequences
+        without hits, so this is how `keep_partial` knows that nothing is
+        left to search.
+        """
+        return FilePath(self.search_hits + '.done')
 
     def search(self):
         """A method to launch the sequence similarity search."""
+        # Continue the search of a previous run that was interrupted #
+        if self.keep_partial and self.search_hits: return self.resume_search()
+        # Only search every distinct sequence that still needs it #
+        fasta = self.fasta_to_search()
+        # Only search the sequences that were not searched in previous runs #
+        if self.reuse_hits: self.cached_search(fasta, self.search_hits)
+        else:              self.run_search(fasta, self.search_hits)
+        # The dereplicated file is not needed anymore #
+        if fasta != self.fasta: fasta.remove()
+        # Remember that it finished #
+        self.search_done.touch()
+        # Return #
+        return self.search_hits
+
+    def resume_search(self):
+        """
+        Keep the complete results found in the hits file, search only the
+        sequences that are missing from it, and add their results at the
+        end, as if the search had never been interrupted.
+        """
+        from fasta import FASTA
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id
+        from crest4.checkpoint import completed_part, append_hits
+        # The previous run had finished #
+        if self.search_done.exists: return self.search_hits
+        # What was done before #
+        names, size, finished = completed_part(self.search_hits)
+        if finished:
+            self.search_done.touch()
+            return self.search_hits
+        # Only search every distinct sequence that still needs it #
+        fasta = self.fasta_to_search()
+        # The sequences left to search #
+        names, left = set(names), 0
+        self.output_dir.create_if_not_exists()
+        remaining = FASTA(self.output_dir + 'remaining.fasta')
+        with open(remaining, 'wt') as handle:
+            for text, length in read_records(fasta):
+                if record_id(text) in names: continue
+                handle.write(text)
+                left += 1
+        # Report to the user #
+        msg = "Resuming: %i sequences were already searched, %i are left."
+        print(msg % (len(names), left))
+        # Search them and add the results #
+        if left:
+            new_hits = self.output_dir + 'remaining.hits'
+            if self.reuse_hits: self.cached_search(remaining, new_hits)
+            else:              self.run_search(remaining, new_hits)
+            append_hits(self.search_hits, size, len(names), new_hits)
+            os.remove(new_hits)
+        # Clean up #
+        remaining.remove()
+        if fasta != self.fasta: fasta.remove()
+        # Remember that it finished #
+        self.search_done.touch()
+        # Return #
+        return self.search_hits
+
+    def run_search(self, fasta, out_path, max_targets=None):
+        """
+        Search the given FASTA file and write the results to `out_path`.
+        Either of them can be compressed, in which case the search program
+        reads and writes plain text through pipes (see `crest4.compression`).
+        """
+        from crest4.sharding import read_records
+        # Nothing to search, for instance if the screening assigned it all #
+        if next(read_records(fasta), None) is None:
+            return self.write_no_hits(out_path)
+        # Start small and search again where more targets are needed #
+        if self.adaptive_targets and max_targets is None:
+            return self.adaptive_search(fasta, out_path)
+        # Split the work between several processes if requested #
+        if self.num_shards > 1:
+            return self.sharded_search(fasta, out_path, max_targets)
         # Launch the search algorithm #
-        return self.seqsearch.run()
+        from crest4.compression import decompressed, compressing
+        from crest4.compression import searchable_fasta
+        with decompressed(fasta, self.output_dir) as query, \
+             compressing(out_path, self.output_dir) as hits:
+            search = self.make_search(searchable_fasta(query), hits,
+                                      self.database, max_targets)
+            search.run()
+        # Return #
+        return out_path
+
+    def write_no_hits(self, out_path):
+        """Write a search results file for an empty FASTA file."""
+        from crest4.compression import open_text
+        with open_text(out_path, 'wt') as handle:
+            if self.search_algo == 'blast':
+                handle.write('# BLAST processed 0 queries\n')
+        return out_path
+
+    def adaptive_search(self, fasta, out_path, first=10, factor=10):
+        """
+        Search the given FASTA file with only `first` targets per sequence.
+        Then, the sequences that might have more hits within the score drop
+        than were reported are searched again with `factor` times more
+        targets, and their results replace the previous ones, until no such
+        sequences are left.
+        """
+        from fasta import FASTA
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id
+        from crest4.checkpoint import replace_hits
+        # The first search #
+        limit = first
+        self.run_search(fasta, out_path, limit)
+        # Search again as long as needed #
+        while True:
+            names = self.truncated_queries(out_path, limit)
+            if not names: break
+            limit *= factor
+            msg = "Adaptive targets: searching %i sequences again with" \
+                  " %i targets."
+            print(msg % (len(names), limit))
+            # Only those sequences #
+            self.output_dir.create_if_not_exists()
+            again = FASTA(self.output_dir + 'truncated.fasta')
+            with open(again, 'wt') as handle:
+                for text, length in read_records(fasta):
+                    if record_id(text) in names: handle.write(text)
+            new_hits = self.output_dir + 'truncated.hits'
+            self.run_search(again, new_hits, limit)
+            # Put their results in place of the previous ones #
+            replace_hits(out_path, new_hits)
+            again.remove()
+            os.remove(new_hits)
+        # Return #
+        return out_path
+
+    def truncated_queries(self, path, limit):
+        """
+        The IDs of the sequences in the search results file at `path` that
+        reached the maximum of `limit` targets while all of their hits are
+        still within the score drop of the best one. Other targets that the
+        search did not report could have changed their assignment.
+        Sequences whose best hit is under the minimum score are not
+        assigned anyway. This is only judged from the hits reported, so a
+        sequence whose targets were cut off before its best ones, as BLAST
+        and VSEARCH can do with a small limit, is not detected.
+        """
+        from crest4.compression import open_text
+        with open_text(path) as handle:
+            return set(query.id for query in self.hit_records(handle)
+                       if len(set(query.hit_ids)) >= limit
+                       and query.scores[0] >= self.min_score
+                       and min(query.scores) >= query.scores[0] *
+                                                self.score_frac)
+
+    def sharded_search(self, fasta, out_path, max_targets=None):
+        """
+        Split the FASTA file into parts of about the same total length,
+        search them all at the same time, and merge the results in the
+        original order of the sequences.
+        """
+        from fasta import FASTA
+        from concurrent.futures import ThreadPoolExecutor
+        from crest4.sharding import split_fasta, merge_hits
+        # Split the input #
+        shards_dir = self.output_dir + 'shards/'
+        shards_dir.remove()
+        parts = split_fasta(fasta, self.num_shards, shards_dir)
+        # One search per part, the index is built here if needed #
+        searches = [self.make_search(FASTA(part), part + '.hits',
+                                     self.database, max_targets)
+                    for part in parts]
+        # Each search is an external process that we wait for in a thread #
+        with ThreadPoolExecutor(max_workers=len(searches)) as pool:
+            jobs = [pool.submit(search.run) for search in searches]
+            for job in jobs: job.result()
+        # Merge the results and clean up #
+        merge_hits([search.out_path for search in searches], out_path)
+        shards_dir.remove()
+        # Return #
+        return out_path
+
+    @cached_property
+    def hit_cache_key(self):
+        """
+        Everything that the search results depend on apart from the sequence
+        itself, used to find them in the hit cache.
+        """
+        import json
+        params  = {key: value for key, value in self.search_params.items()
+                   if key not in speed_params}
+        options = [params, self.search_filtering]
+        if self.adaptive_targets: options.append('adaptive')
+        options = json.dumps(options, sort_keys=True)
+        return self.database.fingerprint, self.search_algo, options
+
+    def cached_search(self, fasta, out_path):
+        """
+        Take the results of the sequences that are found in the hit cache,
+        only search the others, and store their results in the cache for
+        the next time. All results are then written to `out_path` in the
+        order of the FASTA file, as if everything had been searched.
+        """
+        from fasta import FASTA
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id, record_digest
+        from crest4.hit_cache import HitCache, split_hits, render_hits
+        key = self.hit_cache_key
+        # The name, description and hash of every sequence #
+        records = [(record_id(text), text.split('\n', 1)[0][1:].strip(),
+                    record_digest(text))
+                   for text, length in read_records(fasta)]
+        # Look them up #
+        cache = HitCache(self.reuse_hits)
+        found = cache.get(set(digest for _, _, digest in records), key)
+        msg = "Hit cache: %i sequences out of %i were already searched."
+        print(msg % (sum(d in found for _, _, d in records), len(records)))
+        # Search the other ones #
+        missing = set(seq_id for seq_id, _, d in records if d not in found)
+        if missing:
+            self.output_dir.create_if_not_exists()
+            missing_fasta = FASTA(self.output_dir + 'uncached.fasta')
+            missing_hits  = self.output_dir + 'uncached.hits'
+            with open(missing_fasta, 'wt') as handle:
+                for text, length in read_records(fasta):
+                    if record_id(text) in missing: handle.write(text)
+            self.run_search(missing_fasta, missing_hits)
+            # Keep the new results #
+            new = split_hits(missing_hits)
+            new = {digest: new.get(seq_id, '')
+                   for seq_id, _, digest in records if seq_id in missing}
+            cache.put(new, key)
+            found.update(new)
+            missing_fasta.remove()
+            os.remove(missing_hits)
+        cache.close()
+        # Write all the results in order #
+        from crest4.compression import open_text
+        self.output_dir.create_if_not_exists()
+        with open_text(out_path, 'wt') as handle:
+            for seq_id, title, digest in records:
+                handle.write(render_hits(found[digest], seq_id, title))
+            if self.search_algo == 'blast':
+                handle.write('# BLAST processed %i queries\n' % len(records))
+        # Return #
+        return out_path
+
+    def search_lines(self):
+        """
+        Iterate over the lines of the search results file. When a single
+        search process is needed, it is launched in the background and the
+        lines are yielded while it is still writing them. Sharded, cached
+        and adaptive searches only write the file at the end, so they are
+        done first.
+        """
+        from crest4.streaming import follow
+        from concurrent.futures import ThreadPoolExecutor
+        # Check if the search has been done already or has to be #
+        at_end = self.num_shards > 1 or self.reuse_hits or \
+                 self.adaptive_targets
+        if not self.search_hits and at_end: self.search()
+        if self.keep_partial and self.search_hits: self.search()
+        if self.search_hits:
+            yield from follow(self.search_hits, lambda: False)
+            return
+        # Only search every distinct sequence that still needs it #
+        fasta = self.fasta_to_search()
+        # The search is an external process that we wait for in a thread #
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            job = pool.submit(self.run_search, fasta, self.search_hits)
+            yield from follow(self.search_hits, lambda: not job.done())
+            job.result()
+        # The dereplicated file is not needed anymore #
+        if fasta != self.fasta: fasta.remove()
+        # Remember that it finished #
+        self.search_done.touch()
+
+    #------------------------------ Shortcuts --------------------------------#
+    @cached_property
+    def exact_queries(self):
+        """
+        A dictionary with the name of every sequence that is identical to
+        one or more sequences of the database as keys, and a Query object
+        with all of them as hits as values. Only the first of identical
+        sequences are included. These sequences are not searched.
+        """
+        from crest4.hits import QueryHits
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id
+        from crest4.exact import record_sequence
+        index = self.database.exact_db
+        # Every hit gets the score of a perfect alignment #
+        result, total = {}, 0
+        for text, length in read_records(self.fasta):
+            seq_id = record_id(text)
+            if self.dereplicate and self.representatives[seq_id] != seq_id:
+                continue
+            total += 1
+            # The search would not report alignments that are too short #
+            if length < 25: continue
+            hit_ids = index.find(record_sequence(text))
+            if not hit_ids: continue
+            scores = [self.exact_score(length)] * len(hit_ids)
+            hits   = QueryHits(seq_id, hit_ids, scores, 1.0)
+            result[seq_id] = Query(self, hits)
+        # Report to the user #
+        msg = "Exact matches: %i sequences out of %i are identical to a" \
+              " reference and were not searched."
+        print(msg % (len(result), total))
+        # Return #
+        return result
+
+    def exact_score(self, length):
+        """
+        The score that the search algorithm gives to a perfect alignment of
+        the given length. This is the identity with VSEARCH and the k-mer
+        search. With BLAST, this is the bit-score computed with the scoring
+        parameters of megablast (match 1, mismatch -2, linear gap costs),
+        for which lambda is 1.28 and K is 0.46.
+        """
+        import math
+        if self.search_algo != 'blast': return 1.0
+        return round((1.28 * length - math.log(0.46)) / math.log(2), 1)
+
+    @cached_property
+    def preassigned(self):
+        """
+        A dictionary with the name of every sequence that is assigned
+        without being searched with `search_algo` as keys, and its Query
+        object as values. These are the sequences identical to a reference
+        (see `exact_matches`), and then the ones that the screening assigned
+        confidently (see `screen_with`).
+        """
+        result = {}
+        if self.exact_matches: result.update(self.exact_queries)
+        if self.screen_with:
+            for name, query in self.screened.items():
+                result.setdefault(name, query)
+        return result
+
+    def add_preassigned(self, queries):
+        """
+        Add the queries that were assigned without being searched after the
+        given queries, replacing any results for the same sequences. See
+        `in_fasta_order` to sort them all afterwards.
+        """
+        preassigned = self.preassigned
+        yield from (query for query in queries
+                    if query.name not in preassigned)
+        yield from preassigned.values()
+
+    def in_fasta_order(self, queries):
+        """
+        Sort the given queries in the order of the FASTA file. Sequences
+        that are not in the FASTA file go at the end.
+        """
+        order = {seq_id: i for i, seq_id in enumerate(self.representatives)}
+        return sorted(queries, key=lambda q: order.get(q.name, len(order)))
+
+    def add_unreported(self, queries):
+        """
+        VSEARCH entirely forgets about sequences that had no hits, instead
+        of still listing them in the output like BLAST. The k-mer search
+        does the same, as it uses the same format. So we have to add them
+        back after the given queries, in this awkward manner.
+        """
+        from crest4.hits import QueryHits
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id
+        reported_names = set()
+        for query in queries:
+            reported_names.add(query.name)
+            yield query
+        for text, length in read_records(self.fasta):
+            seq_id = record_id(text)
+            # Duplicated sequences are dealt with by `fan_out` #
+            if self.dereplicate and \
+               self.representatives.get(seq_id, seq_id) != seq_id: continue
+            if seq_id not in reported_names:
+                yield Query(self, QueryHits(seq_id))
+
+    def fasta_to_search(self):
+        """
+        Return the FASTA file that should be searched with `search_algo`.
+        These are the distinct sequences (see `write_unique_fasta`), minus
+        the ones that were already assigned otherwise, if any.
+        """
+        fasta = self.write_unique_fasta()
+        if not self.preassigned: return fasta
+        from fasta import FASTA
+        from crest4.sharding import read_records
+        from crest4.dereplicate import record_id
+        # Write the sequences left in a new file #
+        preassigned = self.preassigned
+        self.output_dir.create_if_not_exists()
+        remaining = FASTA(self.output_dir + 'unassigned.fasta')
+        with open(remaining, 'wt') as handle:
+            for text, length in read_records(fasta):
+                if record_id(text) not in preassigned: handle.write(text)
+        # The dereplicated file is not needed anymore #
+        if fasta != self.fasta: fasta.remove()
+        # Return #
+        return remaining
+
+    #----------------------------- Screening ---------------------------------#
+    @cached_property
+    def screening(self):
+        """
+        Another `Classify` object that searches all the sequences with the
+        faster `screen_with` algorithm, with the same options otherwise,
+        and writes its results to a subdirectory of the output directory.
+        """
+        return Classify(fasta            = self.fasta,
+                        search_algo      = self.screen_with,
+                        num_threads      = self.num_threads,
+                        search_db        = self.database,
+                        output_dir       = self.output_dir + 'screening/',
+                        score_drop       = self.score_drop,
+                        min_smlrty       = self.min_smlrty,
+                        num_shards       = self.num_shards,
+                        dereplicate      = self.dereplicate,
+                        reuse_hits       = self.reuse_hits,
+                        keep_partial     = self.keep_partial,
+                        bulk_assign      = self.bulk_assign,
+                        adaptive_targets = self.adaptive_targets,
+                        search_profile   = self.search_profile,
+                        exact_matches    = self.exact_matches,
+                        zip_outputs      = self.zip_outputs)
+
+    @cached_property
+    def screened(self):
+        """
+        A dictionary with the name of every sequence that the screening
+        assigned confidently as keys, and its Query object as values, which
+        still holds the results of the screening. Only the first of
+        identical sequences are included. These sequences are not searched
+        with `search_algo`.
+        """
+        from crest4.query import DuplicateQuery
+        queries = [query for query in self.screening.parse_queries()
+                   if not isinstance(query, DuplicateQuery)]
+        result = {query.name: query for query in queries if query.confident}
+        # Report to the user #
+        msg = "Screening: %i sequences out of %i were confidently assigned" \
+              " with %s."
+        print(msg % (len(result), len(queries), self.screen_with.upper()))
+        # Return #
+        return result
+
+    #---------------------------- Dereplicating ------------------------------#
+    @cached_property
+    def representatives(self):
+        """
+        A dictionary with the ID of every sequence of the FASTA file as keys,
+        in the original order, and the ID of the first sequence that is
+        identical to it as values. For instance, {'a': 'a', 'b': 'a'} means
+        that the sequences 'a' and 'b' are the same.
+        """
+        from crest4.dereplicate import find_representatives
+        return find_representatives(self.fasta)
+
+    def write_unique_fasta(self):
+        """
+        Return the FASTA file that should be searched. When some sequences
+        are identical, this is a new file containing only the first of each,
+        placed in the output directory. Otherwise, it is the original one.
+        """
+        # Check that there is something to do #
+        if not self.dereplicate: return self.fasta
+        total  = len(self.representatives)
+        unique = len(set(self.representatives.values()))
+        if unique == total: return self.fasta
+        # Report the ratio to the user #
+        msg = "Dereplication: %i sequences of which %i are unique" \
+              " (ratio of %.2f)."
+        print(msg % (total, unique, total / unique))
+        # Write the new file #
+        from fasta import FASTA
+        from crest4.dereplicate import write_representatives
+        self.output_dir.create_if_not_exists()
+        path = self.output_dir + 'unique.fasta'
+        write_representatives(self.fasta, self.representatives, path)
+        # Return #
+        return FASTA(path)
+
+    def fan_out(self, queries):
+        """
+        Add a query for every sequence that was not searched because it is
+        identical to a previous one, reusing the assignment of the latter.
+        In that case, every query is put back in the order of the FASTA file.
+        """
+        by_id = {query.name: query for query in queries}
+        # Check that there is something to do #
+        if all(seq_id in by_id or rep not in by_id
+               for seq_id, rep in self.representatives.items()):
+            return queries
+        # Follow the order of the FASTA file #
+        result = []
+        for seq_id, rep in self.representatives.items():
+            if seq_id in by_id: query = by_id[seq_id]
+            elif rep in by_id:  query = by_id[rep].renamed(seq_id)
+            else: continue
+            result.append(query)
+        # Hits for sequences that are not in the FASTA file are kept #
+        result += [query for query in queries
+                   if query.name not in self.representatives]
+        # Return #
+        return result
 
     #----------------------------- Assigning ---------------------------------#
     @cached_property
@@ -299,39 +1120,117 @@ class Classify:
         """
         return 1 - (self.score_drop / 100)
 
+    def hit_records(self, lines):
+        """
+        Parse the given lines of a search results file and iterate over one
+        `QueryHits` object per query (see the `crest4.hits` module).
+        """
+        from crest4.hits import parse_hits
+        # The database is needed even if we did not run the search #
+        if not self.database.downloaded: self.database.download()
+        # Return #
+        return parse_hits(lines, self.search_algo)
+
     @cached_property
     def queries(self):
         """
-        Parses the output of the sequence search program used which returns
-        a list of `QueryResult` objects from the `SearchIO.parse` module.
-        The list contains one Query object per sequence that was originally
+        Parses the output of the sequence search program used and returns a
+        list containing one object per sequence that was originally
         inputted. Use these objects to access the taxonomic assignments.
+        The search results of every sequence are released as soon as it is
+        assigned, so these are `Assignment` objects (see `crest4.query`).
+        """
+        return self.parse_queries(release=True)
+
+    def parse_queries(self, release=False):
+        """
+        The same list as the `queries` property, but computed again every
+        time. Unless `release` is set, it contains the `Query` objects that
+        still hold the search results of every sequence.
         """
         # Check if the search has been done already #
-        if not self.search_hits: self.search()
+        if not self.search_hits or self.keep_partial: self.search()
         # Iterate on the sequence search results #
-        result = [Query(self, query) for query in self.seqsearch.results]
-        # VSEARCH entirely forgets about sequences that had no hits.
-        # Instead of still listing them in the output like BLAST.
-        # So we have to add them back to the list in this awkward manner
-        if self.search_algo == 'vsearch':
-            reported_names = set(query.name for query in result)
-            for seq in self.fasta:
-                if seq.id not in reported_names:
-                    q = type('FakeQuery', (), {'hits': [], 'id': seq.id})
-                    result.append(Query(self, q))
+        from crest4.compression import open_text
+        with open_text(self.search_hits) as handle:
+            result = (Query(self, hits) for hits in self.hit_records(handle))
+            # Optionally, compute all the assignments at once #
+            if self.bulk_assign: result = self.assign_in_bulk(list(result))
+            # Sequences without any hits might be missing from the results #
+            if self.search_algo in ('vsearch', 'kmer'):
+                result = self.add_unreported(result)
+            # Sequences assigned without searching replace their results #
+            if self.preassigned: result = self.add_preassigned(result)
+            # Only keep the assignments, each query in turn as it is parsed #
+            if release: result = (query.release() for query in result)
+            result = list(result)
+        # The sequences assigned without searching take their place in order #
+        if self.preassigned: result = self.in_fasta_order(result)
+        # Identical sequences get the same assignment as the first one #
+        if self.dereplicate: result = self.fan_out(result)
         # Return #
         return result
 
+    def assign_in_bulk(self, queries):
+        """
+        Compute the assigned node of every query of the given list at once
+        with NumPy arrays (see the `crest4.batch` module), instead of letting
+        every query compute it when it is first needed.
+        """
+        from crest4.batch import assign_nodes
+        nodes = assign_nodes(self.database, [query.query for query in queries],
+                             self.min_score, self.score_frac, self.min_smlrty)
+        for query, node in zip(queries, nodes.tolist()):
+            query.assigned_node = node if node >= 0 else False
+        # Return #
+        return queries
+
     @cached_property
     def queries_by_id(self):
         """
-        References the same Query objects as the `queries` property above,
+        References the same objects as the `queries` property above,
         except that this time they are in a dictionary with the query ids
         (i.e., the original fasta ids) as keys instead of in a list.
         """
         return {query.name: query for query in self.queries}
 
+    def progressive_queries(self):
+        """
+        The same assignments as the `queries` property, in the same order,
+        except that they are yielded one by one while the search is running
+        instead of being collected in a list at the end. Only the queries
+        that will be needed again for an identical sequence are kept.
+        """
+        from crest4.hits import QueryHits
+        from crest4.streaming import in_order
+        # Parse the results of every sequence once they are complete #
+        queries = (Query(self, hits)
+                   for hits in self.hit_records(self.search_lines()))
+        # Sequences assigned without searching are ready before the others #
+        preassigned = self.preassigned
+        if preassigned:
+            import itertools
+            queries = itertools.chain(preassigned.values(),
+                                      (query for query in queries
+                                       if query.name not in preassigned))
+        # Without the FASTA file we can only follow the search results #
+        if self.fasta is None:
+            yield from queries
+            return
+        # The order of the FASTA file and which sequences were searched #
+        if self.dereplicate: order = self.representatives
+        else:
+            from crest4.sharding import read_records
+            from crest4.dereplicate import record_id
+            order = {record_id(text): record_id(text)
+                     for text, length in read_records(self.fasta)}
+        # VSEARCH entirely forgets about sequences that had no hits #
+        def missing(seq_id): return Query(self, QueryHits(seq_id))
+        # Identical sequences get the same assignment as the first one #
+        for seq_id, query in in_order(queries, order, missing):
+            if seq_id == query.name: yield query
+            else: yield query.renamed(seq_id)
+
     #------------------------------- Outputs ---------------------------------#
     @cached_property
     def out_file(self):
@@ -342,7 +1241,27 @@ class Classify:
         # Make sure that the output directory exists #
         self.output_dir.create_if_not_exists()
         # Return #
-        return self.output_dir + "assignments.txt"
+        return self.output_dir + "assignments.txt" + self.zip_extension
+
+    def write_progressively(self):
+        """
+        Write the assignments file one line at a time while the search is
+        running, so that the results obtained so far can already be looked
+        at. The file is flushed at the end of every line.
+        """
+        with open(self.out_file, 'wt', buffering=1) as handle:
+            for query in self.progressive_queries():
+                handle.write(query.tax_string)
+        # Return #
+        return self.out_file
+
+    def write_assignments(self, queries):
+        """Write the assignments file, compressed if it was requested."""
+        from crest4.compression import open_text
+        with open_text(self.out_file, 'wt') as handle:
+            handle.writelines(query.tax_string for query in queries)
+        # Return #
+        return self.out_file
 
     @cached_property
     def otu_info(self):
@@ -355,15 +1274,11 @@ class Classify:
         # Intro message #
         print('Running crest4 version ' + crest4.__version__)
         # Iterate #
-        self.out_file.writelines(query.tax_string for query in self.queries)
+        if self.progressive: self.write_progressively()
+        else: self.write_assignments(self.queries)
         # Special case where an OTU table was passed #
         if self.otu_table:
-            path_by_rank    = self.output_dir + 'otus_by_rank.tsv'
-            path_cumulative = self.output_dir + 'otus_cumulative.tsv'
-            otus_by_rank    = self.otu_info.otus_by_rank
-            otus_cumulative = self.otu_info.otus_cumulative
-            otus_by_rank.to_csv(path_by_rank, index=False, sep='\t')
-            otus_cumulative.to_csv(path_cumulative, index=False, sep='\t')
+            self.otu_info.write(self.output_dir, self.zip_extension)
         # Print a success message #
         msg = "Classification ran successfully. Results are placed in '%s'."
         print(msg % self.out_file)
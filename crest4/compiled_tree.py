@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import re
+
+# Constants #
+newick_tokens = re.compile(r"""
+    '((?:[^']|'')*)'         # A quoted name
+  | (\[[^\]]*\])             # A comment
+  | (:[^(),;\[\]]*)          # A branch length
+  | ([(),;])                 # A structural character
+  | ([^(),;:\[\]']+)         # An unquoted name
+""", re.VERBOSE)
+
+###############################################################################
+def parse_newick(path):
+    """
+    Parse a `.tre` file in the Newick format and return a dictionary of NumPy
+    arrays representing the tree. This is equivalent to loading the tree with
+    `ete4.Tree(path, parser=8)` but without creating a Python object for every
+    node. Only the names of the nodes are kept (both for leaves and for
+    internal nodes), branch lengths and comments are skipped.
+
+    The nodes are numbered in preorder, hence the root is always `0` and every
+    parent comes before its children.
+    """
+    import numpy
+    # Read the whole file #
+    with open(path, 'rt') as handle: text = handle.read()
+    # The three properties of every node #
+    parent = [-1]
+    depth  = [0]
+    names  = ['']
+    # The node we are currently adding information to #
+    current = 0
+    # Iterate over every token #
+    for quoted, comment, length, char, name in newick_tokens.findall(text):
+        # Descend to a new first child #
+        if char == '(':
+            parent.append(current)
+            depth.append(depth[current] + 1)
+            names.append('')
+            current = len(names) - 1
+        # Move to a new sibling #
+        elif char == ',':
+            up = parent[current]
+            parent.append(up)
+            depth.append(depth[up] + 1)
+            names.append('')
+            current = len(names) - 1
+        # Go back up to the parent #
+        elif char == ')':
+            current = parent[current]
+        # The end of the tree #
+        elif char == ';':
+            break
+        # Give the current node its name #
+        elif quoted:
+            names[current] = quoted.replace("''", "'")
+        elif name.strip():
+            names[current] = name.strip()
+    # Convert to arrays #
+    parent = numpy.array(parent, dtype=numpy.int32)
+    depth  = numpy.array(depth,  dtype=numpy.int32)
+    names  = numpy.array(names,  dtype=str)
+    # Sort the names to be able to find nodes by binary search. In case of
+    # duplicate names, the node closest to the root comes first, which is
+    # the same one that `ete4` would find with its level-order traversal #
+    index = numpy.arange(len(names))
+    order = numpy.lexsort((index, depth, names)).astype(numpy.int32)
+    # Return #
+    return {'parent':       parent,
+            'depth':        depth,
+            'names':        names,
+            'sorted_names': names[order],
+            'name_order':   order}
+
+###############################################################################
+class CompiledTree:
+    """
+    A compact representation of the tree of a database that consists only of
+    a few NumPy arrays instead of an ete4 object graph:
+
+    * `parent`: the index of the parent of every node (`-1` for the root).
+    * `depth`: the number of steps between every node and the root.
+    * `names`: the name of every node, such as '1494'.
+    * `sorted_names` and `name_order`: a name-to-index map that is searched
+      by bisection.
+
+    Nodes are represented by their integer index in these arrays, and the
+    root is always at index `0`.
+    """
+
+    def __init__(self, arrays):
+        # The arrays, typically memory-mapped from a cache file #
+        self.arrays       = arrays
+        self.parent       = arrays['parent']
+        self.depth        = arrays['depth']
+        self.names        = arrays['names']
+        self.sorted_names = arrays['sorted_names']
+        self.name_order   = arrays['name_order']
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object with %i nodes>"
+        return msg % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.parent)
+
+    #------------------------------- Methods ---------------------------------#
+    def index(self, name):
+        """
+        Return the index of the node that has the given name.
+        If several nodes share that name, the one closest to the root is
+        returned.
+        """
+        import numpy
+        pos = int(numpy.searchsorted(self.sorted_names, name))
+        if pos == len(self.sorted_names) or self.sorted_names[pos] != name:
+            raise LookupError(f"Node {name!r} not found in the tree.")
+        return int(self.name_order[pos])
+
+    def name(self, node):
+        """Return the name of the node at the given index."""
+        return str(self.names[node])
+
+    def up(self, node):
+        """Return the parent of the given node or `None` for the root."""
+        up = int(self.parent[node])
+        return None if up < 0 else up
+
+    def is_root(self, node):
+        return self.parent[node] < 0
+
+    def ancestors(self, node):
+        """Return the list of ancestors of a node, going up to the root."""
+        result = []
+        node = int(self.parent[node])
+        while node >= 0:
+            result.append(node)
+            node = int(self.parent[node])
+        return result
+
+    def common_ancestor(self, nodes):
+        """
+        Return the lowest common ancestor of the given nodes, which can be
+        given either as indices or as names.
+        """
+        # Convert names to indices #
+        nodes = [self.index(n) if isinstance(n, str) else n for n in nodes]
+        # Walk up the tree pairwise #
+        parent, depth = self.parent, self.depth
+        result = nodes[0]
+        for node in nodes[1:]:
+            while depth[result] > depth[node]: result = parent[result]
+            while depth[node] > depth[result]: node = parent[node]
+            while result != node:
+                result = parent[result]
+                node   = parent[node]
+        # Return #
+        return int(result)
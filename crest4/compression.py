@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, stat, shutil, tempfile, threading, contextlib
+
+# The extensions of the compressed files that are recognized #
+compressions = ('.gz', '.bz2', '.zst')
+
+###############################################################################
+def compression(path):
+    """
+    The extension of a compressed file, for instance '.gz', or an empty
+    string if the file at `path` is not compressed.
+    """
+    for extension in compressions:
+        if str(path).endswith(extension): return extension
+    return ''
+
+def is_compressed(path):
+    """Check if a file is compressed, judging by its extension."""
+    return bool(compression(path))
+
+def strip_compression(path):
+    """The path without the extension of the compression if there is one."""
+    extension = compression(path)
+    if extension: return str(path)[:-len(extension)]
+    return str(path)
+
+def open_text(path, mode='rt'):
+    """
+    Open a plain or compressed text file, for reading or writing. The
+    compression is chosen according to the extension of the file: `.gz`,
+    `.bz2` or `.zst`. The latter needs the `zstandard` module.
+    """
+    path, extension = str(path), compression(path)
+    if extension == '.gz':
+        import gzip
+        return gzip.open(path, mode)
+    if extension == '.bz2':
+        import bz2
+        return bz2.open(path, mode)
+    if extension == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            msg = "Reading or writing the file '%s' requires the" \
+                  " `zstandard` module. Install it with `pip install" \
+                  " zstandard`."
+            raise ImportError(msg % path)
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+###############################################################################
+def make_fifo(directory, name):
+    """
+    Create a named pipe in a new temporary directory inside `directory`,
+    and return its path. External programs can open it like a file.
+    """
+    os.makedirs(str(directory), exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix='pipe_', dir=str(directory))
+    path = os.path.join(temp_dir, name)
+    os.mkfifo(path)
+    return path
+
+def remove_fifo(path):
+    """Remove a named pipe and the temporary directory containing it."""
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+def release(thread, fifo, flags):
+    """
+    Wait for a thread copying data to or from a named pipe. If the other
+    side never opened the pipe, for instance because the program stopped
+    with an error, the thread would block forever, so the other side is
+    briefly opened with the given `flags` to let it finish.
+    """
+    while thread.is_alive():
+        try: os.close(os.open(fifo, flags | os.O_NONBLOCK))
+        except OSError: pass
+        thread.join(0.1)
+
+@contextlib.contextmanager
+def decompressed(path, directory):
+    """
+    Give the path to a plain version of the compressed file at `path`,
+    which can be used as input for an external program. This is a named
+    pipe created in `directory` that a background thread fills with the
+    decompressed text, so nothing is written to the disk. Plain files are
+    given as they are.
+
+        with decompressed('reads.fasta.gz', 'out/') as fasta:
+            run_some_program(fasta)
+    """
+    # Nothing to do #
+    if not is_compressed(path):
+        yield path
+        return
+    # Open the source now so that errors are raised here #
+    source = open_text(path, 'rt')
+    fifo   = make_fifo(directory, os.path.basename(strip_compression(path)))
+    errors = []
+    def feed():
+        try:
+            with source, open(fifo, 'wt') as sink:
+                shutil.copyfileobj(source, sink)
+        # The program stopped reading before the end #
+        except BrokenPipeError: pass
+        except Exception as error: errors.append(error)
+    thread = threading.Thread(target=feed, daemon=True)
+    thread.start()
+    try:
+        yield fifo
+    finally:
+        release(thread, fifo, os.O_RDONLY)
+        remove_fifo(fifo)
+    # Any error while decompressing #
+    if errors: raise errors[0]
+
+def searchable_fasta(path):
+    """
+    Return a `FASTA` object for the path given by `decompressed`, which can
+    be searched with the `seqsearch` module. That module refuses to search
+    a file that is empty, judging by its size, but the size of a named pipe
+    is always zero. So in that case, the object always counts as not empty.
+    """
+    from fasta import FASTA
+    if not stat.S_ISFIFO(os.stat(str(path)).st_mode): return FASTA(path)
+    class PipedFASTA(FASTA):
+        def __bool__(self): return True
+    return PipedFASTA(path)
+
+@contextlib.contextmanager
+def compressing(path, directory):
+    """
+    Give the path where an external program can write its output so that
+    it ends up compressed in the file at `path`, according to its
+    extension. This is a named pipe created in `directory` that a
+    background thread reads and compresses, so the plain text is never
+    written to the disk. Plain files are given as they are.
+    """
+    # Nothing to do #
+    if not is_compressed(path):
+        yield path
+        return
+    # Open the destination now so that errors are raised here #
+    sink   = open_text(path, 'wt')
+    fifo   = make_fifo(directory, os.path.basename(strip_compression(path)))
+    errors = []
+    def drain():
+        try:
+            with sink, open(fifo, 'rt') as source:
+                shutil.copyfileobj(source, sink)
+        except Exception as error: errors.append(error)
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    try:
+        yield fifo
+    finally:
+        release(thread, fifo, os.O_WRONLY)
+        remove_fifo(fifo)
+    # Any error while compressing #
+    if errors: raise errors[0]
@@ -17,7 +17,6 @@ import crest4
 from autopaths.dir_path  import DirectoryPath
 from autopaths.file_path import FilePath
 from plumbing.cache      import property_cached
-from plumbing.scraping   import download_from_url, retrieve_from_url
 
 ###############################################################################
 class CrestMetadata:
@@ -59,6 +58,7 @@ class CrestMetadata:
         >>> print(metadata.db_urls['silvamod138']['url'])
         """
         # Download the gist #
+        from plumbing.scraping import retrieve_from_url
         content = retrieve_from_url(self.metadata_url)
         # Parse it #
         data = json.loads(content)
@@ -70,6 +70,19 @@ class CrestMetadata:
 # The metadata should very rarely be updated -- we create a singleton #
 metadata = CrestMetadata()
 
+###############################################################################
+def hash_file(path, block=1024*1024):
+    """
+    Return the SHA-256 digest of the whole file at `path` as an array of
+    bytes, reading it one block at a time.
+    """
+    import hashlib, numpy
+    digest = hashlib.sha256()
+    with open(str(path), 'rb') as handle:
+        for chunk in iter(lambda: handle.read(block), b''):
+            digest.update(chunk)
+    return numpy.frombuffer(digest.digest(), dtype=numpy.uint8)
+
 ###############################################################################
 class CrestDatabase:
     """
@@ -140,6 +153,70 @@ class CrestDatabase:
         """A simple representation of this object to avoid memory addresses."""
         return "<%s object at '%s'>" % (self.__class__.__name__, self.path)
 
+    def __getstate__(self):
+        """
+        When a database is sent to another process, for instance a worker of
+        a `multiprocessing` pool, only its location on disk is pickled.
+        None of the loaded structures are copied over. Instead, the worker
+        will memory-map the same cache files as the parent process, so that
+        all processes share the same pages of memory (see `preload`).
+        """
+        state = self.__dict__.copy()
+        cache = state.pop('__cache__', {})
+        # Custom databases are never downloaded, remember that #
+        if 'downloaded' in cache:
+            state['__cache__'] = {'downloaded': cache['downloaded']}
+        return state
+
+    def preload(self):
+        """
+        Build, if needed, and open all the array-backed structures that the
+        taxonomic assignment relies on. These are the compiled tree, the
+        lowest common ancestor table, the accession index and the node
+        tables. Returns the database itself.
+
+        Call this once in the parent process before fanning out the work to
+        several processes. Every worker then attaches to the cache files
+        without copying or rebuilding anything, and never needs to load the
+        `tree`, `node_to_name` or `acc_to_node` attributes. Example:
+
+            >>> db = crest4.databases.ssuome.preload()
+            >>> with multiprocessing.Pool(8) as pool:
+            >>>     pool.starmap(classify_chunk, [(db, c) for c in chunks])
+        """
+        # Download the database if it has not been done already #
+        if not self.downloaded: self.download()
+        # Load every structure #
+        self.compiled_tree, self.lca, self.acc_index, self.node_tables
+        # Return #
+        return self
+
+    def prepare(self, search_algo=('blast', 'vsearch')):
+        """
+        Build ahead of time everything that a classification could need:
+        the search indexes for the given algorithms, as well as the cache
+        files of the tree, the names and the map. These are built in
+        parallel, since the indexes are made by external programs while the
+        cache files are made in python. Returns the database itself.
+
+        It is safe to call this from several processes at once, as each
+        part is only built by one of them while the others wait.
+        """
+        # Download the database if it has not been done already #
+        if not self.downloaded: self.download()
+        # Everything that can be built at the same time #
+        tasks = [self.preload]
+        if 'blast'   in search_algo: tasks.append(lambda: self.blast_db)
+        if 'vsearch' in search_algo: tasks.append(lambda: self.vsearch_db)
+        if 'kmer'    in search_algo: tasks.append(lambda: self.kmer_db)
+        # Run them and raise any exception that happened #
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+            futures = [pool.submit(task) for task in tasks]
+            for future in futures: future.result()
+        # Return #
+        return self
+
     @property
     def tag(self):
         """
@@ -158,6 +235,24 @@ class CrestDatabase:
         """The path to the FASTA file."""
         return self.base_dir + self.dir_name + '/' + self.file_name + '.fasta'
 
+    @property_cached
+    def fingerprint(self):
+        """
+        A short string that changes whenever the sequences of the database
+        change, used to know if search results from previous runs are still
+        valid. It is a hash of the whole FASTA file, which is only computed
+        once and then saved next to it, until the file changes size or
+        modification time.
+        """
+        # Make sure the file is there #
+        if not self.downloaded: self.download()
+        # Build or load the hash #
+        from crest4.array_cache import ArrayCache
+        cache = ArrayCache(self.path + '.fingerprint.cache', [self.path])
+        digest = cache.get(lambda: {'digest': hash_file(self.path)})
+        # Return #
+        return bytes(digest['digest']).hex()[:16]
+
     @property_cached
     def downloaded(self):
         """
@@ -182,10 +277,39 @@ class CrestDatabase:
         # Get the URL #
         return metadata.db_urls[self.dir_name]['url']
 
-    def download(self):
+    @property
+    def sha256(self):
+        """
+        The SHA-256 checksum of the database file to download, if one is
+        listed in the metadata file. Otherwise, returns `None`.
         """
-        Download the database file, uncompress it, and save it to disk.
+        return metadata.db_urls[self.dir_name].get('sha256')
+
+    def download(self, url=None, sha256=None):
         """
+        Download the database file, and uncompress it to disk at the same
+        time. If the download gets interrupted, the part already received
+        is kept next to the tarball, and calling this method again will
+        resume it instead of starting over. The checksum is verified before
+        anything is put in place.
+
+        By default, the URL and checksum come from the metadata file, but
+        they can also be specified here.
+        """
+        # Only one process downloads while the others wait #
+        from crest4.locking import FileLock
+        with FileLock(self.tarball + '.lock', "the '%s' database" % self.tag):
+            # Another process might have done it while we were waiting #
+            del self.downloaded
+            if self.downloaded: return
+            # Download #
+            self.download_unlocked(url, sha256)
+        # Check it worked #
+        del self.downloaded
+        assert self.downloaded
+
+    def download_unlocked(self, url=None, sha256=None):
+        """The actual download, see the `download` method above."""
         # Compose a message so the user knows why it's taking time #
         message = "The database '%s' has not been downloaded yet." \
                   " This process will start now and might take some time" \
@@ -196,24 +320,20 @@ class CrestDatabase:
         # Display the message with style in a box #
         from plumbing.common import rich_panel_print
         rich_panel_print(message, "Large Download")
-        # Show a progress bar a bit like wget #
-        download_from_url(self.url,
-                          destination = self.tarball,
-                          uncompress  = False,
-                          user_agent  = "crest4 v" + crest4.__version__,
-                          stream      = True,
-                          progress    = True,
-                          desc        = self.dir_name)
-        # Uncompress #
-        self.tarball.untargz_to(self.base_dir)
-        # Remove tarball #
-        self.tarball.remove()
+        # Default URL and checksum #
+        if url is None: url, sha256 = self.url, sha256 or self.sha256
+        # Download and uncompress, showing a progress bar a bit like wget #
+        from crest4.download import download_and_extract
+        download_and_extract(url,
+                             destination = self.base_dir,
+                             spool       = self.tarball + '.part',
+                             sha256      = sha256,
+                             user_agent  = "crest4 v" + crest4.__version__,
+                             progress    = True,
+                             desc        = self.dir_name)
         # Remove macOS attribute files that get bundled in the tar #
         for path in self.base_dir.flat_files:
             if path.name.startswith("._"): path.remove()
-        # Check it worked #
-        del self.downloaded
-        assert self.downloaded
 
     #--------------------------- Specific Indexes ----------------------------#
     @property_cached
@@ -227,8 +347,11 @@ class CrestDatabase:
         # Create the database object #
         from seqsearch.search.blast import BLASTdb
         db = BLASTdb(self.path, seq_type='nucl')
-        # Create the database with `mkblastdb` if it's not made already #
-        db.create_if_not_exists(verbose=True)
+        # Create the database with `makeblastdb` if it's not made already #
+        from crest4.locking import FileLock
+        if not self.blast_marker.exists:
+            with FileLock(self.path + '.blast.lock', "the BLAST index"):
+                if not self.blast_marker.exists: self.make_blast_db(db)
         # Return #
         return db
 
@@ -244,10 +367,87 @@ class CrestDatabase:
         from seqsearch.search.vsearch import VSEARCHdb
         db = VSEARCHdb(self.path.replace_extension('udb'))
         # Create the database with `vsearch` if it's not made already #
-        db.create_if_not_exists(verbose=True)
+        from crest4.locking import FileLock
+        if not db:
+            with FileLock(db + '.lock', "the VSEARCH index"):
+                if not db: self.make_vsearch_db(db)
         # Return #
         return db
 
+    @property_cached
+    def kmer_db(self):
+        """
+        Return a `KmerIndex` object that can be used for the sequence
+        similarity search without any external program. Its arrays are
+        computed from the `.fasta` file the first time and saved next to it.
+        On later loads, they are simply memory-mapped.
+        """
+        # Download the database if it has not been done already #
+        if not self.downloaded: self.download()
+        # Build or load the index #
+        from crest4.kmer import KmerIndex, build_kmer_index
+        from crest4.array_cache import ArrayCache
+        cache = ArrayCache(self.path + '.kmer.cache', [self.path], version=2)
+        return KmerIndex(cache.get(lambda: build_kmer_index(self.path)))
+
+    @property_cached
+    def exact_db(self):
+        """
+        Return an `ExactIndex` object that finds the sequences of the
+        database that are identical to a given sequence, by their hash.
+        It is built from the `.fasta` file the first time and saved next to
+        it. On later loads, it is simply memory-mapped.
+        """
+        # Download the database if it has not been done already #
+        if not self.downloaded: self.download()
+        # Build or load the index #
+        from crest4.exact import ExactIndex, build_exact_index
+        from crest4.array_cache import ArrayCache
+        cache = ArrayCache(self.path + '.exact.cache', [self.path])
+        return ExactIndex(cache.get(lambda: build_exact_index(self.path)))
+
+    @property
+    def blast_marker(self):
+        """
+        The empty file written once the BLAST index is complete. Without it,
+        any index files present might come from an interrupted run.
+        """
+        return FilePath(self.path + '.blast.done')
+
+    def make_blast_db(self, db):
+        """
+        Run `makeblastdb` to create the index under a temporary name. Every
+        file written is then renamed into place, and the `blast_marker` is
+        created last, so that an interrupted run can never leave a partial
+        index behind that would look complete.
+        """
+        import glob, subprocess
+        print("Calling `makeblastdb` on '%s'..." % db)
+        temp_path = str(db) + '.%i.tmp' % os.getpid()
+        try:
+            subprocess.run(['makeblastdb', '-in', str(db), '-dbtype', 'nucl',
+                            '-out', temp_path],
+                           check=True, stdout=subprocess.DEVNULL)
+            for path in glob.glob(glob.escape(temp_path) + '.*'):
+                os.replace(path, str(db) + path[len(temp_path):])
+            self.blast_marker.touch()
+        finally:
+            for path in glob.glob(glob.escape(temp_path) + '*'):
+                os.remove(path)
+
+    def make_vsearch_db(self, db):
+        """
+        Run `vsearch` to create the index, writing to a temporary file that
+        is renamed at the end, so that an interrupted run can never leave a
+        partial index behind that would look complete.
+        """
+        temp_path = db + '.%i.tmp' % os.getpid()
+        try:
+            db.makedb(output=temp_path, verbose=True)
+            os.replace(temp_path, db)
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+
     #--------------------------- Loading the tree ----------------------------#
     @property_cached
     def tree(self):
@@ -259,6 +459,59 @@ class CrestDatabase:
         from ete4 import Tree
         return Tree(str(self.path.replace_extension('tre')), parser=8)
 
+    @property_cached
+    def compiled_tree(self):
+        """
+        The same tree as above, but represented as a few NumPy arrays instead
+        of an ete4 object graph (see the `CompiledTree` class). The arrays are
+        computed from the `.tre` file the first time and saved next to it.
+        On later loads, they are simply memory-mapped, which is much faster
+        than parsing the Newick file again.
+        """
+        from crest4.compiled_tree import CompiledTree, parse_newick
+        from crest4.array_cache import ArrayCache
+        path  = self.path.replace_extension('tre')
+        cache = ArrayCache(path + '.cache', [path])
+        return CompiledTree(cache.get(lambda: parse_newick(path)))
+
+    @property_cached
+    def node_index(self):
+        """
+        A dictionary linking node names (as found in the `.map` and `.names`
+        files) to their index in the compiled tree. This is built only once
+        and gives constant-time lookups, instead of traversing the whole tree
+        every time a node has to be found by name.
+        Example: '1494' -> 1493
+        """
+        tree  = self.compiled_tree
+        names = tree.sorted_names.tolist()
+        order = tree.name_order.tolist()
+        # In case of duplicates, the first one in the sorted order wins #
+        return dict(zip(reversed(names), reversed(order)))
+
+    @property_cached
+    def lca(self):
+        """
+        An object able to find the lowest common ancestor of any set of
+        nodes of the compiled tree in constant time (see the `LCAEngine`
+        class). Its sparse table is cached next to the `.tre` file as well.
+        """
+        from crest4.lca import LCAEngine, build_sparse_table
+        from crest4.array_cache import ArrayCache
+        tree  = self.compiled_tree
+        path  = self.path.replace_extension('tre')
+        cache = ArrayCache(path + '.lca.cache', [path])
+        build = lambda: {'table': build_sparse_table(tree.depth)}
+        return LCAEngine(tree, cache.get(build)['table'])
+
+    def find_node(self, name):
+        """Return the index of the node in the compiled tree with this name."""
+        node = self.node_index.get(name)
+        if node is None:
+            msg = "The node '%s' was not found in the tree."
+            raise LookupError(msg % name)
+        return node
+
     @property_cached
     def node_to_name(self):
         """
@@ -277,6 +530,26 @@ class CrestDatabase:
         # Create a dictionary #
         with open(path, 'rt') as handle: return dict(parse_lines(handle))
 
+    @property_cached
+    def node_tables(self):
+        """
+        Using the `.names` file along with the compiled tree, we precompute
+        for every node its taxonomic name, its full lineage string, its rank
+        index and its minimum similarity as a float (see the `NodeTables`
+        class). These are built the first time and saved next to the
+        `.names` file. On later loads, they are simply memory-mapped.
+        Example: node_tables.smlrty[1493] -> 0.97
+        """
+        from crest4.node_tables import NodeTables, build_node_tables
+        from crest4.array_cache import ArrayCache
+        tree  = self.compiled_tree
+        path  = self.path.replace_extension('names')
+        cache = ArrayCache(path + '.cache',
+                           [path, self.path.replace_extension('tre')])
+        max_rank = len(self.rank_names) - 1
+        build = lambda: build_node_tables(tree, path, max_rank)
+        return NodeTables(cache.get(build))
+
     @property_cached
     def acc_to_node(self):
         """
@@ -301,6 +574,33 @@ class CrestDatabase:
         # Create a dictionary #
         with open(path, 'rt') as handle: return dict(parse_lines(handle))
 
+    @property_cached
+    def acc_index(self):
+        """
+        A compact replacement for the `acc_to_node` dictionary above that
+        links accession strings directly to node indices in the compiled
+        tree (see the `AccessionIndex` class). It is built from the `.map`
+        file the first time and saved next to it. On later loads, it is
+        memory-mapped and searched by bisection, so it costs almost nothing
+        in memory.
+        Example: HQ191339 -> 28385
+        """
+        from crest4.accessions import AccessionIndex, build_accession_index
+        from crest4.array_cache import ArrayCache
+        # Get the path of the file #
+        path = self.path.replace_extension('map')
+        # Check that it exists #
+        if not path.exists:
+            msg = ("The file '%s' does not exist. "
+                   "Contents of the parent directory:\n%s")
+            contents = '- ' + '\n- '.join(path.directory.flat_files)
+            raise FileNotFoundError(msg % (path, contents))
+        # The cache depends on the tree too, because it stores node indices #
+        tree  = self.path.replace_extension('tre')
+        cache = ArrayCache(path + '.cache', [path, tree])
+        build = lambda: build_accession_index(path, self.node_index)
+        return AccessionIndex(cache.get(build))
+
     #----------------------------- Sanity checks -----------------------------#
     # See file `analyze_tre_files.py` in the `crest4_utils` repository.
     pass
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import hashlib
+
+# Internal modules #
+from crest4.sharding import read_records
+from crest4.compression import open_text
+
+###############################################################################
+def record_id(text):
+    """The ID of a FASTA record, which is the first word of its header."""
+    words = text[1:].split('\n', 1)[0].split()
+    return words[0] if words else ''
+
+def record_digest(text):
+    """
+    A hash of the sequence of a FASTA record that does not depend on its
+    header, on the line breaks or on the case of the letters.
+    """
+    sequence = ''.join(text.split('\n', 1)[1].split()).upper()
+    return hashlib.sha1(sequence.encode()).digest()
+
+def find_representatives(path):
+    """
+    For every sequence of the FASTA file at `path`, find the first sequence
+    of the file that is identical to it. Returns a dictionary with the ID of
+    every sequence as keys, in the original order, and the ID of the first
+    identical sequence as values (which is itself when it is the first).
+    """
+    first  = {}
+    result = {}
+    for text, length in read_records(path):
+        seq_id = record_id(text)
+        result[seq_id] = first.setdefault(record_digest(text), seq_id)
+    return result
+
+def write_representatives(path, representatives, out_path):
+    """
+    Write to `out_path` only the sequences of the FASTA file at `path` that
+    are the first of their kind, as found by `find_representatives`.
+    """
+    with open_text(out_path, 'wt') as handle:
+        for text, length in read_records(path):
+            seq_id = record_id(text)
+            if representatives.get(seq_id) == seq_id: handle.write(text)
+    # Return #
+    return out_path
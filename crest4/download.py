@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time, shutil, hashlib, tarfile
+
+###############################################################################
+class ResumableStream:
+    """
+    A read-only file-like object that returns the bytes of a remote file,
+    so that it can be given directly to the `tarfile` module for extraction
+    while the download is still going on.
+
+    Every byte received is also appended to a local `spool` file. If that
+    file already exists from an interrupted download, its content is
+    returned first, and only the missing part is requested from the server
+    with an HTTP `Range` header. The same happens if the connection drops in
+    the middle of the transfer, up to `retries` times in a row.
+
+    The SHA-256 checksum of the whole file is computed along the way.
+    """
+
+    # The size of the pieces we read from the network #
+    block_size = 512 * 1024
+
+    def __init__(self, url, spool, user_agent=None, retries=5,
+                 progress=False, desc=None):
+        # Save attributes #
+        self.url        = url
+        self.spool      = str(spool)
+        self.user_agent = user_agent
+        self.retries    = retries
+        self.progress   = progress
+        self.desc       = desc
+        # The checksum and the current position in the remote file #
+        self.sha256   = hashlib.sha256()
+        self.position = 0
+        # The last piece received and how much of it was read already #
+        self.buffer = b''
+        self.offset = 0
+        # The file we are reading from disk, then the one we append to #
+        self.existing = None
+        self.output   = None
+        self.chunks   = None
+        self.total    = None
+        self.bar      = None
+        self.done     = False
+        # Bytes to drop if the server sends us the whole file again #
+        self.skip = 0
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.url)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the files and the connection."""
+        if self.existing is not None: self.existing.close()
+        if self.output   is not None: self.output.close()
+        if self.bar      is not None: self.bar.close()
+        self.existing = self.output = self.bar = None
+
+    @property
+    def checksum(self):
+        """The hexadecimal SHA-256 digest of everything read so far."""
+        return self.sha256.hexdigest()
+
+    #------------------------------- Network ---------------------------------#
+    def connect(self):
+        """
+        Send the request for the bytes we are missing and prepare to read
+        the response. Returns `False` if there is nothing left to download.
+        """
+        import requests
+        # Headers #
+        headers = {}
+        if self.user_agent is not None: headers['User-Agent'] = self.user_agent
+        if self.position: headers['Range'] = 'bytes=%i-' % self.position
+        # Request #
+        response = requests.get(self.url, headers=headers, stream=True,
+                                timeout=60)
+        # The file was already complete #
+        if response.status_code == 416 and self.position:
+            response.close()
+            return False
+        response.raise_for_status()
+        # The server ignored the range, so we skip what we already have #
+        self.skip = 0
+        if self.position and response.status_code != 206:
+            self.skip = self.position
+        # Determine the total size for the progress bar #
+        length = response.headers.get('content-length')
+        if length is not None:
+            self.total = self.position - self.skip + int(length)
+        self.show_progress()
+        # Read the body piece by piece #
+        self.chunks = response.iter_content(chunk_size=self.block_size)
+        return True
+
+    def show_progress(self):
+        """Create a progress bar a bit like wget, if it was requested."""
+        if not self.progress or self.bar is not None: return
+        from tqdm import tqdm
+        bar = '{l_bar}{bar}| {n_fmt}/{total_fmt} [{remaining}, ' \
+              '{rate_fmt}{postfix}]'
+        self.bar = tqdm(bar_format = bar,
+                        desc       = self.desc,
+                        total      = self.total,
+                        initial    = self.position,
+                        unit       = 'B',
+                        unit_scale = True)
+
+    def receive(self):
+        """
+        Return the next piece of the response that we don't already have.
+        Returns empty bytes at the end, and raises `ConnectionError` if the
+        server closed the connection before sending everything.
+        """
+        while True:
+            data = next(self.chunks, b'')
+            # Drop the bytes that the spool file already gave us #
+            if self.skip and data:
+                dropped, data = data[:self.skip], data[self.skip:]
+                self.skip -= len(dropped)
+                if not data: continue
+            # Check the response was complete #
+            if not data and self.total and self.position < self.total:
+                msg = "The connection to '%s' was closed early."
+                raise ConnectionError(msg % self.url)
+            return data
+
+    def fetch(self):
+        """Return the next piece of the file, or empty bytes at the end."""
+        import requests
+        # First, the bytes from a previous attempt #
+        if self.output is None:
+            if os.path.exists(self.spool):
+                self.existing = open(self.spool, 'rb')
+            self.output = open(self.spool, 'ab')
+        if self.existing is not None:
+            data = self.existing.read(self.block_size)
+            if data: return data
+            self.existing.close()
+            self.existing = None
+        # Then, the bytes from the network, reconnecting if needed #
+        errors = (ConnectionError, requests.RequestException)
+        failures = 0
+        while not self.done:
+            try:
+                if self.chunks is None and not self.connect(): data = b''
+                else: data = self.receive()
+            except errors as error:
+                # Errors like "404 Not Found" won't go away by retrying #
+                response = getattr(error, 'response', None)
+                if response is not None and response.status_code < 500: raise
+                failures += 1
+                if failures > self.retries: raise
+                self.chunks = None
+                time.sleep(min(2 ** failures, 30) / 10)
+                continue
+            # Keep the bytes in the spool file #
+            if not data: self.done = True
+            self.output.write(data)
+            if self.bar is not None: self.bar.update(len(data))
+            return data
+        # The end #
+        return b''
+
+    #------------------------------- Reading ---------------------------------#
+    def read(self, size=-1):
+        """Standard file-like interface used by `tarfile`."""
+        pieces = []
+        while size != 0:
+            # Get a new piece when the current one is used up #
+            if self.offset >= len(self.buffer):
+                self.buffer, self.offset = self.fetch(), 0
+                if not self.buffer: break
+                self.sha256.update(self.buffer)
+                self.position += len(self.buffer)
+            # Take as much as we need from it #
+            end = len(self.buffer) if size < 0 else self.offset + size
+            piece = self.buffer[self.offset:end]
+            self.offset += len(piece)
+            if size > 0: size -= len(piece)
+            pieces.append(piece)
+        return b''.join(pieces)
+
+    def finish(self):
+        """Read until the end, in case the archive has trailing bytes."""
+        while self.read(self.block_size): pass
+        self.output.flush()
+
+###############################################################################
+def download_and_extract(url, destination, spool, sha256=None, **kwargs):
+    """
+    Download the `.tar.gz` file at `url` and extract it into the directory
+    `destination` at the same time, without ever writing the uncompressed
+    archive to disk.
+
+    The compressed bytes are kept in the `spool` file until the end, so
+    that an interrupted download can be resumed instead of starting over.
+    If `sha256` is given, the checksum of the download is verified before
+    anything is moved into `destination`. Extra keyword arguments are
+    passed on to `ResumableStream`.
+    """
+    # Everything is first extracted to a temporary directory #
+    destination = str(destination)
+    temporary = os.path.join(destination, '.extracting.%i' % os.getpid())
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    # Extract while downloading #
+    try:
+        with ResumableStream(url, spool, **kwargs) as stream:
+            with tarfile.open(fileobj=stream, mode='r|gz') as archive:
+                if hasattr(tarfile, 'data_filter'):
+                    archive.extractall(temporary, filter='data')
+                else:
+                    archive.extractall(temporary)
+            stream.finish()
+            checksum = stream.checksum
+        # Verify the checksum #
+        if sha256 is not None and checksum != sha256.lower():
+            os.remove(str(spool))
+            msg = "The file downloaded from '%s' is corrupted. Its SHA-256" \
+                  " checksum is '%s' instead of '%s'. Please try again."
+            raise ValueError(msg % (url, checksum, sha256))
+        # Move everything in place #
+        for name in os.listdir(temporary):
+            target = os.path.join(destination, name)
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target)
+            os.replace(os.path.join(temporary, name), target)
+    # Always remove what is left of the temporary directory #
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    # The spool file is not needed anymore #
+    if os.path.exists(str(spool)): os.remove(str(spool))
+    # Return #
+    return checksum
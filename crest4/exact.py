@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import array, hashlib
+
+# Internal modules #
+from crest4.sharding import read_records
+from crest4.dereplicate import record_id
+
+###############################################################################
+def hash_sequence(sequence):
+    """
+    Return two 64-bit integers computed from a 128-bit hash of a DNA
+    sequence, which does not depend on the case of the letters nor on the
+    use of `U` instead of `T`. The first is used as the sorting key and
+    the second to tell apart the extremely rare sequences that share the
+    same key.
+    """
+    sequence = sequence.upper().replace('U', 'T')
+    digest = hashlib.blake2b(sequence.encode(), digest_size=16).digest()
+    return (int.from_bytes(digest[:8], 'little'),
+            int.from_bytes(digest[8:], 'little'))
+
+def record_sequence(text):
+    """The sequence of a FASTA record on a single line."""
+    return ''.join(text.split('\n', 1)[1].split())
+
+def build_exact_index(path):
+    """
+    Read the FASTA file of a database and return a dictionary of NumPy
+    arrays sorted by the hash of every sequence, along with the name of
+    the sequence:
+
+    * `keys` and `checks`: the two parts of the hash (see `hash_sequence`).
+    * `name_data` and `name_offsets`: the name of every sequence, which is
+      the accession found in the `.map` file.
+
+    Identical sequences end up next to each other, in the order of the file.
+    """
+    import numpy
+    from crest4.node_tables import pack_strings
+    # Initialize #
+    keys, checks, names = array.array('Q'), array.array('Q'), []
+    # Parse the file #
+    for text, length in read_records(path):
+        key, check = hash_sequence(record_sequence(text))
+        keys.append(key)
+        checks.append(check)
+        names.append(record_id(text))
+    # Convert to arrays #
+    keys   = numpy.frombuffer(keys,   dtype=numpy.uint64)
+    checks = numpy.frombuffer(checks, dtype=numpy.uint64)
+    # Sort by hash while keeping the order of the file for equal hashes #
+    order = numpy.lexsort((numpy.arange(len(keys)), checks, keys))
+    name_data, name_offsets = pack_strings([names[i] for i in order])
+    # Return #
+    return {'keys':         keys[order],
+            'checks':       checks[order],
+            'name_data':    name_data,
+            'name_offsets': name_offsets}
+
+###############################################################################
+class ExactIndex:
+    """
+    An index of the sequences of a database by their hash, used to find
+    the references that are strictly identical to a given sequence without
+    any search. Like the `AccessionIndex`, it only holds sorted arrays of
+    64-bit hashes, typically memory-mapped from a cache file next to the
+    `.fasta` file, and lookups are done by bisection.
+    """
+
+    def __init__(self, arrays):
+        # The arrays, typically memory-mapped from a cache file #
+        self.arrays = arrays
+        self.keys   = arrays['keys']
+        self.checks = arrays['checks']
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object with %i sequences>"
+        return msg % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def name(self, i):
+        """The name of the sequence at the given position in the index."""
+        data    = self.arrays['name_data']
+        offsets = self.arrays['name_offsets']
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        return data[start:end].tobytes().decode()
+
+    def find(self, sequence):
+        """
+        Return the list of the names of all the sequences of the database
+        that are identical to the given one, in the order of the `.fasta`
+        file. The list is empty if there are none.
+        """
+        import numpy
+        key, check = hash_sequence(sequence)
+        key   = numpy.uint64(key)
+        start = int(numpy.searchsorted(self.keys, key, side='left'))
+        end   = int(numpy.searchsorted(self.keys, key, side='right'))
+        # Several sequences could share the same key in theory #
+        return [self.name(i) for i in range(start, end)
+                if self.checks[i] == check]
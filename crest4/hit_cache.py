@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, re, time, sqlite3
+
+# First party modules #
+from plumbing.cache import property_cached
+
+# Internal modules #
+from crest4.sharding import blast_footer
+
+# The multipliers accepted when giving a size, such as `500M` #
+size_units = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+###############################################################################
+def default_path():
+    """
+    The location of the cache file when the user doesn't specify one.
+    It is placed in the same directory as the databases.
+    """
+    from crest4.databases import CrestDatabase
+    base_dir = os.environ.get(CrestDatabase.environ_var,
+                              CrestDatabase.default_dir)
+    return os.path.join(os.path.expanduser(base_dir), 'hit_cache.sqlite')
+
+def parse_size(size):
+    """Convert a size like `500M` or `2G` to a number of bytes."""
+    match = re.match(r'^\s*([\d.]+)\s*([KMGT]?)i?B?\s*$', str(size).upper())
+    if match is None:
+        msg = "The size '%s' is not valid. Use a value like '500M' or '2G'."
+        raise ValueError(msg % size)
+    return int(float(match.group(1)) * size_units[match.group(2)])
+
+def format_size(size):
+    """Convert a number of bytes to a short human readable string."""
+    if size < 1024: return '%i B' % size
+    for unit in ('K', 'M', 'G', 'T'):
+        size /= 1024
+        if size < 1024 or unit == 'T': return '%.1f %siB' % (size, unit)
+
+###############################################################################
+def split_hits(path):
+    """
+    Read a file of search results and return a dictionary with the ID of
+    every query as keys and its results as values. These are the lines of
+    the file that concern that query, without the query name in them, so
+    that they can be given to another identical sequence later (see the
+    `render_hits` function). Works with both BLAST and VSEARCH outputs.
+    """
+    blocks, current = {}, None
+    with open(str(path), 'rt') as handle:
+        for line in handle:
+            # The line counting the queries is added back at the end #
+            if blast_footer.match(line.rstrip('\n')): continue
+            # BLAST starts every query with a few comment lines #
+            if line.startswith('# BLAST'):
+                current = [line]
+                continue
+            if line.startswith('# Query: '):
+                current.append('# Query:\n')
+                blocks[line[9:].split()[0]] = current
+                continue
+            if line.startswith('#'):
+                current.append(line)
+                continue
+            # Otherwise it is a hit, the name is the first column #
+            query, rest = line.split('\t', 1)
+            if current is None: target = blocks.setdefault(query, [])
+            else:               target = current
+            target.append('\t' + rest)
+    # Return #
+    return {query: ''.join(lines) for query, lines in blocks.items()}
+
+def render_hits(hits, seq_id, title):
+    """
+    The opposite of `split_hits`. Put back the name of a query into its
+    results so that they can be written to a search results file.
+    """
+    result = []
+    for line in hits.splitlines(keepends=True):
+        if line == '# Query:\n': line = '# Query: %s\n' % title
+        elif line.startswith('\t'): line = seq_id + line
+        result.append(line)
+    return ''.join(result)
+
+###############################################################################
+class HitCache:
+    """
+    Keeps the search results of every sequence between runs in a SQLite
+    file, so that a sequence that was already searched against the same
+    database, with the same algorithm and parameters, does not need to be
+    searched again.
+
+    Entries are keyed by a hash of the sequence itself, not by its name.
+    When the file grows above `max_size` bytes, the entries that were used
+    the least recently are removed.
+    """
+
+    # The default limit on the total size of the search results stored #
+    default_max_size = 1024**3
+
+    # Maximum number of values in a single SQL query #
+    batch_size = 500
+
+    def __init__(self, path=None, max_size=None):
+        # Default location #
+        if path is None: path = default_path()
+        self.path = os.path.abspath(os.path.expanduser(str(path)))
+        # Default size #
+        if max_size is None: max_size = self.default_max_size
+        self.max_size = parse_size(max_size)
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.path)
+
+    @property_cached
+    def connection(self):
+        """Open the database file, creating it the first time."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=300)
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS hits ("
+                               " digest BLOB, database TEXT, algorithm TEXT,"
+                               " params TEXT, hits TEXT, size INTEGER,"
+                               " used REAL,"
+                               " PRIMARY KEY (digest, database, algorithm,"
+                               " params))")
+            connection.execute("CREATE INDEX IF NOT EXISTS hits_used"
+                               " ON hits (used)")
+        return connection
+
+    def close(self):
+        """Close the database file."""
+        self.connection.close()
+        del self.connection
+
+    #------------------------------- Entries ---------------------------------#
+    def get(self, digests, key):
+        """
+        Return a dictionary with the search results of every sequence that
+        is found in the cache. The `digests` are the hashes of the sequences
+        and the `key` is a tuple of the database fingerprint, the algorithm
+        and the search parameters.
+        """
+        digests, result = list(digests), {}
+        now = time.time()
+        with self.connection as connection:
+            for i in range(0, len(digests), self.batch_size):
+                batch = digests[i:i + self.batch_size]
+                marks = ','.join('?' * len(batch))
+                where = "digest IN (%s) AND database=? AND algorithm=?" \
+                        " AND params=?" % marks
+                rows = connection.execute("SELECT digest, hits FROM hits"
+                                          " WHERE " + where, batch + list(key))
+                result.update((bytes(digest), hits) for digest, hits in rows)
+                # Remember they were used so that they are kept longer #
+                connection.execute("UPDATE hits SET used=? WHERE " + where,
+                                   [now] + batch + list(key))
+        return result
+
+    def put(self, items, key):
+        """
+        Store the search results of new sequences, given as a dictionary
+        with their hashes as keys. Older entries are then removed if the
+        cache has grown too large.
+        """
+        now = time.time()
+        overhead = sum(len(part) for part in key)
+        rows = [(digest, *key, hits, len(digest) + overhead + len(hits), now)
+                for digest, hits in items.items()]
+        with self.connection as connection:
+            connection.executemany("INSERT OR REPLACE INTO hits VALUES"
+                                   " (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.prune()
+
+    #------------------------------ Maintenance ------------------------------#
+    @property
+    def size(self):
+        """The approximate total size of the entries stored, in bytes."""
+        query = "SELECT COALESCE(SUM(size), 0) FROM hits"
+        return self.connection.execute(query).fetchone()[0]
+
+    def prune(self, max_size=None):
+        """
+        Remove the entries that were used the least recently until the
+        total size is below `max_size`. Returns the number of entries removed.
+        """
+        # Default value #
+        if max_size is None: max_size = self.max_size
+        max_size = parse_size(max_size)
+        # Check that there is something to do #
+        excess = self.size - max_size
+        if excess <= 0: return 0
+        # Pick the oldest entries until enough space is freed #
+        doomed, freed = [], 0
+        query = "SELECT rowid, size FROM hits ORDER BY used, rowid"
+        for rowid, size in self.connection.execute(query):
+            if freed >= excess: break
+            doomed.append((rowid,))
+            freed += size
+        # Delete #
+        with self.connection as connection:
+            connection.executemany("DELETE FROM hits WHERE rowid=?", doomed)
+        # Give the space back to the filesystem when emptied #
+        if max_size == 0: self.connection.execute("VACUUM")
+        # Return #
+        return len(doomed)
+
+    def stats(self):
+        """Return a dictionary describing what the cache contains."""
+        query = "SELECT database, algorithm, COUNT(*), SUM(size)" \
+                " FROM hits GROUP BY database, algorithm"
+        groups = [{'database': database, 'algorithm': algo,
+                   'entries': count, 'size': size}
+                  for database, algo, count, size
+                  in self.connection.execute(query)]
+        return {'path':      self.path,
+                'file_size': os.path.getsize(self.path),
+                'entries':   sum(group['entries'] for group in groups),
+                'size':      self.size,
+                'max_size':  self.max_size,
+                'groups':    groups}
+
+###############################################################################
+def cache_stats(cache_path=None):
+    """
+    Display how many search results are stored in the cache and how much
+    space they take.
+
+    Args:
+
+        cache_path: The path to the cache file. By default,
+                    `hit_cache.sqlite` in the directory where databases are
+                    stored.
+    """
+    cache = HitCache(cache_path)
+    # Nothing to do if it doesn't exist #
+    if not os.path.exists(cache.path):
+        print("There is no cache at '%s'." % cache.path)
+        return
+    # Print #
+    stats = cache.stats()
+    print("Cache file: %s (%s)" % (stats['path'],
+                                  format_size(stats['file_size'])))
+    print("Entries: %i (%s of search results, limit of %s)" %
+          (stats['entries'], format_size(stats['size']),
+           format_size(stats['max_size'])))
+    for group in stats['groups']:
+        print("  * database %s with %s: %i entries (%s)" %
+              (group['database'], group['algorithm'], group['entries'],
+               format_size(group['size'])))
+    # Return #
+    return stats
+
+def cache_prune(cache_path=None, max_size=None):
+    """
+    Remove the search results that were used the least recently from the
+    cache until it is below a given size.
+
+    Args:
+
+        cache_path: The path to the cache file. By default,
+                    `hit_cache.sqlite` in the directory where databases are
+                    stored.
+
+        max_size: The size that the search results stored should be brought
+                  under, for instance `500M` or `2G`. Pass `0` to empty the
+                  cache completely. By default, `1G`.
+    """
+    cache = HitCache(cache_path, max_size)
+    # Nothing to do if it doesn't exist #
+    if not os.path.exists(cache.path):
+        print("There is no cache at '%s'." % cache.path)
+        return 0
+    # Prune #
+    removed = cache.prune()
+    msg = "Removed %i entries from '%s', %s of search results remain."
+    print(msg % (removed, cache.path, format_size(cache.size)))
+    # Return #
+    return removed
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Internal modules #
+from crest4.sharding import blast_footer
+
+# The columns that BLAST writes, as requested in `Classify.search_params` #
+blast_fields = ('query id', 'subject id', 'bit score',
+                'alignment length', 'identical')
+
+###############################################################################
+class QueryHits:
+    """
+    The search results of a single query, with only what is needed for the
+    taxonomic assignment. This replaces the much heavier `QueryResult`
+    objects that biopython builds for every query.
+
+    * `hit_ids` are the names of the targets hit, e.g. 'DQ448783'.
+    * `scores` are the bit-scores with BLAST and identities with VSEARCH.
+    * `similarity` is the fraction of identical positions of the first hit.
+
+    Hits are kept in the order of the search results file, except that
+    several alignments on the same target are grouped together after the
+    first one, like biopython does.
+    """
+
+    __slots__ = ('id', 'hit_ids', 'scores', 'similarity')
+
+    def __init__(self, id, hit_ids=(), scores=(), similarity=0.0):
+        self.id         = id
+        self.hit_ids    = hit_ids
+        self.scores     = scores
+        self.similarity = similarity
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s' with %i hits>" % \
+               (self.__class__.__name__, self.id, len(self))
+
+    def __len__(self): return len(self.hit_ids)
+
+###############################################################################
+def make_query(name, hit_ids, scores, similarity):
+    """
+    Build a `QueryHits` object from the columns read, grouping the hits on
+    the same target together when there are any.
+    """
+    if len(set(hit_ids)) < len(hit_ids):
+        groups = {}
+        for i, hit_id in enumerate(hit_ids):
+            groups.setdefault(hit_id, []).append(i)
+        order   = [i for indices in groups.values() for i in indices]
+        hit_ids = [hit_ids[i] for i in order]
+        scores  = [scores[i]  for i in order]
+    return QueryHits(name, hit_ids, scores, similarity)
+
+def field_columns(line):
+    """
+    Find the position of the columns we need from the line starting with
+    `# Fields:` that BLAST writes before the hits of every query.
+    """
+    fields = [field.strip() for field in line[9:].split(',')]
+    missing = [field for field in blast_fields[1:] if field not in fields]
+    if missing:
+        msg = "The search results are missing the columns %s. They should" \
+              " be produced with the option `-outfmt '%s'`."
+        raise ValueError(msg % (missing, '7 qseqid sseqid bitscore length'
+                                         ' nident'))
+    return tuple(fields.index(field) for field in blast_fields[1:])
+
+def parse_hits(lines, algo):
+    """
+    Parse the lines of a search results file, either in the BLAST tabular
+    format with comments (`-outfmt 7`) or in the `--blast6out` format of
+    VSEARCH, which the k-mer search also uses, and yield one `QueryHits`
+    object per query. Every query is yielded as soon as the first line of
+    the next one is read, so this works on a file that is still being
+    written (see `crest4.streaming`).
+    With BLAST, queries without any hits are yielded too.
+    """
+    # The position of the columns read, for VSEARCH the score is the identity #
+    subject, score, length, ident = 1, 2, 3, 4
+    if algo == 'kmer': algo = 'vsearch'
+    # The query currently being read #
+    name, hit_ids, scores, similarity = None, [], [], 0.0
+    for line in lines:
+        # Comments only appear with BLAST #
+        if line.startswith('#'):
+            if blast_footer.match(line.rstrip('\n')): continue
+            if line.startswith('# BLAST'):
+                if name is not None:
+                    yield make_query(name, hit_ids, scores, similarity)
+                name, hit_ids, scores, similarity = None, [], [], 0.0
+            elif line.startswith('# Query: '):
+                name = line[9:].split()[0]
+            elif line.startswith('# Fields: '):
+                subject, score, length, ident = field_columns(line)
+            continue
+        # Otherwise it is a hit #
+        columns = line.rstrip('\n').split('\t')
+        if algo == 'vsearch' and columns[0] != name:
+            if name is not None:
+                yield make_query(name, hit_ids, scores, similarity)
+            name, hit_ids, scores = columns[0], [], []
+        if name is None: name = columns[0]
+        # Only the first alignment gives the similarity #
+        if algo == 'blast':
+            if not hit_ids:
+                similarity = int(columns[ident]) / int(columns[length])
+            scores.append(float(columns[score]))
+        if algo == 'vsearch':
+            identity = float(columns[score]) / 100
+            if not hit_ids: similarity = identity
+            scores.append(identity)
+        hit_ids.append(columns[subject])
+    # The last one #
+    if name is not None: yield make_query(name, hit_ids, scores, similarity)
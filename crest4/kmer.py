@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, itertools
+
+# Internal modules #
+from crest4.sharding import read_records
+from crest4.dereplicate import record_id
+
+# The length of the words used to compare sequences #
+kmer_size = 12
+
+# Words found in more sequences than this are left out of the index #
+max_postings = 10000
+
+###############################################################################
+def encode(sequence):
+    """
+    Convert a DNA sequence to an array of integers from 0 to 3 for the four
+    bases, and 4 for any other character (such as `N`).
+    """
+    import numpy
+    table = numpy.full(256, 4, dtype=numpy.uint8)
+    for code, base in enumerate(b'ACGT'): table[base] = code
+    for code, base in enumerate(b'acgt'): table[base] = code
+    table[ord('U')] = table[ord('u')] = 3
+    return table[numpy.frombuffer(sequence.encode(), dtype=numpy.uint8)]
+
+def kmer_codes(codes, k=kmer_size):
+    """
+    Return the sorted array of the distinct words of length `k` found in an
+    encoded sequence, each word being represented by a single integer.
+    Words containing other characters than the four bases are skipped.
+    """
+    import numpy
+    count = len(codes) - k + 1
+    if count <= 0: return numpy.zeros(0, dtype=numpy.uint32)
+    # Build the integer of every word two bits at a time #
+    result = numpy.zeros(count, dtype=numpy.uint32)
+    for i in range(k):
+        result = (result << 2) | (codes[i:i + count] & 3)
+    # Skip the words with an unknown character #
+    unknown = numpy.concatenate(([0], numpy.cumsum(codes > 3)))
+    valid   = unknown[k:] == unknown[:count]
+    # Return #
+    return numpy.unique(result[valid])
+
+def reverse_complement(codes):
+    """The encoded reverse complement of an encoded sequence."""
+    import numpy
+    return numpy.where(codes > 3, codes, 3 - codes)[::-1]
+
+def record_words(path, k=kmer_size):
+    """
+    Yield the name of every sequence of a FASTA file along with the sorted
+    array of its distinct words of length `k`.
+    """
+    for text, length in read_records(path):
+        sequence = ''.join(text.split('\n', 1)[1].split())
+        yield record_id(text), kmer_codes(encode(sequence), k)
+
+def build_kmer_index(path, k=kmer_size, max_postings=max_postings,
+                     chunk_size=1000):
+    """
+    Read the FASTA file of a database and return a dictionary of NumPy
+    arrays that link every word of length `k` to the sequences containing
+    it. This is an inverted index with the following arrays:
+
+    * `kmers`: every distinct word found, sorted.
+    * `starts`: the position in `refs` where the sequences of every word
+      start, with an extra value at the end.
+    * `refs`: the index of the sequences containing every word, in order.
+    * `sizes`: the number of distinct words in every sequence.
+    * `common`: the words found in more than `max_postings` sequences,
+      sorted. They are left out of the three arrays above, because they
+      say little about which sequences are closest to a query and would
+      make every search slower as the database grows.
+    * `name_data` and `name_offsets`: the name of every sequence.
+
+    To limit the memory needed, the file is read twice. The first time only
+    counts in how many sequences every word appears, in a table with one
+    counter for each of the `4 ** k` possible words, and the second time
+    fills `refs` in place, `chunk_size` sequences at a time.
+    """
+    import numpy
+    from crest4.node_tables import pack_strings
+    # Count the sequences containing every word #
+    counts = numpy.zeros(4 ** k, dtype=numpy.uint32)
+    names, sizes = [], []
+    for name, words in record_words(path, k):
+        counts[words] += 1
+        names.append(name)
+        sizes.append(len(words))
+    # Leave out the words that are too common #
+    kmers  = numpy.flatnonzero(counts > 0)
+    common = kmers[counts[kmers] > max_postings].astype(numpy.uint32)
+    kmers  = kmers[counts[kmers] <= max_postings].astype(numpy.uint32)
+    starts = numpy.zeros(len(kmers) + 1, dtype=numpy.int64)
+    numpy.cumsum(counts[kmers], out=starts[1:])
+    del counts
+    # Fill the sequences of every word, one chunk of sequences at a time #
+    refs   = numpy.zeros(starts[-1], dtype=numpy.uint32)
+    filled = starts[:-1].copy()
+    records = (words for name, words in record_words(path, k))
+    for first in itertools.count(0, chunk_size):
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk or not len(kmers): break
+        # Where the words of the chunk are in `kmers`, sorted by word #
+        lengths = [len(words) for words in chunk]
+        seqs  = numpy.arange(first, first + len(chunk), dtype=numpy.uint32)
+        seqs  = numpy.repeat(seqs, lengths)
+        words = numpy.concatenate(chunk)
+        pos   = numpy.searchsorted(kmers, words)
+        pos   = numpy.minimum(pos, len(kmers) - 1)
+        keep  = kmers[pos] == words
+        pos, seqs = pos[keep], seqs[keep]
+        order = numpy.argsort(pos, kind='stable')
+        pos, seqs = pos[order], seqs[order]
+        # Append them after the ones of the previous chunks #
+        groups, group_starts, group_counts = numpy.unique(
+            pos, return_index=True, return_counts=True)
+        rank = numpy.arange(len(pos)) - numpy.repeat(group_starts,
+                                                     group_counts)
+        refs[filled[pos] + rank] = seqs
+        filled[groups] += group_counts
+    # Return #
+    name_data, name_offsets = pack_strings(names)
+    return {'kmers':        kmers,
+            'starts':       starts,
+            'refs':         refs,
+            'sizes':        numpy.array(sizes, dtype=numpy.int64),
+            'common':       common,
+            'name_data':    name_data,
+            'name_offsets': name_offsets}
+
+###############################################################################
+class KmerIndex:
+    """
+    A search index for a database that needs no external program. It holds
+    the words of length `k` (k-mers) of every sequence of the database in
+    the form of a few NumPy arrays (see `build_kmer_index`), typically
+    memory-mapped from a cache file next to the `.fasta` file.
+
+    The sequences sharing the most words with a query are taken as its
+    hits. Their identity with the query is estimated from the fraction `f`
+    of the words of the query that they contain, as `f ** (1/k)`, which is
+    the identity for which every word has a chance `f` to be intact.
+
+    The words that are too common in the database (see `max_postings`) are
+    not indexed and are ignored in queries as well, so that the work done
+    per query is bounded whatever the size of the database.
+    """
+
+    def __init__(self, arrays, k=kmer_size):
+        # The arrays, typically memory-mapped from a cache file #
+        self.arrays = arrays
+        self.kmers  = arrays['kmers']
+        self.starts = arrays['starts']
+        self.refs   = arrays['refs']
+        self.sizes  = arrays['sizes']
+        self.common = arrays['common']
+        # The length of the words #
+        self.k = k
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object with %i sequences>"
+        return msg % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def name(self, ref):
+        """The name of the sequence of the database at the given index."""
+        data    = self.arrays['name_data']
+        offsets = self.arrays['name_offsets']
+        start, end = int(offsets[ref]), int(offsets[ref + 1])
+        return data[start:end].tobytes().decode()
+
+    def informative(self, codes):
+        """Remove the words that were left out of the index as too common."""
+        import numpy
+        if not len(self.common): return codes
+        return codes[~numpy.isin(codes, self.common, assume_unique=True)]
+
+    def shared(self, codes):
+        """
+        Given the words of a query, return the sequences of the database
+        that share at least one word with it, and how many they share.
+        """
+        import numpy
+        # Find the words that exist in the database #
+        if not len(self.kmers): codes = codes[:0]
+        pos = numpy.searchsorted(self.kmers, codes)
+        pos = numpy.minimum(pos, len(self.kmers) - 1)
+        pos = pos[self.kmers[pos] == codes]
+        # All the sequences that contain them, one after the other #
+        first = self.starts[pos]
+        count = self.starts[pos + 1] - first
+        shift = numpy.repeat(first - numpy.cumsum(count) + count, count)
+        refs  = self.refs[numpy.arange(int(count.sum())) + shift]
+        # Count them #
+        return numpy.unique(refs, return_counts=True)
+
+    def best_hits(self, sequence, min_identity=0.0, max_targets=100):
+        """
+        Return a list of tuples of the sequence index, the estimated
+        identity and the number of words shared, for the best hits of the
+        given query sequence, searching both strands.
+        """
+        import numpy
+        codes = encode(sequence)
+        # Search both strands #
+        strands = [kmer_codes(codes, self.k),
+                   kmer_codes(reverse_complement(codes), self.k)]
+        strands = [self.informative(words) for words in strands]
+        found  = [self.shared(words) for words in strands]
+        refs   = numpy.concatenate([refs   for refs, counts in found])
+        counts = numpy.concatenate([counts for refs, counts in found])
+        if not len(refs): return []
+        # The fraction of the words of the strand that are shared, as the
+        # common words removed are not the same on both strands #
+        totals = [len(words) for words in strands]
+        totals = numpy.repeat(totals, [len(refs) for refs, counts in found])
+        fracs  = counts / totals
+        # Keep the best strand for every sequence of the database #
+        order = numpy.lexsort((-fracs, refs))
+        refs, counts, fracs = refs[order], counts[order], fracs[order]
+        first = numpy.concatenate(([True], refs[1:] != refs[:-1]))
+        refs, counts, fracs = refs[first], counts[first], fracs[first]
+        # Sort by fraction of words shared, then by order in the database #
+        order = numpy.lexsort((refs, -fracs))[:max_targets]
+        # Estimate the identity #
+        identity = fracs[order] ** (1 / self.k)
+        keep = identity >= min_identity
+        return list(zip(refs[order][keep].tolist(),
+                        identity[keep].tolist(),
+                        counts[order][keep].tolist()))
+
+###############################################################################
+class KmerSearch:
+    """
+    A sequence similarity search of a FASTA file against the `KmerIndex` of
+    a database. It can be used in place of the `SeqSearch` objects of the
+    `seqsearch` module. The results are written to `out_path` in the same
+    format as VSEARCH with `--blast6out`, with the estimated identity as
+    percentage and the number of words shared instead of the bit-score.
+    Queries without any hits are not written, also like VSEARCH.
+    """
+
+    def __init__(self, input_fasta, database, out_path,
+                 min_identity=0.0, max_targets=100):
+        self.input_fasta  = input_fasta
+        self.database     = database
+        self.out_path     = out_path
+        self.min_identity = min_identity
+        self.max_targets  = max_targets
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object on '%s'>"
+        return msg % (self.__class__.__name__, self.input_fasta)
+
+    def run(self):
+        """Search every sequence and write the results one by one."""
+        index = self.database.kmer_db
+        line  = '%s\t%s\t%.1f\t%i\t0\t0\t1\t%i\t0\t0\t-1\t%i\n'
+        # The output directory might not exist yet #
+        out_dir = os.path.dirname(os.path.abspath(str(self.out_path)))
+        os.makedirs(out_dir, exist_ok=True)
+        with open(str(self.out_path), 'wt') as handle:
+            for text, length in read_records(self.input_fasta):
+                name     = record_id(text)
+                sequence = ''.join(text.split('\n', 1)[1].split())
+                hits = index.best_hits(sequence, self.min_identity,
+                                       self.max_targets)
+                for ref, identity, shared in hits:
+                    handle.write(line % (name, index.name(ref),
+                                         identity * 100, length, length,
+                                         shared))
+                handle.flush()
+        # Return #
+        return self.out_path
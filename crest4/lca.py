@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+###############################################################################
+def build_sparse_table(depth):
+    """
+    Given the depth of every node of a tree numbered in preorder, return a
+    two-dimensional array where row `j` and column `i` contains the node
+    with the smallest depth amongst the nodes `i` to `i + 2**j - 1`.
+    This is the classic sparse table used for range minimum queries.
+    """
+    import numpy
+    # The first level is simply every node itself #
+    count = len(depth)
+    levels = max(1, count.bit_length())
+    table = numpy.zeros((levels, count), dtype=numpy.int32)
+    table[0] = numpy.arange(count, dtype=numpy.int32)
+    # Every level is computed from the previous one #
+    for j in range(1, levels):
+        half  = 1 << (j - 1)
+        left  = table[j-1, :count - half]
+        right = table[j-1, half:]
+        best  = numpy.where(depth[left] <= depth[right], left, right)
+        table[j, :len(best)] = best
+    # Return #
+    return table
+
+###############################################################################
+class LCAEngine:
+    """
+    Answers lowest common ancestor queries on a `CompiledTree` in constant
+    time, after a single precomputation.
+
+    Because the nodes of a compiled tree are numbered in preorder, two
+    properties make this possible:
+
+    * The lowest common ancestor of a set of nodes is the same as the one of
+      the first and last node of the set in preorder, i.e. the smallest and
+      largest indices.
+
+    * For two nodes `u < v`, the shallowest node with an index in the range
+      `u+1` to `v` is a child of their lowest common ancestor. Finding that
+      node is a range minimum query, answered by the sparse table above.
+
+    Answering a query on a set of `k` nodes hence costs `O(k)` to find the
+    extremes, plus two array lookups.
+    """
+
+    def __init__(self, tree, table):
+        # The compiled tree #
+        self.tree = tree
+        # The sparse table built from the depth of every node #
+        self.table = table
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on %r>" % (self.__class__.__name__, self.tree)
+
+    def pair(self, first, last):
+        """
+        Return the lowest common ancestor of two nodes given as indices,
+        where `first` must be smaller or equal to `last`.
+        """
+        # Trivial case #
+        if first == last: return first
+        # The range to query and the level of the table to use #
+        start = first + 1
+        level = (last - start + 1).bit_length() - 1
+        # The two overlapping halves of the range #
+        left  = self.table[level, start]
+        right = self.table[level, last - (1 << level) + 1]
+        depth = self.tree.depth
+        child = left if depth[left] <= depth[right] else right
+        # The shallowest node is a child of the common ancestor #
+        return int(self.tree.parent[child])
+
+    def common_ancestor(self, nodes):
+        """
+        Return the lowest common ancestor of an iterable of nodes given as
+        indices in the compiled tree.
+        """
+        nodes = list(nodes)
+        return self.pair(min(nodes), max(nodes))
+
+    def pairs(self, first, last):
+        """
+        Same as the `pair` method above, but for two whole arrays of nodes
+        at once, returning the array of their lowest common ancestors.
+        """
+        import numpy
+        first  = numpy.asarray(first, dtype=numpy.int64)
+        last   = numpy.asarray(last,  dtype=numpy.int64)
+        result = first.copy()
+        # Only the pairs of different nodes need a query #
+        todo  = numpy.flatnonzero(first != last)
+        start = first[todo] + 1
+        end   = last[todo]
+        # The exponent of the largest power of two fitting in every range #
+        level = numpy.frexp((end - start + 1).astype(numpy.float64))[1] - 1
+        # The two overlapping halves of every range #
+        left  = self.table[level, start]
+        right = self.table[level, end - (1 << level) + 1]
+        depth = self.tree.depth
+        child = numpy.where(depth[left] <= depth[right], left, right)
+        # The shallowest nodes are children of the common ancestors #
+        result[todo] = self.tree.parent[child]
+        return result
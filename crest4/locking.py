@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, sys, time
+
+# Advisory file locks are only available on Unix systems #
+try: import fcntl
+except ImportError: fcntl = None
+
+###############################################################################
+class FileLock:
+    """
+    An exclusive lock shared between all the processes on a machine, or even
+    on several machines when the file system supports it, so that only one
+    of them at a time builds a given part of a database while the others
+    wait. Use it like this:
+
+        >>> with FileLock(db.path + '.blast.lock', "the BLAST index"):
+        >>>     if not index_exists(): build_index()
+
+    The lock is released automatically if the process holding it dies.
+    The lock file itself is left on disk, as removing it could let two
+    processes hold the lock at the same time.
+    On systems without `fcntl`, no locking is done at all.
+    """
+
+    def __init__(self, path, desc=None):
+        # Where the lock file will be created #
+        self.path = str(path)
+        # What is being built, for the message displayed while waiting #
+        self.desc = desc
+        # The open file #
+        self.handle = None
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def acquire(self):
+        """Wait until we are the only process holding the lock."""
+        if fcntl is None: return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.handle = open(self.path, 'a')
+        # First, try without waiting #
+        try:
+            fcntl.flock(self.handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+        # Otherwise, let the user know why nothing is happening #
+        if self.desc is not None:
+            msg = "Waiting for another process to finish building %s..."
+            print(msg % self.desc, file=sys.stderr)
+        start = time.time()
+        fcntl.flock(self.handle, fcntl.LOCK_EX)
+        if self.desc is not None:
+            msg = "Done waiting for %s after %.1f seconds."
+            print(msg % (self.desc, time.time() - start), file=sys.stderr)
+
+    def release(self):
+        """Let the next process through."""
+        if self.handle is None: return
+        fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+        self.handle = None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import sys
+
+###############################################################################
+def pack_strings(strings):
+    """
+    Encode a list of strings as one array of UTF-8 bytes and one array of
+    offsets, such that string `i` is `data[offsets[i]:offsets[i+1]]`.
+    """
+    import numpy
+    encoded = [s.encode() for s in strings]
+    lengths = numpy.fromiter(map(len, encoded), dtype=numpy.int64,
+                             count=len(encoded))
+    offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    data = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+    return data, offsets
+
+def build_node_tables(tree, path, max_rank):
+    """
+    Using the compiled tree and the `.names` file of a database, compute a
+    few properties of every node once and for all. Returns a dictionary of
+    NumPy arrays indexed by node:
+
+    * `known`: if the node is present in the `.names` file at all.
+    * `smlrty`: the minimum similarity needed to assign at that node.
+    * `rank`: the rank index of the node, which is simply its depth capped
+      to `max_rank`.
+    * `name_data` and `name_offsets`: the taxonomic name of every node.
+    * `lineage_data` and `lineage_offsets`: the full lineage of every node
+      as a semicolon separated string starting at the root.
+    """
+    import numpy
+    # Parse the names file #
+    info = {}
+    with open(path, 'rt') as handle:
+        for line in handle:
+            if line.startswith('#') or not line.strip(): continue
+            num, name, frac = line.strip().split(',')
+            info[num] = (name, frac)
+    # Initialize #
+    count    = len(tree)
+    parent   = tree.parent.tolist()
+    known    = numpy.zeros(count, dtype=bool)
+    smlrty   = numpy.full(count, numpy.nan)
+    names    = [''] * count
+    lineages = [''] * count
+    # Nodes are in preorder, so parents always come before their children #
+    for node, num in enumerate(tree.names.tolist()):
+        name, frac = info.get(num, ('', 'nan'))
+        known[node]  = num in info
+        smlrty[node] = float(frac)
+        names[node]  = name
+        up = parent[node]
+        lineages[node] = name if up < 0 else lineages[up] + '; ' + name
+    # Pack the strings #
+    name_data,    name_offsets    = pack_strings(names)
+    lineage_data, lineage_offsets = pack_strings(lineages)
+    # Return #
+    return {'known':           known,
+            'smlrty':          smlrty,
+            'rank':            numpy.minimum(tree.depth, max_rank),
+            'name_data':       name_data,
+            'name_offsets':    name_offsets,
+            'lineage_data':    lineage_data,
+            'lineage_offsets': lineage_offsets}
+
+###############################################################################
+class NodeTables:
+    """
+    Gives access to the precomputed properties of every node of the tree of
+    a database: taxonomic name, full lineage string, rank index and minimum
+    similarity. All of these become simple array lookups instead of
+    walking the tree and querying the `node_to_name` dictionary.
+
+    Strings are decoded the first time they are requested and interned, so
+    that every query assigned to the same node shares the same string.
+    """
+
+    def __init__(self, arrays):
+        # The arrays, typically memory-mapped from a cache file #
+        self.arrays = arrays
+        self.known  = arrays['known']
+        self.smlrty = arrays['smlrty']
+        self.rank   = arrays['rank']
+        # Decoded strings are kept here #
+        self.names    = {}
+        self.lineages = {}
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        msg = "<%s object with %i nodes>"
+        return msg % (self.__class__.__name__, len(self.known))
+
+    def decode(self, kind, node):
+        """Decode and return the string of a given kind for a given node."""
+        data    = self.arrays[kind + '_data']
+        offsets = self.arrays[kind + '_offsets']
+        start, end = int(offsets[node]), int(offsets[node + 1])
+        return sys.intern(data[start:end].tobytes().decode())
+
+    def check(self, node):
+        """Raise an exception if the node is not in the `.names` file."""
+        msg = f"Node {node!r} doesn't have an ID associated."
+        if not self.known[node]: raise LookupError(msg)
+
+    def name(self, node):
+        """The taxonomic name of a node e.g. 'Bacillus'."""
+        if node not in self.names:
+            self.check(node)
+            self.names[node] = self.decode('name', node)
+        return self.names[node]
+
+    def lineage(self, node):
+        """
+        The full lineage of a node starting at the root, as a string.
+        e.g. 'root; Main genome; Bacteria; Bacteria (superkingdom)'
+        """
+        if node not in self.lineages:
+            self.check(node)
+            self.lineages[node] = self.decode('lineage', node)
+        return self.lineages[node]
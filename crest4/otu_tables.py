@@ -37,13 +37,17 @@ class InfoFromTableOTUs:
         Automatically detect the format between "TSV" or "CSV" and return the
         appropriate separator character. By default, we will return a tab.
         """
-        if self.otu_table.filename.split('.')[-1] == 'csv':
+        from crest4.compression import strip_compression
+        if strip_compression(self.otu_table).split('.')[-1] == 'csv':
             return ','
         return '\t'
 
     @property_cached
     def otus_df(self):
-        """Load the otu_table file as a pandas `DataFrame`."""
+        """
+        Load the otu_table file as a pandas `DataFrame`. A compressed file
+        is decompressed on the fly, judging by its extension.
+        """
         # Load from a text file #
         import pandas
         df = pandas.read_csv(str(self.otu_table), sep=self.format, index_col=0)
@@ -62,6 +66,16 @@ class InfoFromTableOTUs:
         """The second output file where cumulativeness is turned on."""
         return self(cumulative=True)
 
+    def write(self, output_dir, extension=''):
+        """
+        Write both output files to the given directory. They are compressed
+        if an `extension` such as '.gz' is given.
+        """
+        path_by_rank    = str(output_dir + 'otus_by_rank.tsv' + extension)
+        path_cumulative = str(output_dir + 'otus_cumulative.tsv' + extension)
+        self.otus_by_rank.to_csv(path_by_rank, index=False, sep='\t')
+        self.otus_cumulative.to_csv(path_cumulative, index=False, sep='\t')
+
     def check_id_match(self):
         """
         Check that all the IDs in the OTU table given by the user match the
@@ -75,7 +89,9 @@ class InfoFromTableOTUs:
                       " does not appear in the hits file provided at '%s'." \
                       " This can be due to the original FASTA file not" \
                       " containing them either, or because the sequence" \
-                      " search was interrupted and a partial output created."
+                      " search was interrupted and a partial output created." \
+                      " In that case, use the `keep_partial` option to" \
+                      " finish it."
                 msg = msg % (name, self.otu_table, self.classify.search_hits)
                 raise ValueError(msg)
 
@@ -87,39 +103,37 @@ class InfoFromTableOTUs:
         empty_samples = pandas.Series(0, index=self.otus_df.columns)
         # Build an empty new dataframe from a dictionary of empty series #
         result = defaultdict(lambda: empty_samples.copy())
+        # Remember the rank of every taxonomy string we encounter #
+        ranks = {}
+        # Shortcuts to the tree of the database and its node properties #
+        tree   = self.classify.database.compiled_tree
+        tables = self.classify.database.node_tables
         # Loop over every OTU in the user supplied table #
         for i, otu_counts in self.otus_df.iterrows():
             # The name or id of the current OTU #
             otu_name = otu_counts.name
             # Get the assignment of the current OTU from our classification #
-            tax = self.classify.queries_by_id[otu_name].taxonomy
-            # By default, the root is at the end #
-            tax = list(reversed(tax))
-            # Make a string #
-            tax_name = '; '.join(tax)
+            query = self.classify.queries_by_id[otu_name]
+            # The precomputed string starting at the root #
+            tax_name = query.lineage
+            ranks[tax_name] = query.rank
             # Add the current counts to that particular taxonomy #
             result[tax_name] += otu_counts
             # If we have the cumulative option, then propagate up the tree #
-            if cumulative:
-                for step in range(1, len(tax)):
-                    tax_name = '; '.join(tax[0:-step])
+            if cumulative and query.assigned_node is not False:
+                for node in tree.ancestors(query.assigned_node):
+                    tax_name = tables.lineage(node)
+                    ranks[tax_name] = int(tables.rank[node])
                     result[tax_name] += otu_counts
         # Convert to a DataFrame #
         result = pandas.DataFrame(result).T
         # Have the assignment as a separate column and not as an index #
         result = result.reset_index()
         result = result.rename(columns = {'index': 'taxonomy'})
-        # Function that takes the length of the taxonomic path and tells
-        # us which rank it represents
-        rank_names  = self.classify.database.rank_names
-        def tax_to_rank(t):
-            # There is a problem with too many ranks in some databases
-            # requiring this.
-            length = len(t.split(';')) - 1
-            if length > len(rank_names) - 1: return "Strain"
-            else: return rank_names[length]
+        # Look up the rank that every taxonomic path represents #
+        rank_names = self.classify.database.rank_names
+        ranks = result.taxonomy.map(lambda t: rank_names[ranks[t]])
         # Add the rank column that tells the user if it's a genus or a family #
-        ranks = result.taxonomy.apply(tax_to_rank)
         result.insert(loc=0, column='rank', value=ranks)
         # Sort the table by the taxonomy string #
         result = result.sort_values(by=['taxonomy'])
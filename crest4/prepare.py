@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+###############################################################################
+def prepare_db(search_db   = 'ssuome',
+               search_algo = 'blast,vsearch'):
+    """
+    Download one or more databases if needed, and build everything that a
+    classification will need ahead of time, so that the first jobs don't
+    have to. This is useful before launching many jobs on a cluster.
+
+    Args:
+
+        search_db: The databases to prepare, as a comma-separated list.
+                   Either built-in names like `ssuome` or paths to custom
+                   databases. By default, `ssuome`.
+
+        search_algo: The algorithms for which the search indexes should be
+                     built, as a comma-separated list. Any of `blast`,
+                     `vsearch` and `kmer`. By default, `blast,vsearch`.
+    """
+    # Parse the lists #
+    from crest4.classify import find_database
+    databases = [db for db in str(search_db).split(',') if db]
+    algos     = [a for a in str(search_algo).split(',') if a]
+    # Check the algorithms #
+    for algo in algos:
+        if algo not in ('blast', 'vsearch', 'kmer'):
+            msg = "The search algorithm '%s' is not supported."
+            raise ValueError(msg % algo)
+    # Prepare every database #
+    for name in databases:
+        db = find_database(name).prepare(algos)
+        print("The database '%s' is ready at '%s'." % (name, db.path))
@@ -19,8 +19,8 @@ class Query:
     Takes care of assigning taxonomy by using the results of the sequence
     similarity search and a phylogenetic tree as a N-ary directed graph.
 
-    The query parameter is an object coming from biopython of type:
-    'Bio.SearchIO._model.query.QueryResult'
+    The query parameter is a `QueryHits` object containing the search
+    results of this sequence (see the `crest4.hits` module).
     """
 
     def __init__(self, classify, query):
@@ -43,67 +43,68 @@ class Query:
     @property_cached
     def nodes(self):
         """
-        This function will return the nodes numbers in the tree for which this
-        sequence got at least one hit in a set. For example: {'1494'}
+        This function will return the nodes in the tree for which this
+        sequence got at least one hit in a set. Nodes are given as their
+        index in the compiled tree of the database. For example: {1493}
         """
         # Initialize the set that will hold all the nodes numbers we find #
         nodes = set()
         # Check there was at least one hit #
-        if len(self.query.hits) == 0: return nodes
-        # Get the score of the best hit #
-        if self.algo == 'blast':   top_score = self.query.hsps[0].bitscore
-        if self.algo == 'vsearch': top_score = self.query.hsps[0].ident_pct/100
+        if len(self.query) == 0: return nodes
+        # Get the score of the best hit (the identity with VSEARCH) #
+        top_score = self.query.scores[0]
         # Check if the score is good enough to proceed further #
         if top_score < self.classify.min_score: return nodes
         # Calculate the score-drop threshold based on the best hit #
         threshold = top_score * self.classify.score_frac
         # Iterate on the hits until falling below a threshold #
-        for hsp in self.query.hsps:
+        for hit_id, score in zip(self.query.hit_ids, self.query.scores):
             # Stop if the current bitscore is below our threshold #
-            if self.algo == 'blast':   score = hsp.bitscore
-            if self.algo == 'vsearch': score = hsp.ident_pct/100
             if score < threshold: break
-            # Get the name (or ID) of the current hit e.g. 'DQ448783' #
-            hit_id = hsp.hit_id
-            # Get the corresponding node number in the tree e.g. '1494' #
-            node = self.db.acc_to_node.get(hit_id, False)
+            # Get the node in the tree of the hit e.g. 'DQ448783' -> 1493 #
+            node = self.db.acc_index.get(hit_id, -1)
             # Check that it was found #
             msg = f"The search hit '{hit_id}' was not found in the tree." \
                   f" The database '{self.db.dir_name}' is probably corrupted."
-            if node is False: raise LookupError(msg)
+            if node < 0: raise LookupError(msg)
             # Add it to the list #
             nodes.add(node)
         # Return #
         return nodes
 
     @property_cached
-    def assigned_node(self):
+    def common_node(self):
         """
-        This function will return the node in the tree at which the
-        sequence was assigned. This could be the root of the tree or any
-        other node. For example: <Tree at 0x15194b8d>
+        The lowest node of the tree that is a common ancestor of all the
+        nodes hit, before looking at the similarity of the sequence.
         This function can also return `False` when there are no results.
         """
         # If there are no hits #
         if len(self.nodes) == 0: return False
-        # If there is only one hit, then get that node in the tree #
+        # If there is only one hit, then that is the node #
         if len(self.nodes) == 1:
-            node_num, = self.nodes
-            gen = self.db.tree.search_nodes(name=node_num)
-            # Sanity check that the node was found #
-            node = next(gen, False)
-            msg = f"Node {node_num!r} not found in the tree."
-            if node is False: raise LookupError(msg)
+            node, = self.nodes
+            return node
         # Retrieve the lowest common node if more than one hit #
-        else:
-            node = self.db.tree.common_ancestor(self.nodes)
-        # Calculate the similarity fraction of the best alignment #
-        if self.algo == 'blast':
-            ident_num = self.query.hsps[0].ident_num
-            algn_span = self.query.fragments[0]._aln_span
-            similarity = ident_num / algn_span
-        if self.algo == 'vsearch':
-            similarity = self.query.hsps[0].ident_pct/100
+        return self.db.lca.common_ancestor(self.nodes)
+
+    @property_cached
+    def assigned_node(self):
+        """
+        This function will return the node in the tree at which the
+        sequence was assigned. This could be the root of the tree or any
+        other node. Nodes are given as their index in the compiled tree of
+        the database. For example: 1494
+        This function can also return `False` when there are no results.
+        """
+        # If there are no hits #
+        node = self.common_node
+        if node is False: return False
+        # Shortcuts to the tree of the database and its node properties #
+        tree   = self.db.compiled_tree
+        tables = self.db.node_tables
+        # The similarity fraction of the best alignment #
+        similarity = self.query.similarity
         # Check the minimum similarity criteria for assigning at a given
         # level and proceed in an ascending fashion up
         # the tree until the similarity is satisfactory.
@@ -111,22 +112,36 @@ class Query:
             # Check that the similarity filter is activated #
             if not self.classify.min_smlrty: break
             # Check if we already got all the way up to the root #
-            if node.is_root: break
+            if tree.is_root(node): break
             # Get the minimum value associated with this level #
-            smlrty_min = float(self.db.node_to_name[node.name][1])
+            tables.check(node)
+            smlrty_min = tables.smlrty[node]
             # Check if we are above that minimum #
             if similarity > smlrty_min: break
             # Otherwise, go up one level for our classification #
-            node = node.up
+            node = tree.up(node)
         # Return #
         return node
 
+    @property_cached
+    def confident(self):
+        """
+        Returns `True` when the similarity of the best hit is above the
+        minimum similarity of the common ancestor of the hits, which is then
+        the assigned node without having to move up the tree. Sequences
+        that have no hits or whose hits only agree at the root are never
+        considered confident (see `Classify.screen_with`).
+        """
+        node = self.common_node
+        if node is False: return False
+        if self.db.compiled_tree.is_root(node): return False
+        tables = self.db.node_tables
+        tables.check(node)
+        return bool(self.query.similarity > tables.smlrty[node])
+
     def get_tax(self, node):
         """Function to get the taxonomy name of a node"""
-        # Sanity check that the node has a name #
-        msg = f"Node {node!r} doesn't have an ID associated."
-        if not node.name: raise LookupError(msg)
-        return self.db.node_to_name[node.name][0]
+        return self.db.node_tables.name(node)
 
     @property_cached
     def taxonomy(self):
@@ -143,10 +158,31 @@ class Query:
         # The taxonomic name of the current node #
         name = self.get_tax(self.assigned_node)
         # Traverse the tree up to the root #
-        tree_path = self.assigned_node.ancestors()
+        tree_path = self.db.compiled_tree.ancestors(self.assigned_node)
         # Get the name of every parent along the way #
         return [name] + [self.get_tax(parent) for parent in tree_path]
 
+    @property_cached
+    def lineage(self):
+        """
+        The same as the taxonomy above, but as a single semicolon separated
+        string starting at the root. It is precomputed for every node of the
+        database, so the same string object is shared by all the queries
+        assigned to the same node.
+        """
+        if self.assigned_node is False: return "No hits"
+        return self.db.node_tables.lineage(self.assigned_node)
+
+    @property_cached
+    def rank(self):
+        """
+        The index of the rank at which this query was assigned, for instance
+        9 for a genus. Queries that have no hits are considered to be at the
+        root (see `CrestDatabase.rank_names`).
+        """
+        if self.assigned_node is False: return 0
+        return int(self.db.node_tables.rank[self.assigned_node])
+
     @property_cached
     def tax_string(self):
         """
@@ -155,6 +191,123 @@ class Query:
         sequence classified.
         """
         # Make a semicolon separated string #
-        tax = '; '.join(reversed(self.taxonomy))
+        tax = self.lineage
         # Add the name of the query to the beginning line #
-        return self.name + '\t' + tax + '\n'
\ No newline at end of file
+        return self.name + '\t' + tax + '\n'
+
+    #------------------------------- Methods ---------------------------------#
+    def renamed(self, name):
+        """
+        A query for a sequence identical to this one but with another name,
+        which reuses the results of this one (see `DuplicateQuery`).
+        """
+        return DuplicateQuery(self, name)
+
+    def release(self):
+        """
+        Return an `Assignment` object with the taxonomic assignment of this
+        query, which does not hold any of the search results anymore.
+        """
+        return Assignment(self.name, self.assigned_node, self.db)
+
+###############################################################################
+class DuplicateQuery(Query):
+    """
+    Represents a sequence that is identical to another one in the same FASTA
+    file. Only the first of the two is searched, and this one simply reuses
+    its results and taxonomic assignment under a different name.
+    """
+
+    def __init__(self, original, name):
+        # The query that was actually searched #
+        self.original = original
+        # Same attributes as the parent class #
+        self.classify = original.classify
+        self.query    = original.query
+        self.db       = original.db
+        self.algo     = original.algo
+        # Only the name is different #
+        self.name = name
+
+    @property
+    def nodes(self): return self.original.nodes
+
+    @property
+    def common_node(self): return self.original.common_node
+
+    @property
+    def assigned_node(self): return self.original.assigned_node
+
+    @property
+    def confident(self): return self.original.confident
+
+    @property
+    def taxonomy(self): return self.original.taxonomy
+
+    @property
+    def lineage(self): return self.original.lineage
+
+    @property
+    def rank(self): return self.original.rank
+
+
+###############################################################################
+class Assignment:
+    """
+    The taxonomic assignment of a single sequence, once the search results
+    are not needed anymore. It offers the same attributes as a `Query`
+    object for writing the outputs, but only stores the name of the
+    sequence, the node it was assigned to and the lineage of that node,
+    which is the same string object for all sequences assigned to the same
+    node (see `NodeTables.lineage`). With millions of sequences this takes
+    a small fraction of the memory that `Query` objects hold on to.
+    """
+
+    __slots__ = ('name', 'assigned_node', 'lineage', 'db')
+
+    def __init__(self, name, assigned_node, db, lineage=None):
+        # The name of the sequence #
+        self.name = name
+        # The node or `False` when there were no hits #
+        self.assigned_node = assigned_node
+        # Shortcut to the database used #
+        self.db = db
+        # The string starting at the root, shared between sequences #
+        if lineage is None:
+            if assigned_node is False: lineage = "No hits"
+            else: lineage = db.node_tables.lineage(assigned_node)
+        self.lineage = lineage
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.name)
+
+    #------------------------------ Properties -------------------------------#
+    @property
+    def taxonomy(self):
+        """The assigned taxonomy as a list, see `Query.taxonomy`."""
+        if self.assigned_node is False: return ["No hits"]
+        tables = self.db.node_tables
+        nodes  = [self.assigned_node]
+        nodes += self.db.compiled_tree.ancestors(self.assigned_node)
+        return [tables.name(node) for node in nodes]
+
+    @property
+    def rank(self):
+        """The index of the assigned rank, see `Query.rank`."""
+        if self.assigned_node is False: return 0
+        return int(self.db.node_tables.rank[self.assigned_node])
+
+    @property
+    def tax_string(self):
+        """The line of this sequence in the assignments file."""
+        return self.name + '\t' + self.lineage + '\n'
+
+    #------------------------------- Methods ---------------------------------#
+    def renamed(self, name):
+        """The same assignment for an identical sequence with another name."""
+        return Assignment(name, self.assigned_node, self.db, self.lineage)
+
+    def release(self):
+        """There is nothing left to release."""
+        return self
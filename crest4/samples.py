@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, glob
+
+# Internal modules #
+from crest4.sharding import read_records
+from crest4.compression import open_text, strip_compression
+from crest4.dereplicate import record_id, record_digest
+
+# First party modules #
+from autopaths.file_path import FilePath
+from autopaths.dir_path  import DirectoryPath
+
+# Constants #
+fasta_extensions = ('.fasta', '.fa', '.fna', '.fas')
+
+###############################################################################
+def find_samples(fasta):
+    """
+    Return the sorted list of FASTA files designated by `fasta`, which is
+    either a directory, a glob pattern such as `reads/*.fasta`, or a
+    comma-separated list of paths. In a directory, every file with a usual
+    FASTA extension is taken, compressed or not.
+    """
+    paths = []
+    for item in str(fasta).split(','):
+        item = os.path.expanduser(item.strip())
+        if not item: continue
+        if os.path.isdir(item):
+            paths += [os.path.join(item, name)
+                      for name in os.listdir(item) if is_fasta(name)]
+        elif glob.has_magic(item):
+            paths += glob.glob(item)
+        else:
+            paths.append(item)
+    # Check them #
+    paths = sorted(set(os.path.abspath(path) for path in paths
+                       if not os.path.isdir(path)))
+    if not paths:
+        msg = "No FASTA files were found at '%s'."
+        raise FileNotFoundError(msg % fasta)
+    for path in paths: FilePath(path).must_exist()
+    # Every sample needs its own name #
+    names = [sample_name(path) for path in paths]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        msg = "Several FASTA files would have the same sample name: %s."
+        raise ValueError(msg % ', '.join(duplicates))
+    # Return #
+    return paths
+
+def is_fasta(path):
+    """Check if a file has one of the usual FASTA extensions."""
+    return strip_compression(path).endswith(fasta_extensions)
+
+def sample_name(path):
+    """
+    The name of a sample is the name of its FASTA file without the
+    extensions. For instance: `reads/lake_04.fasta.gz` -> `lake_04`.
+    """
+    name = os.path.basename(strip_compression(path))
+    for extension in fasta_extensions:
+        if name.endswith(extension): return name[:-len(extension)]
+    return name
+
+def pool_sequences(paths, out_path):
+    """
+    Write every distinct sequence found in the given FASTA files once to
+    `out_path`, named `pooled_1`, `pooled_2`, etc. Returns a list with, for
+    every file, the list of tuples of the ID of each of its sequences and
+    the name of the corresponding sequence in the pooled file.
+    """
+    names, result = {}, []
+    with open(str(out_path), 'wt') as handle:
+        for path in paths:
+            sample = []
+            for text, length in read_records(path):
+                digest = record_digest(text)
+                if digest not in names:
+                    names[digest] = 'pooled_%i' % (len(names) + 1)
+                    sequence = text.split('\n', 1)[1]
+                    if not sequence.endswith('\n'): sequence += '\n'
+                    handle.write('>%s\n%s' % (names[digest], sequence))
+                sample.append((record_id(text), names[digest]))
+            result.append(sample)
+    # Return #
+    return result
+
+###############################################################################
+class Sample:
+    """
+    The results of one FASTA file of a batch, placed in its own output
+    directory. It offers the same attributes as a `Classify` object that
+    the `InfoFromTableOTUs` class relies on, so that the same OTU outputs
+    can be produced.
+    """
+
+    def __init__(self, name, queries, database, output_dir,
+                 search_hits, otu_table=None, zip_extension=''):
+        self.name          = name
+        self.queries       = queries
+        self.database      = database
+        self.output_dir    = DirectoryPath(output_dir)
+        self.search_hits   = search_hits
+        self.otu_table     = otu_table
+        self.zip_extension = zip_extension
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__, self.name)
+
+    @property
+    def queries_by_id(self):
+        return {query.name: query for query in self.queries}
+
+    @property
+    def out_file(self):
+        """The path to the file that will contain the assignments."""
+        return self.output_dir + 'assignments.txt' + self.zip_extension
+
+    def __call__(self):
+        """Write the outputs, typically in another process."""
+        self.output_dir.create_if_not_exists()
+        with open_text(self.out_file, 'wt') as handle:
+            handle.writelines(query.tax_string for query in self.queries)
+        # Special case where an OTU table was passed #
+        if self.otu_table:
+            from crest4.otu_tables import InfoFromTableOTUs
+            info = InfoFromTableOTUs(self, self.otu_table)
+            info.write(self.output_dir, self.zip_extension)
+        # Return #
+        return self.out_file
+
+###############################################################################
+def find_otu_table(otu_table, name):
+    """
+    Find the OTU table of the sample with the given name in the directory
+    `otu_table`. It is the file with the same name as the sample and a
+    `.tsv` or `.csv` extension, possibly compressed. Returns `None` when
+    there is none.
+    """
+    from crest4.compression import compressions
+    for extension in ('.tsv', '.csv'):
+        for compression in ('',) + compressions:
+            path = os.path.join(str(otu_table), name + extension + compression)
+            if os.path.exists(path): return FilePath(path)
+
+def classify_samples(fasta, output_dir=None, otu_table=None,
+                     num_workers=None, **kwargs):
+    """
+    Classify the sequences of many FASTA files, one per sample, with a
+    single sequence similarity search. All the distinct sequences of all
+    the files are pooled together and classified once, and then the usual
+    outputs are written for every sample in parallel, using a pool of
+    `num_workers` processes. This is much faster than classifying every
+    file on its own when samples share many of their sequences.
+
+    Args:
+
+        fasta: A directory containing the FASTA files, a glob pattern such
+               as `reads/*.fasta`, or a comma-separated list of paths.
+
+        output_dir: The directory into which the results will be written.
+                    Every sample gets a subdirectory named after its FASTA
+                    file, and the search itself is done in the `pooled`
+                    subdirectory. This defaults to a directory named
+                    `crest4_samples` next to the FASTA files.
+
+        otu_table: Optionally, a directory containing one OTU table per
+                   sample, named after its FASTA file with a `.tsv` or
+                   `.csv` extension. The OTU outputs are then produced
+                   for every sample that has one.
+
+        num_workers: The number of processes used to write the outputs of
+                     the samples. By default, the number of CPUs.
+
+    All other keyword arguments are given to the `Classify` object that
+    classifies the pooled sequences. Returns the list of the paths to the
+    assignments file of every sample.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from crest4.classify import Classify
+    # Find the files #
+    paths = find_samples(fasta)
+    names = [sample_name(path) for path in paths]
+    # Default for the output directory #
+    if output_dir is None:
+        common = os.path.commonpath([os.path.dirname(p) for p in paths])
+        output_dir = os.path.join(common, 'crest4_samples')
+    output_dir = DirectoryPath(output_dir)
+    # Default for the number of processes #
+    if num_workers is None: num_workers = os.cpu_count()
+    num_workers = int(num_workers)
+    # Pool the sequences #
+    pooled_dir = output_dir + 'pooled/'
+    pooled_dir.create_if_not_exists()
+    pooled_fasta = pooled_dir + 'pooled.fasta'
+    contents = pool_sequences(paths, pooled_fasta)
+    total  = sum(map(len, contents))
+    unique = len(set(pooled for sample in contents for _, pooled in sample))
+    msg = "Pooling: %i sequences in %i samples, of which %i are unique."
+    print(msg % (total, len(paths), unique))
+    # Classify them once #
+    c = Classify(fasta=pooled_fasta, output_dir=pooled_dir, **kwargs)
+    by_id = c.queries_by_id
+    # Every sample gets the assignments of its own sequences #
+    samples = []
+    for name, sample in zip(names, contents):
+        table = None
+        if otu_table is not None: table = find_otu_table(otu_table, name)
+        queries = [by_id[pooled].renamed(seq_id) for seq_id, pooled in sample]
+        samples.append(Sample(name, queries, c.database, output_dir + name,
+                              c.search_hits, table, c.zip_extension))
+    # Write the outputs in parallel #
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        result = list(pool.map(Sample.__call__, samples))
+    # Report to the user #
+    msg = "Classification ran successfully for %i samples." \
+          " Results are placed in '%s'."
+    print(msg % (len(samples), output_dir))
+    # Return #
+    return result
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, sys, json, glob, signal, socket, builtins, threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+import crest4
+from crest4.databases import CrestDatabase
+
+# The options of `Classify` that are paths on the filesystem #
+path_options = ('fasta', 'output_dir', 'search_hits', 'otu_table')
+
+###############################################################################
+def default_socket():
+    """
+    The location of the Unix socket when the user doesn't specify one.
+    It is placed in the same directory as the databases.
+    """
+    base_dir = os.environ.get(CrestDatabase.environ_var,
+                              CrestDatabase.default_dir)
+    return os.path.join(os.path.expanduser(base_dir), 'crest4.sock')
+
+def send(socket_path, request):
+    """
+    Send a single request to a running server and wait for its response.
+    Both are dictionaries that are transmitted as one line of JSON.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile('rb') as handle: line = handle.readline()
+    # The server might have been stopped while working #
+    if not line:
+        msg = "The crest4 server at '%s' closed the connection."
+        raise ConnectionError(msg % socket_path)
+    # Return #
+    return json.loads(line)
+
+def ping(socket_path=None):
+    """
+    Check that a server is running and return some information about it.
+    Raises `OSError` if nothing is listening on the socket.
+    """
+    if socket_path is None: socket_path = default_socket()
+    return send(socket_path, {'command': 'ping'})
+
+def absolute_paths(kwargs):
+    """
+    Return a copy of the keyword arguments of a job where all the paths
+    are absolute, so that the server finds the same files as the client
+    no matter what its own working directory is.
+    """
+    kwargs = dict(kwargs)
+    for key in path_options:
+        if kwargs.get(key) is not None:
+            kwargs[key] = os.path.abspath(os.path.expanduser(kwargs[key]))
+    # The hit cache is a path too, unless it is only turned on or off #
+    reuse_hits = kwargs.get('reuse_hits')
+    if str(reuse_hits).lower() not in ('true', 'false', 'none', ''):
+        reuse_hits = os.path.expanduser(str(reuse_hits))
+        kwargs['reuse_hits'] = os.path.abspath(reuse_hits)
+    # Custom databases are paths as well #
+    search_db = str(kwargs.get('search_db', 'ssuome'))
+    if os.path.exists(search_db):
+        kwargs['search_db'] = os.path.abspath(search_db)
+    # Return #
+    return kwargs
+
+def submit(socket_path=None, **kwargs):
+    """
+    Send a classification job to a running server instead of running it in
+    the current process. The keyword arguments are the same as the ones
+    accepted by the `Classify` object, and the same output files are
+    created. Returns the path to the assignments file.
+
+    Since the socket is local, the server runs on the same machine and
+    the files are not transmitted. Only their absolute paths are.
+    """
+    # Default location of the socket #
+    if socket_path is None: socket_path = default_socket()
+    # Relative paths make no sense in another process #
+    kwargs = absolute_paths(kwargs)
+    # Same messages as when running locally #
+    print('Running crest4 version ' + crest4.__version__)
+    # Send the job #
+    response = send(socket_path, {'command': 'classify', 'kwargs': kwargs})
+    # Raise the same exception type as the server did, when possible #
+    if response['status'] == 'error':
+        error = getattr(builtins, response['type'], None)
+        if not (isinstance(error, type) and issubclass(error, Exception)):
+            error = Exception
+        raise error(response['message'])
+    # Print a success message #
+    msg = "Classification ran successfully. Results are placed in '%s'."
+    print(msg % response['out_file'])
+    # Return #
+    return response['out_file']
+
+###############################################################################
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one request from a connection and writes back one response."""
+
+    def handle(self):
+        # Parse the request #
+        try:
+            request  = json.loads(self.rfile.readline())
+            response = self.server.crest4.process(request)
+        except Exception as error:
+            response = {'status':  'error',
+                        'type':    error.__class__.__name__,
+                        'message': str(error)}
+        # Send the response #
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+###############################################################################
+class Server:
+    """
+    A long-lived process that keeps one or more databases loaded in memory
+    and accepts classification jobs over a local Unix socket. This avoids
+    paying the cost of importing dependencies, loading the tree and the
+    maps, and reading the search index from disk for every job, which
+    dominates the run time when classifying small FASTA files.
+
+    Start it with `crest4 serve` and send jobs with `crest4 submit`, which
+    takes the same options as the `crest4` command itself.
+    """
+
+    def __init__(self,
+                 socket_path = None,
+                 search_db   = 'ssuome',
+                 search_algo = 'blast',
+                 num_workers = 2,
+                 ):
+        """
+        Args:
+
+            socket_path: The path of the Unix socket on which the server will
+                         listen for jobs. By default, `crest4.sock` in the
+                         directory where databases are stored.
+
+            search_db: The databases to load when the server starts, as a
+                       comma-separated list. Either built-in names like
+                       `ssuome` or paths to custom databases. Jobs using any
+                       other database are still accepted, and that database
+                       then stays loaded for later jobs. By default, `ssuome`.
+
+            search_algo: The algorithms for which the search indexes should
+                         be prepared and warmed up, as a comma-separated
+                         list. Any of `blast`, `vsearch` and `kmer`.
+                         An empty value means no index is prepared, which
+                         only makes sense if all jobs come with precomputed
+                         search hits. By default, `blast`.
+
+            num_workers: The number of jobs that can run at the same time.
+                         Jobs that are received while all workers are busy
+                         wait in line. By default, `2`.
+        """
+        # Save attributes #
+        self.socket_path = socket_path
+        self.search_db   = search_db
+        self.search_algo = search_algo
+        self.num_workers = num_workers
+        # Default for the socket #
+        if self.socket_path is None: self.socket_path = default_socket()
+        self.socket_path = os.path.abspath(str(self.socket_path))
+        # Values coming from the command line are strings #
+        self.num_workers = int(self.num_workers)
+        if isinstance(self.search_db, str):
+            self.search_db = self.search_db.split(',')
+        if isinstance(self.search_algo, str):
+            self.search_algo = [a for a in self.search_algo.split(',') if a]
+        # The loaded databases, keyed by the name the user would give #
+        self.databases = {}
+        self.lock = threading.RLock()
+        self.closing = threading.Lock()
+        # The objects that will do the work #
+        self.pool = ThreadPoolExecutor(max_workers=self.num_workers)
+        self.socket_server = None
+
+    def __repr__(self):
+        """A simple representation of this object to avoid memory addresses."""
+        return "<%s object on '%s'>" % (self.__class__.__name__,
+                                        self.socket_path)
+
+    def __call__(self):
+        """Load the databases and serve until interrupted."""
+        # Being terminated is the same as being interrupted #
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+        # Serve #
+        try: self.serve()
+        except KeyboardInterrupt: pass
+
+    #------------------------------ Databases --------------------------------#
+    def database(self, search_db, search_algo=None):
+        """
+        Return the loaded database object for a given name or path, loading
+        it first if this is the first time it is requested.
+        """
+        # Use the same key as the `Classify` object would #
+        from crest4.classify import find_database, all_db_choices
+        key = str(search_db)
+        if key not in all_db_choices: key = os.path.abspath(key)
+        # Only one thread should load a given database #
+        with self.lock:
+            if key not in self.databases:
+                self.databases[key] = self.warm(find_database(key))
+            db = self.databases[key]
+        # The search index might not have been prepared yet #
+        if search_algo is not None: self.index(db, search_algo)
+        # Return #
+        return db
+
+    def index(self, db, search_algo):
+        """Return the search index for the given algorithm."""
+        with self.lock:
+            if search_algo == 'blast':   return db.blast_db
+            if search_algo == 'vsearch': return db.vsearch_db
+            if search_algo == 'kmer':    return db.kmer_db
+
+    def warm(self, db):
+        """
+        Load every structure of a database and read its search indexes once
+        from start to end, so that the operating system keeps their pages in
+        memory for the jobs to come.
+        """
+        # The tree, maps and names #
+        db.preload()
+        # The indexes #
+        paths = []
+        for algo in self.search_algo:
+            self.index(db, algo)
+            if algo == 'blast':
+                paths += glob.glob(glob.escape(str(db.path)) + '.n*')
+            if algo == 'vsearch':
+                paths += [str(db.path.replace_extension('udb'))]
+            if algo == 'kmer':
+                paths += [str(db.path + '.kmer.cache')]
+        # Read them #
+        for path in paths:
+            if not os.path.isfile(path): continue
+            with open(path, 'rb') as handle:
+                while handle.read(1024 * 1024): pass
+        # Return #
+        return db
+
+    #------------------------------- Serving ---------------------------------#
+    def listen(self):
+        """Create the Unix socket and start accepting connections on it."""
+        # Check for another server or a leftover socket file #
+        if os.path.exists(self.socket_path):
+            try: ping(self.socket_path)
+            except OSError: os.remove(self.socket_path)
+            else:
+                msg = "A crest4 server is already listening on '%s'."
+                raise RuntimeError(msg % self.socket_path)
+        # Create the socket #
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path,
+                                                        RequestHandler)
+        server.daemon_threads = True
+        server.crest4 = self
+        self.socket_server = server
+        # Return #
+        return server
+
+    def serve(self):
+        """Load the databases and handle jobs until `shutdown` is called."""
+        # Load everything before accepting jobs #
+        for search_db in self.search_db: self.database(search_db)
+        # Listen #
+        server = self.listen()
+        msg = "The crest4 server is ready and listening on '%s'."
+        print(msg % self.socket_path)
+        sys.stdout.flush()
+        # Until `shutdown` is called or the user interrupts us #
+        try: server.serve_forever()
+        finally: self.close()
+
+    def shutdown(self):
+        """
+        Stop a server that is running in another thread, for instance when
+        used from python instead of the command line.
+        """
+        server = self.socket_server
+        if server is not None: server.shutdown()
+        self.close()
+
+    def close(self):
+        """Wait for the running jobs to finish and remove the socket."""
+        with self.closing:
+            if self.socket_server is None: return
+            self.socket_server.server_close()
+            self.pool.shutdown(wait=True)
+            if os.path.exists(self.socket_path): os.remove(self.socket_path)
+            self.socket_server = None
+
+    #------------------------------- Requests --------------------------------#
+    def process(self, request):
+        """Answer a request received over the socket."""
+        # Check that the server is alive #
+        if request['command'] == 'ping':
+            return {'status':    'ok',
+                    'version':   crest4.__version__,
+                    'databases': list(self.databases)}
+        # Run a classification job with a bounded number of workers #
+        if request['command'] == 'classify':
+            job = self.pool.submit(self.classify, request['kwargs'])
+            return {'status': 'ok', 'out_file': str(job.result())}
+        # Otherwise #
+        msg = "The command '%s' is not supported."
+        raise ValueError(msg % request['command'])
+
+    def classify(self, kwargs):
+        """Run one job with the preloaded database and return its output."""
+        from crest4.classify import Classify
+        # No search index is needed if the hits are given #
+        algo = kwargs.get('search_algo', 'blast')
+        if kwargs.get('search_hits') is not None: algo = None
+        # Swap the database for the loaded object #
+        search_db = kwargs.get('search_db', 'ssuome')
+        kwargs['search_db'] = self.database(search_db, algo)
+        # Run #
+        return Classify(**kwargs)()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, re
+
+# Internal modules #
+from crest4.compression import open_text
+
+# The last line that BLAST writes when using `-outfmt 7` #
+blast_footer = re.compile(r'^# BLAST processed (\d+) queries$')
+
+###############################################################################
+def read_records(path):
+    """
+    Iterate over the sequences of a FASTA file without parsing them, and
+    yield tuples of two elements: the exact text of the record (header
+    included) and the length of its sequence.
+    """
+    lines, length = [], 0
+    with open_text(path) as handle:
+        for line in handle:
+            if line.startswith('>') and lines:
+                yield ''.join(lines), length
+                lines, length = [], 0
+            if not line.startswith('>'): length += len(line.strip())
+            lines.append(line)
+    if lines: yield ''.join(lines), length
+
+def shard_bounds(lengths, num_shards):
+    """
+    Given the length of every sequence, return the index of the first
+    sequence of every shard, plus the total number of sequences at the end.
+    Shards are contiguous and have about the same total sequence length,
+    since that is what the search time depends on. There can be fewer
+    shards than requested, but never an empty one.
+    """
+    total = sum(lengths)
+    bounds, cumulative = [0], 0
+    for i, length in enumerate(lengths):
+        # A new shard starts if most of this sequence is past the share #
+        target = total * len(bounds) / num_shards
+        middle = cumulative + length / 2
+        if i and middle > target and len(bounds) < num_shards:
+            bounds.append(i)
+        cumulative += length
+    # The end of the last shard #
+    if bounds[-1] != len(lengths): bounds.append(len(lengths))
+    # Return #
+    return bounds
+
+def split_fasta(path, num_shards, directory):
+    """
+    Split the FASTA file at `path` into at most `num_shards` smaller files
+    placed in `directory`, keeping the sequences in their original order.
+    Returns the list of paths created.
+    """
+    # First pass to get the lengths #
+    lengths = [length for text, length in read_records(path)]
+    bounds  = shard_bounds(lengths, num_shards)
+    # Second pass to write the shards #
+    os.makedirs(str(directory), exist_ok=True)
+    paths   = [os.path.join(str(directory), 'shard_%03i.fasta' % i)
+               for i in range(len(bounds) - 1)]
+    records = read_records(path)
+    for i, shard_path in enumerate(paths):
+        with open(shard_path, 'wt') as handle:
+            for _ in range(bounds[i+1] - bounds[i]):
+                handle.write(next(records)[0])
+    # Return #
+    return paths
+
+def merge_hits(paths, out_path):
+    """
+    Concatenate the search results of every shard, in order, into a single
+    file at `out_path`. When BLAST was used, the line reporting the number
+    of queries processed at the end of every shard is replaced by a single
+    one with the total, so that the result is identical to what a single
+    process would have produced on the whole FASTA file.
+    """
+    total, footer = 0, False
+    with open_text(out_path, 'wt') as output:
+        for path in paths:
+            with open_text(path) as handle:
+                for line in handle:
+                    match = blast_footer.match(line.rstrip('\n'))
+                    if match:
+                        total += int(match.group(1))
+                        footer = True
+                        continue
+                    output.write(line)
+        if footer: output.write('# BLAST processed %i queries\n' % total)
+    # Return #
+    return out_path
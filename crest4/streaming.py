@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+GNUv3 Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time
+
+# Internal modules #
+from crest4.sharding import blast_footer
+from crest4.compression import open_text
+
+###############################################################################
+def follow(path, running, interval=0.2):
+    """
+    Yield the lines of the file at `path` while another process is still
+    writing it, like `tail -f` would. The function `running` is called to
+    know if the writer is still active. Only complete lines are yielded,
+    except for the very last one once the writer has stopped.
+    A compressed file can only be followed once it is complete.
+    """
+    path = str(path)
+    # The file might not have been created yet #
+    while not os.path.exists(path):
+        if not running(): return
+        time.sleep(interval)
+    # Read what is available and wait for more #
+    partial = ''
+    with open_text(path) as handle:
+        while True:
+            # Check before reading so that nothing written after is missed #
+            finished = not running()
+            for line in iter(handle.readline, ''):
+                partial += line
+                if not partial.endswith('\n'): continue
+                yield partial
+                partial = ''
+            if finished: break
+            time.sleep(interval)
+    # The last line might not end with a newline #
+    if partial: yield partial
+
+def hit_blocks(lines):
+    """
+    Group the lines of a search results file into blocks of text, one for
+    every query, yielding each block as soon as the first line of the next
+    one is seen. With BLAST, every query starts with a few comment lines.
+    With VSEARCH, the hits of a query are simply one after the other.
+    """
+    block, name = [], None
+    for line in lines:
+        # The line counting the queries is not part of any block #
+        if blast_footer.match(line.rstrip('\n')): continue
+        # BLAST starts every query with a header #
+        if line.startswith('# BLAST'):
+            if block: yield ''.join(block)
+            block, name = [line], None
+            continue
+        # Otherwise a change of name marks the start of a new VSEARCH query #
+        if not line.startswith('#'):
+            query = line.split('\t', 1)[0]
+            if block and not block[0].startswith('#') and query != name:
+                yield ''.join(block)
+                block = []
+            name = query
+        block.append(line)
+    # The last one #
+    if block: yield ''.join(block)
+
+def in_order(queries, order, missing):
+    """
+    Put the queries coming from `queries`, in any order, in the order of
+    the dictionary `order`. Its keys are the ID of every sequence, and its
+    values are the ID of the query that holds its results (see the
+    `find_representatives` function). Yields tuples of the sequence ID and
+    the query as soon as possible, and only keeps the queries that are
+    still needed later on. Queries that never arrive, like the ones VSEARCH
+    has no hits for, are made at the end by calling `missing` with their
+    ID. Queries that are not in `order` are passed through directly.
+    """
+    # The last position at which every query is needed #
+    last = {rep: i for i, rep in enumerate(order.values())}
+    # The next sequence to output #
+    waiting  = iter(enumerate(order.items()))
+    current  = next(waiting, None)
+    received = {}
+    # A `None` at the end signals that nothing else will arrive #
+    for query in list_and_end(queries):
+        if query is not None:
+            if query.name not in last:
+                yield query.name, query
+                continue
+            received[query.name] = query
+        # Output everything that is ready #
+        while current is not None:
+            i, (seq_id, rep) = current
+            if rep not in received:
+                if query is not None: break
+                received[rep] = missing(rep)
+            yield seq_id, received[rep]
+            if last[rep] == i: del received[rep]
+            current = next(waiting, None)
+
+def list_and_end(items):
+    """Yield all the items of an iterable followed by `None`."""
+    yield from items
+    yield None
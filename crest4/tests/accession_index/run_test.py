@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `accession_index` unittest.
+"""
+
+# Built-in modules #
+import inspect, os, shutil
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import numpy
+
+# Internal modules #
+from crest4.databases import CrestDatabase
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_database():
+    """Copy the custom database to a temporary location and return it."""
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    source = this_dir.directory + 'custom_database/custom/'
+    shutil.copytree(source, str(db_dir))
+    return db_dir
+
+###############################################################################
+def test_same_as_dict():
+    db = CrestDatabase(custom_path=make_database())
+    # Every accession should point to the same node #
+    for accession, name in db.acc_to_node.items():
+        node = db.acc_index.get(accession)
+        assert db.compiled_tree.name(node) == name
+    # Unknown accessions are not found #
+    assert db.acc_index.get('ZZZZZZZZ') is None
+    assert 'ZZZZZZZZ' not in db.acc_index
+    # The cache file was created and is reused #
+    assert os.path.exists(db.path.replace_extension('map') + '.cache')
+    again = CrestDatabase(custom_path=db.path.directory)
+    assert isinstance(again.acc_index.keys, numpy.memmap)
+
+def test_duplicates_and_missing_nodes():
+    db_dir = make_database()
+    # The last line wins like in a dictionary, and nodes can be missing #
+    with open(db_dir + 'custom.map', 'wt') as handle:
+        handle.write('1,XXXXXXXX\n2,YYYYYYYY\n1,YYYYYYYY\n7,ZZZZZZZZ\n')
+    db = CrestDatabase(custom_path=db_dir)
+    assert len(db.acc_index) == 3
+    assert db.compiled_tree.name(db.acc_index.get('YYYYYYYY')) == '1'
+    assert db.acc_index.get('ZZZZZZZZ') == -1
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_as_dict()
+    test_duplicates_and_missing_nodes()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `adaptive_targets` unittest.
+"""
+
+# Built-in modules #
+import inspect, os, random
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.checkpoint import replace_hits
+from crest4.tests.helpers import make_database, fields, mutate
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_sequences(db_dir, accessions, per_genus=30):
+    """
+    Replace the sequences of the database. The species of the first half
+    of the genera are almost identical, the others are only similar.
+    """
+    rand = random.Random(0)
+    sequences = {}
+    for start in range(0, len(accessions), per_genus):
+        genus = accessions[start:start + per_genus]
+        base  = ''.join(rand.choices('ACGT', k=400))
+        for acc in genus:
+            if start < len(accessions) // 2:
+                sequences[acc] = mutate(rand, base, 2)
+            else:
+                sequences[acc] = mutate(rand, base, 20)
+    with open(db_dir + 'custom.fasta', 'wt') as handle:
+        for acc, seq in sequences.items():
+            handle.write('>%s\n%s\n' % (acc, seq))
+    return sequences
+
+def test_same_assignments():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/', (3, 4, 30))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand  = random.Random(1)
+    fasta = output_dir + 'queries.fasta'
+    with open(fasta, 'wt') as handle:
+        for acc in rand.sample(accessions, 40):
+            handle.write('>%s\n%s\n' % (acc, mutate(rand, sequences[acc], 1)))
+    # Search with many targets, the default, and the adaptive mode #
+    results, sizes = [], []
+    for max_targets, adaptive in ((1000, False), (100, False), (None, True)):
+        c = Classify(fasta            = fasta,
+                     search_algo      = 'kmer',
+                     search_db        = output_dir + 'custom/',
+                     output_dir       = output_dir + 'crest4/',
+                     adaptive_targets = adaptive)
+        if max_targets: c.search_filtering = {'max_targets': max_targets}
+        c()
+        results.append([q.tax_string for q in c.queries])
+        sizes.append(os.path.getsize(c.search_hits))
+    # The assignments are the same as with the default number of targets,
+    # since the k-mer search always reports the best ones first, but the
+    # results take less space #
+    assert results[0] == results[1] == results[2]
+    assert sizes[2] < sizes[1] == sizes[0]
+    # Some sequences are assigned to a genus and some to a species #
+    depths = set(line.count(';') for line in results[2])
+    assert len(depths) > 1
+
+def test_replace_blast_hits():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    def block(name, hits):
+        text = '# BLASTN 2.11.0+\n# Query: %s\n# Database: custom\n' % name
+        text += '# Fields: %s\n# %i hits found\n' % (fields, len(hits))
+        return text + ''.join('%s\t%s\t500\t300\t300\n' % (name, acc)
+                              for acc in hits)
+    footer = '# BLAST processed 3 queries\n'
+    old = block('a', ['X']) + block('b', ['X', 'Y']) + block('c', [])
+    new = block('b', ['X', 'Y', 'Z']) + '# BLAST processed 1 queries\n'
+    (output_dir + 'old.hits').write(old + footer)
+    (output_dir + 'new.hits').write(new)
+    replace_hits(output_dir + 'old.hits', output_dir + 'new.hits')
+    expected = block('a', ['X']) + block('b', ['X', 'Y', 'Z']) + \
+               block('c', []) + footer
+    assert (output_dir + 'old.hits').contents == expected
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_assignments()
+    test_replace_blast_hits()
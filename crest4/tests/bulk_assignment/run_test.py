@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `bulk_assignment` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.tests.helpers import make_database, make_random_hits
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def test_same_results():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/')
+    names = ['query_%i' % i for i in range(500)]
+    fasta = output_dir + 'queries.fasta'
+    with open(fasta, 'wt') as handle:
+        for name in names: handle.write('>%s\nACGT\n' % name)
+    hits = output_dir + 'queries.hits'
+    make_random_hits(hits, accessions, names)
+    # Try different options #
+    for options in ({}, {'min_smlrty': False}, {'score_drop': 0}):
+        results = []
+        for bulk in (False, True):
+            c = Classify(fasta       = fasta,
+                         search_hits = hits,
+                         search_db   = output_dir + 'custom/',
+                         output_dir  = output_dir + 'crest4/',
+                         dereplicate = False,
+                         bulk_assign = bulk,
+                         **options)
+            results.append([(q.name, q.assigned_node, q.tax_string)
+                            for q in c.queries])
+        assert results[0] == results[1]
+        # Some queries are not assigned, others are at different levels #
+        ranks = set(q.rank for q in c.queries if q.assigned_node is not False)
+        assert any(q.assigned_node is False for q in c.queries)
+        assert len(ranks) > 1
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_results()
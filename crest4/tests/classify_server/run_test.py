@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `classify_server` unittest.
+"""
+
+# Built-in modules #
+import os, inspect, time, threading
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4 import Classify
+from crest4.server import Server, submit, ping, absolute_paths
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def start_server(socket_path, search_db):
+    """Start a server in a background thread and wait until it's ready."""
+    server = Server(socket_path = socket_path,
+                    search_db   = search_db,
+                    search_algo = '',
+                    num_workers = 2)
+    thread = threading.Thread(target=server, daemon=True)
+    thread.start()
+    for i in range(100):
+        try: return server, ping(socket_path)
+        except OSError: time.sleep(0.1)
+    raise TimeoutError("The server did not start.")
+
+###############################################################################
+def test_classify_server():
+    # The inputs #
+    fasta     = this_dir.find('*.fasta')
+    hits      = this_dir + 'precomputed.hits'
+    search_db = this_dir.directory + 'custom_database/custom/'
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    # Start the server #
+    socket_path = output_dir + 'crest4.sock'
+    server, info = start_server(socket_path, search_db)
+    assert len(info['databases']) == 1
+    # The expected result when running locally #
+    local = Classify(fasta       = fasta,
+                     search_hits = hits,
+                     search_db   = search_db,
+                     output_dir  = output_dir + 'local/')
+    expected = open(local()).read()
+    assert expected == 'Kocuria\tNode 1\nMarmoricola\tNode 1; Node 2\n'
+    # Several jobs at the same time #
+    def job(i):
+        submit(socket_path = socket_path,
+               fasta       = fasta,
+               search_hits = hits,
+               search_db   = search_db,
+               output_dir  = output_dir + 'job_%i/' % i)
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    for i in range(4):
+        path = output_dir + 'job_%i/assignments.txt' % i
+        assert open(path).read() == expected
+    # Errors are sent back to the client #
+    with pytest.raises(ValueError):
+        submit(socket_path = socket_path,
+               fasta       = fasta,
+               search_hits = hits,
+               search_db   = search_db,
+               min_score   = 'abc')
+    # Stop the server #
+    server.shutdown()
+    assert not socket_path.exists
+
+def test_absolute_paths():
+    # Relative paths are resolved in the directory of the client #
+    kwargs = absolute_paths({'fasta':      'reads.fasta',
+                             'otu_table':  None,
+                             'reuse_hits': 'cache/hits.sqlite'})
+    assert kwargs['fasta'] == os.path.abspath('reads.fasta')
+    assert kwargs['otu_table'] is None
+    assert kwargs['reuse_hits'] == os.path.abspath('cache/hits.sqlite')
+    # Unless the hit cache is only turned on or off #
+    for flag in (True, False, 'True', 'false'):
+        assert absolute_paths({'reuse_hits': flag})['reuse_hits'] == flag
+
+###############################################################################
+if __name__ == '__main__':
+    test_classify_server()
+    test_absolute_paths()
@@ -48,7 +48,20 @@ async def test_cmd_line_tool():
     # Return #
     return process
 
+def test_sub_command_help():
+    # Every sub-command can build its parser without conflicting options #
+    for command in ([], ['submit'], ['samples'], ['serve'], ['prepare-db'],
+                    ['cache', 'stats'], ['cache', 'prune']):
+        cmd = [sys.executable, '-m', 'crest4'] + command + ['--help']
+        process = subprocess.run(cmd, capture_output=True, text=True)
+        assert process.returncode == 0, process.stderr
+    # The socket of the server is an option of `submit` #
+    cmd = [sys.executable, '-m', 'crest4', 'submit', '--help']
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    assert '--socket_path' in process.stdout
+
 ###############################################################################
 if __name__ == '__main__':
     proc = test_cmd_line_tool()
-    asyncio.run(proc)
\ No newline at end of file
+    asyncio.run(proc)
+    test_sub_command_help()
\ No newline at end of file
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `compiled_tree` unittest.
+"""
+
+# Built-in modules #
+import inspect, os, shutil
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import numpy, pytest
+
+# Internal modules #
+from crest4.databases import CrestDatabase
+from crest4.compiled_tree import CompiledTree, parse_newick
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# All the trees that we will compare #
+tree_paths = [this_dir + 'nested.tre',
+              this_dir.directory + 'custom_database/custom/custom.tre']
+
+###############################################################################
+def test_same_as_ete():
+    from ete4 import Tree
+    for path in tree_paths:
+        # Load the tree in both ways #
+        ete  = Tree(str(path), parser=8)
+        tree = CompiledTree(parse_newick(path))
+        nodes = list(ete.traverse())
+        assert len(tree) == len(nodes)
+        # Check every node and its ancestors #
+        for node in nodes:
+            index = tree.index(node.name)
+            assert tree.name(index) == node.name
+            assert tree.is_root(index) == node.is_root
+            ancestors = [tree.name(a) for a in tree.ancestors(index)]
+            assert ancestors == [a.name for a in node.ancestors()]
+        # Check the common ancestor of every pair of nodes #
+        for first in nodes:
+            for second in nodes:
+                names    = [first.name, second.name]
+                expected = ete.common_ancestor(names).name
+                assert tree.name(tree.common_ancestor(names)) == expected
+
+###############################################################################
+def test_cache_invalidation():
+    # Copy a database to a temporary location #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    source = this_dir.directory + 'custom_database/custom/'
+    shutil.copytree(source, str(db_dir))
+    tre = db_dir + 'custom.tre'
+    # The first load creates the cache #
+    first = CrestDatabase(custom_path=db_dir).compiled_tree
+    assert os.path.exists(tre + '.cache')
+    # The second load memory-maps it #
+    second = CrestDatabase(custom_path=db_dir).compiled_tree
+    assert isinstance(second.parent, numpy.memmap)
+    assert list(second.names) == list(first.names)
+    # Changing the tree should invalidate the cache #
+    with open(tre, 'wt') as handle: handle.write('((3)2)1;\n')
+    third = CrestDatabase(custom_path=db_dir).compiled_tree
+    assert list(third.names) == ['1', '2', '3']
+    assert list(third.depth) == [0, 1, 2]
+
+def test_find_node():
+    # Copy a database to a temporary location with a bigger tree #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    source = this_dir.directory + 'custom_database/custom/'
+    shutil.copytree(source, str(db_dir))
+    shutil.copy(this_dir + 'nested.tre', db_dir + 'custom.tre')
+    db = CrestDatabase(custom_path=db_dir)
+    # Every name is found at its index #
+    for name in db.compiled_tree.names.tolist():
+        assert db.compiled_tree.name(db.find_node(name)) == name
+        assert db.node_index[name] == db.find_node(name)
+    # Missing names raise an error #
+    with pytest.raises(LookupError):
+        db.find_node('missing')
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_as_ete()
+    test_cache_invalidation()
+    test_find_node()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `compressed_files` unittest.
+"""
+
+# Built-in modules #
+import inspect, random, subprocess, shutil, gzip, bz2, os
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4 import Classify
+from crest4.compression import open_text, decompressed, compressing
+from crest4.compression import searchable_fasta
+from crest4.tests.helpers import make_database, make_sequences, mutate
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_inputs(output_dir):
+    """
+    Write the same FASTA file and OTU table, both plain and gzipped.
+    """
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand = random.Random(7)
+    names, text = [], ''
+    for acc in rand.sample(accessions, 20):
+        names.append('seq_' + acc)
+        text += '>seq_%s\n%s\n' % (acc, mutate(rand, sequences[acc], 4))
+    text += '>unknown\n%s\n' % ''.join(rand.choices('ACGT', k=400))
+    names.append('unknown')
+    table = 'otu,jan,feb\n' + ''.join('%s,%i,%i\n' % (name, i, i + 1)
+                                      for i, name in enumerate(names))
+    with open(output_dir + 'queries.fasta', 'wt') as handle:
+        handle.write(text)
+    with gzip.open(output_dir + 'queries.fasta.gz', 'wt') as handle:
+        handle.write(text)
+    with open(output_dir + 'table.csv', 'wt') as handle:
+        handle.write(table)
+    with gzip.open(output_dir + 'table.csv.gz', 'wt') as handle:
+        handle.write(table)
+
+def test_same_results():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    make_inputs(output_dir)
+    # Plain files #
+    plain = Classify(fasta       = output_dir + 'queries.fasta',
+                     search_algo = 'kmer',
+                     search_db   = output_dir + 'custom/',
+                     output_dir  = output_dir + 'plain/',
+                     otu_table   = output_dir + 'table.csv')
+    plain()
+    # Compressed inputs and outputs #
+    zipped = Classify(fasta       = output_dir + 'queries.fasta.gz',
+                      search_algo = 'kmer',
+                      search_db   = output_dir + 'custom/',
+                      output_dir  = output_dir + 'zipped/',
+                      otu_table   = output_dir + 'table.csv.gz',
+                      zip_outputs = 'gz')
+    zipped()
+    assert zipped.out_file.endswith('assignments.txt.gz')
+    assert zipped.search_hits.endswith('search.hits.gz')
+    for name in ('assignments.txt', 'search.hits', 'otus_by_rank.tsv',
+                 'otus_cumulative.tsv'):
+        with gzip.open(output_dir + 'zipped/' + name + '.gz', 'rt') as handle:
+            assert handle.read() == (output_dir + 'plain/' + name).contents
+    # No pipes are left behind #
+    assert not [name for name in os.listdir(output_dir + 'zipped/')
+                if name.startswith('pipe_')]
+    # The searches that write their results at the end #
+    for options in ({'num_shards': 2}, {'adaptive_targets': True}):
+        other = Classify(fasta       = output_dir + 'queries.fasta.gz',
+                         search_algo = 'kmer',
+                         search_db   = output_dir + 'custom/',
+                         output_dir  = output_dir + 'other/',
+                         zip_outputs = 'bz2',
+                         **options)
+        other()
+        with open_text(other.out_file) as handle:
+            assert handle.read() == plain.out_file.contents
+    # Compressed search results given by the user #
+    again = Classify(fasta       = output_dir + 'queries.fasta.gz',
+                     search_algo = 'kmer',
+                     search_db   = output_dir + 'custom/',
+                     search_hits = zipped.search_hits,
+                     output_dir  = output_dir + 'again/')
+    again()
+    assert again.out_file.contents == plain.out_file.contents
+
+@pytest.mark.parametrize('algo', ['blast', 'vsearch'])
+def test_searchable_pipe(algo):
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    make_inputs(output_dir)
+    c = Classify(fasta       = output_dir + 'queries.fasta.gz',
+                 search_algo = algo,
+                 search_db   = output_dir + 'custom/',
+                 output_dir  = output_dir + 'crest4/')
+    # The search of a named pipe is not refused as empty. The path of the
+    # database is given so that its index is not built #
+    with decompressed(c.fasta, output_dir) as query:
+        search = c.make_search(searchable_fasta(query),
+                               output_dir + 'search.hits', c.database.path)
+        search.validate()
+        assert search.input_fasta
+    # Plain files are not changed #
+    (output_dir + 'empty.fasta').touch()
+    assert searchable_fasta(output_dir + 'queries.fasta')
+    assert not searchable_fasta(output_dir + 'empty.fasta')
+
+@pytest.mark.parametrize('algo', ['blast', 'vsearch'])
+def test_external_programs(algo):
+    if not shutil.which('blastn' if algo == 'blast' else algo):
+        pytest.skip("The %s executable is not installed." % algo)
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    make_inputs(output_dir)
+    # The same results with a plain and a compressed FASTA file #
+    outputs = []
+    for name in ('queries.fasta', 'queries.fasta.gz'):
+        c = Classify(fasta       = output_dir + name,
+                     search_algo = algo,
+                     search_db   = output_dir + 'custom/',
+                     output_dir  = output_dir + name + '.crest4/',
+                     zip_outputs = 'gz' if name.endswith('.gz') else False)
+        c()
+        with open_text(c.out_file) as handle: outputs.append(handle.read())
+    assert outputs[0] == outputs[1]
+    assert 'seq_' in outputs[0]
+
+def test_pipes():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    text = ''.join('line %i\n' % i for i in range(100000))
+    with bz2.open(output_dir + 'input.txt.bz2', 'wt') as handle:
+        handle.write(text)
+    # An external program reads and writes plain text #
+    with decompressed(output_dir + 'input.txt.bz2', output_dir) as source, \
+         compressing(output_dir + 'output.txt.gz', output_dir) as sink:
+        assert not source.endswith('.bz2')
+        subprocess.run(['sh', '-c', 'cat "$0" > "$1"', source, sink],
+                       check=True)
+    with open_text(output_dir + 'output.txt.gz') as handle:
+        assert handle.read() == text
+    # A program that never opens the pipes does not block #
+    with decompressed(output_dir + 'input.txt.bz2', output_dir) as source, \
+         compressing(output_dir + 'empty.txt.gz', output_dir) as sink:
+        subprocess.run(['true'], check=True)
+    with open_text(output_dir + 'empty.txt.gz') as handle:
+        assert handle.read() == ''
+    # Plain files are given as they are #
+    with decompressed(output_dir + 'plain.txt', output_dir) as source:
+        assert source == output_dir + 'plain.txt'
+    assert not [name for name in os.listdir(output_dir)
+                if name.startswith('pipe_')]
+
+def test_bad_options():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    make_inputs(output_dir)
+    options = dict(fasta       = output_dir + 'queries.fasta',
+                   search_algo = 'kmer',
+                   search_db   = output_dir + 'custom/')
+    with pytest.raises(ValueError):
+        Classify(zip_outputs='rar', **options)
+    with pytest.raises(ValueError):
+        Classify(zip_outputs='gz', progressive=True, **options)
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_results()
+    for algo in ('blast', 'vsearch'):
+        test_searchable_pipe(algo)
+        test_external_programs(algo)
+    test_pipes()
+    test_bad_options()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `dereplication` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.dereplicate import find_representatives, write_representatives
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# The two sequences that have precomputed hits #
+server_dir = this_dir.directory + 'classify_server/'
+
+###############################################################################
+def make_fasta(output_dir):
+    """
+    Write a FASTA file where both original sequences appear several times
+    under different names, with different line breaks and letter cases.
+    """
+    original = open(server_dir + 'two_seqs.fasta').read()
+    kocuria, marmoricola = ['>' + r for r in original.split('>')[1:]]
+    def rename(record, name, lower=False):
+        header, sequence = record.split('\n', 1)
+        sequence = ''.join(sequence.split())
+        if lower: sequence = sequence.lower()
+        return '>%s\n%s\n' % (name, sequence)
+    path = output_dir + 'duplicates.fasta'
+    output_dir.create_if_not_exists()
+    with open(path, 'wt') as handle:
+        handle.write(kocuria)
+        handle.write(rename(kocuria, 'Kocuria_copy', lower=True))
+        handle.write(marmoricola)
+        handle.write(rename(marmoricola, 'Marmoricola_copy'))
+        handle.write(rename(kocuria, 'Kocuria_again'))
+    return path
+
+###############################################################################
+def test_representatives():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    fasta = make_fasta(output_dir)
+    # Find the first of each kind #
+    reps = find_representatives(fasta)
+    assert reps == {'Kocuria':          'Kocuria',
+                    'Kocuria_copy':     'Kocuria',
+                    'Marmoricola':      'Marmoricola',
+                    'Marmoricola_copy': 'Marmoricola',
+                    'Kocuria_again':    'Kocuria'}
+    # Only these are written, unchanged #
+    unique = write_representatives(fasta, reps, output_dir + 'unique.fasta')
+    assert open(unique).read() == open(server_dir + 'two_seqs.fasta').read()
+
+def test_fan_out():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    fasta = make_fasta(output_dir)
+    # The hits only contain the two sequences that would have been searched #
+    c = Classify(fasta       = fasta,
+                 search_hits = server_dir + 'precomputed.hits',
+                 search_db   = this_dir.directory + 'custom_database/custom/',
+                 output_dir  = output_dir + 'crest4/')
+    # Every sequence gets the assignment of the first identical one #
+    assert open(c()).read() == 'Kocuria\tNode 1\n'                     \
+                               'Kocuria_copy\tNode 1\n'                \
+                               'Marmoricola\tNode 1; Node 2\n'         \
+                               'Marmoricola_copy\tNode 1; Node 2\n'    \
+                               'Kocuria_again\tNode 1\n'
+    assert c.queries_by_id['Kocuria_again'].rank == c.queries[0].rank
+
+###############################################################################
+if __name__ == '__main__':
+    test_representatives()
+    test_fan_out()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `exact_matches` unittest.
+"""
+
+# Built-in modules #
+import inspect, random
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.databases import CrestDatabase
+from crest4.tests.helpers import make_database, make_sequences
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_inputs(output_dir):
+    """
+    Write a database where two species of the same genus have the same
+    sequence, and a FASTA file with sequences identical to references and
+    unrelated ones. Returns the names of the sequences.
+    """
+    db_dir = output_dir + 'custom/'
+    accessions = make_database(db_dir, (3, 4, 5))
+    sequences  = make_sequences(db_dir, accessions)
+    # The first two species are in the same genus #
+    first, second = accessions[:2]
+    sequences[second] = sequences[first]
+    with open(db_dir + 'custom.fasta', 'wt') as handle:
+        for acc, seq in sequences.items():
+            handle.write('>%s\n%s\n' % (acc, seq))
+    # The queries #
+    rand = random.Random(4)
+    queries = {'twice':  sequences[first],
+               'single': sequences[accessions[30]],
+               'lower':  sequences[accessions[40]].lower(),
+               'other':  ''.join(rand.choices('ACGT', k=400))}
+    with open(output_dir + 'queries.fasta', 'wt') as handle:
+        for name, seq in queries.items():
+            handle.write('>%s\n%s\n' % (name, seq))
+    return accessions
+
+def test_index():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_inputs(output_dir)
+    index = CrestDatabase(custom_path=output_dir + 'custom/').exact_db
+    sequences = {}
+    for line in open(output_dir + 'queries.fasta'):
+        if line.startswith('>'): name = line[1:].strip()
+        else: sequences[name] = line.strip()
+    assert index.find(sequences['twice'])  == accessions[:2]
+    assert index.find(sequences['single']) == [accessions[30]]
+    assert index.find(sequences['lower'])  == [accessions[40]]
+    assert index.find(sequences['other'])  == []
+
+def test_same_as_search():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    make_inputs(output_dir)
+    # Search everything, or only the sequences without an exact match #
+    results = []
+    for exact in (False, True):
+        c = Classify(fasta         = output_dir + 'queries.fasta',
+                     search_algo   = 'kmer',
+                     search_db     = output_dir + 'custom/',
+                     output_dir    = output_dir + 'crest4/',
+                     exact_matches = exact)
+        c()
+        results.append(c.out_file.contents)
+    assert results[0] == results[1]
+    # Only one sequence was searched #
+    assert set(c.exact_queries) == {'twice', 'single', 'lower'}
+    assert [seq.id for seq in c.fasta_to_search()] == ['other']
+    # The identical references only agree at the genus level #
+    twice = c.queries_by_id['twice']
+    assert twice.rank == 2
+    assert c.queries_by_id['single'].rank == 3
+
+###############################################################################
+if __name__ == '__main__':
+    test_index()
+    test_same_as_search()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `file_locks` unittest.
+"""
+
+# Built-in modules #
+import inspect, os, time, shutil, multiprocessing
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4.array_cache import ArrayCache
+from crest4.databases import CrestDatabase
+from crest4.locking import FileLock
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def build_cache(output_dir):
+    """
+    Get the arrays of a cache that is slow to build, and record in a file
+    every time the build function actually runs.
+    """
+    import numpy
+    def build():
+        with open(output_dir + 'builds.txt', 'a') as handle:
+            handle.write('%i\n' % os.getpid())
+        time.sleep(0.5)
+        return {'values': numpy.arange(1000)}
+    cache = ArrayCache(output_dir + 'source.txt.cache',
+                       [output_dir + 'source.txt'])
+    return int(cache.get(build)['values'].sum())
+
+def hold_lock(output_dir):
+    """Write to a file two times while holding the lock."""
+    with FileLock(output_dir + 'test.lock'):
+        for _ in range(2):
+            with open(output_dir + 'order.txt', 'a') as handle:
+                handle.write('%i\n' % os.getpid())
+            time.sleep(0.1)
+
+###############################################################################
+def test_single_build():
+    # Start from scratch #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    with open(output_dir + 'source.txt', 'wt') as handle: handle.write('a')
+    # Many processes need the same cache at the same time #
+    context = multiprocessing.get_context('fork')
+    with context.Pool(4) as pool:
+        results = pool.map(build_cache, [output_dir] * 4)
+    # Everyone got the same arrays but only one process built them #
+    assert results == [499500] * 4
+    with open(output_dir + 'builds.txt') as handle:
+        assert len(handle.readlines()) == 1
+
+def test_mutual_exclusion():
+    # Start from scratch #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    # Several processes take turns #
+    context = multiprocessing.get_context('fork')
+    with context.Pool(3) as pool:
+        pool.map(hold_lock, [output_dir] * 3)
+    # The two lines of every process are next to each other #
+    with open(output_dir + 'order.txt') as handle:
+        pids = handle.read().split()
+    assert len(pids) == 6
+    assert all(pids[i] == pids[i+1] for i in range(0, 6, 2))
+
+def test_prepare_db():
+    # Copy the custom database without its cache files #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    db_dir.create()
+    source_dir = this_dir.directory + 'custom_database/custom/'
+    for ext in ('fasta', 'map', 'names', 'tre'):
+        shutil.copy(source_dir + 'custom.' + ext, db_dir)
+    # Build everything except the search indexes #
+    from crest4.prepare import prepare_db
+    prepare_db(db_dir, search_algo='')
+    # Check that the cache files are there #
+    for name in ('custom.tre.cache', 'custom.tre.lca.cache',
+                 'custom.map.cache', 'custom.names.cache'):
+        assert os.path.exists(db_dir + name)
+
+def test_blast_index():
+    # Copy the custom database with a truncated BLAST index #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    db_dir.create()
+    source_dir = this_dir.directory + 'custom_database/custom/'
+    for ext in ('fasta', 'map', 'names', 'tre'):
+        shutil.copy(source_dir + 'custom.' + ext, db_dir)
+    with open(db_dir + 'custom.fasta.nsq', 'wb') as handle:
+        handle.write(b'\0' * 10)
+    db = CrestDatabase(custom_path=db_dir)
+    # An index without its marker is not taken as complete #
+    assert not db.blast_marker.exists
+    # A build that fails leaves no marker and no temporary files #
+    path = os.environ['PATH']
+    os.environ['PATH'] = str(output_dir)
+    try:
+        with pytest.raises(OSError):
+            db.make_blast_db(db.path)
+    finally:
+        os.environ['PATH'] = path
+    assert not db.blast_marker.exists
+    assert not [name for name in os.listdir(db_dir) if '.tmp' in name]
+    # The index is built again when the program is installed #
+    if not shutil.which('makeblastdb'):
+        pytest.skip("The makeblastdb executable is not installed.")
+    db.blast_db
+    assert db.blast_marker.exists
+    assert os.path.getsize(db_dir + 'custom.fasta.nsq') != 10
+    assert not [name for name in os.listdir(db_dir) if '.tmp' in name]
+
+###############################################################################
+if __name__ == '__main__':
+    test_single_build()
+    test_mutual_exclusion()
+    test_prepare_db()
+    test_blast_index()
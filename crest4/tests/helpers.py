@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Functions shared by several tests to create synthetic databases, sequences
+and search results, so that they don't need to download anything nor to
+run an external search program.
+"""
+
+# Built-in modules #
+import random
+
+# The columns of the BLAST results, as written with `-outfmt 7` #
+fields = 'query id, subject id, bit score, alignment length, identical'
+
+###############################################################################
+def make_database(db_dir, branching=(20, 30, 100)):
+    """
+    Write a database where every node of the last level is a species with a
+    single accession. The default makes for 60'000 accessions.
+    """
+    db_dir.create()
+    # Build the tree level by level #
+    count, parents, level = 1, [0], [0]
+    for width in branching:
+        children = []
+        for parent in level:
+            children += list(range(count, count + width))
+            parents  += [parent] * width
+            count    += width
+        level = children
+    # Write the Newick file #
+    kids = [[] for _ in range(count)]
+    for node in range(1, count): kids[parents[node]].append(node)
+    def newick(node):
+        if not kids[node]: return str(node)
+        return '(' + ','.join(newick(k) for k in kids[node]) + ')%i' % node
+    with open(db_dir + 'custom.tre', 'wt') as handle:
+        handle.write(newick(0) + ';\n')
+    # Write the names and the map #
+    with open(db_dir + 'custom.names', 'wt') as handle:
+        for node in range(count):
+            handle.write('%i,Taxon %i,0.%i\n' % (node, node, 80 + node % 20))
+    with open(db_dir + 'custom.map', 'wt') as handle:
+        for node in level: handle.write('%i,ACC%08i\n' % (node, node))
+    with open(db_dir + 'custom.fasta', 'wt') as handle:
+        for node in level: handle.write('>ACC%08i\nACGT\n' % node)
+    # Return the accessions #
+    return ['ACC%08i' % node for node in level]
+
+def make_sequences(db_dir, accessions):
+    """Replace the sequences of the database with random ones."""
+    rand = random.Random(0)
+    sequences = {acc: ''.join(rand.choices('ACGT', k=400))
+                 for acc in accessions}
+    with open(db_dir + 'custom.fasta', 'wt') as handle:
+        for acc, seq in sequences.items():
+            handle.write('>%s\n%s\n' % (acc, seq))
+    return sequences
+
+def mutate(rand, sequence, count):
+    """Change `count` random positions of a sequence."""
+    sequence = list(sequence)
+    for i in rand.sample(range(len(sequence)), count):
+        sequence[i] = rand.choice('ACGT'.replace(sequence[i], ''))
+    return ''.join(sequence)
+
+def make_random_hits(path, accessions, names):
+    """
+    Write a hits file where queries have between zero and twenty hits with
+    scores that sometimes drop, and sometimes hit the same target twice.
+    """
+    with open(path, 'wt') as handle:
+        for name in names:
+            rand = random.Random(name)
+            handle.write('# BLASTN 2.11.0+\n# Query: %s\n' % name)
+            handle.write('# Database: custom\n# Fields: %s\n' % fields)
+            picks = rand.choices(accessions[:300], k=rand.randint(0, 20))
+            handle.write('# %i hits found\n' % len(picks))
+            score = rand.choice([150, 300, 600])
+            for acc in picks:
+                ident = rand.randint(240, 300)
+                handle.write('%s\t%s\t%i\t300\t%i\n' %
+                             (name, acc, score, ident))
+                score -= rand.choice([0, 0, 1, 5])
+        handle.write('# BLAST processed %i queries\n' % len(names))
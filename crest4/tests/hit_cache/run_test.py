@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `hit_cache` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.dereplicate import record_digest
+from crest4.sharding import read_records
+from crest4.hit_cache import HitCache, split_hits, render_hits, parse_size
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# The two sequences that have precomputed hits #
+server_dir = this_dir.directory + 'classify_server/'
+fasta      = server_dir + 'two_seqs.fasta'
+hits       = server_dir + 'precomputed.hits'
+
+###############################################################################
+def test_split_and_render():
+    # The titles of the sequences #
+    titles = {'Kocuria':     'Kocuria soli strain',
+              'Marmoricola': 'Marmoricola mangrovicus strain'}
+    # Splitting then rendering gives back the original file #
+    blocks = split_hits(hits)
+    assert list(blocks) == list(titles)
+    text = ''.join(render_hits(blocks[name], name, title)
+                   for name, title in titles.items())
+    text += '# BLAST processed 2 queries\n'
+    assert text == open(hits).read()
+    # The results can be given to another sequence #
+    copy = render_hits(blocks['Kocuria'], 'Other', 'Other strain')
+    assert '# Query: Other strain\n' in copy
+    assert 'Other\tXXXXXXXX\t2700\t1494\t1484\n' in copy
+
+def test_prune():
+    # Start from scratch #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    cache = HitCache(output_dir + 'cache.sqlite', max_size='1M')
+    key = ('fingerprint', 'blast', '{}')
+    # Add entries one after the other #
+    for i in range(10):
+        cache.put({b'%i' % i: 'x' * 1000}, key)
+    assert cache.stats()['entries'] == 10
+    # Only the most recent are kept #
+    assert cache.prune(max_size=parse_size('4K')) == 6
+    assert sorted(cache.get([b'%i' % i for i in range(10)], key)) == \
+           [b'6', b'7', b'8', b'9']
+    # A different key doesn't match #
+    assert cache.get([b'9'], ('other', 'blast', '{}')) == {}
+    cache.close()
+
+def test_cached_run():
+    # Start from scratch #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    cache_path = output_dir + 'cache.sqlite'
+    # A previous run searched these sequences #
+    c = Classify(fasta       = fasta,
+                 search_db   = this_dir.directory + 'custom_database/custom/',
+                 output_dir  = output_dir + 'crest4/',
+                 reuse_hits  = cache_path)
+    blocks  = split_hits(hits)
+    digests = [record_digest(text) for text, length in read_records(fasta)]
+    cache = HitCache(cache_path)
+    cache.put(dict(zip(digests, blocks.values())), c.hit_cache_key)
+    cache.close()
+    # So nothing needs to be searched this time #
+    assert open(c()).read() == 'Kocuria\tNode 1\nMarmoricola\tNode 1; Node 2\n'
+    assert open(c.search_hits).read() == open(hits).read()
+
+def test_cache_key():
+    # Copy a database so that we can change its sequences #
+    import shutil
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    shutil.copytree(str(this_dir.directory + 'custom_database/custom/'),
+                    str(output_dir + 'custom/'),
+                    ignore=shutil.ignore_patterns('*.cache', '*.lock'))
+    def key(**kwargs):
+        c = Classify(fasta      = fasta,
+                     search_db  = output_dir + 'custom/',
+                     output_dir = output_dir + 'crest4/',
+                     reuse_hits = output_dir + 'cache.sqlite',
+                     **kwargs)
+        return c.hit_cache_key
+    # Options that only change the speed don't change the key #
+    first = key(search_profile='fast')
+    assert key(search_profile='fast', num_threads=4) == first
+    assert key(search_profile='balanced') != first
+    # Changing a sequence in the middle of the database changes the key #
+    path  = output_dir + 'custom/custom.fasta'
+    lines = open(path).readlines()
+    middle = max(i for i in range(len(lines) // 2 + 1)
+                 if not lines[i].startswith('>'))
+    lines[middle] = lines[middle].replace('A', 'C', 1)
+    with open(path, 'wt') as handle: handle.writelines(lines)
+    assert key(search_profile='fast') != first
+
+###############################################################################
+if __name__ == '__main__':
+    test_split_and_render()
+    test_prune()
+    test_cached_run()
+    test_cache_key()
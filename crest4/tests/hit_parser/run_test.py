@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `hit_parser` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4.hits import parse_hits
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# The two sequences that have precomputed hits #
+hits = this_dir.directory + 'classify_server/precomputed.hits'
+
+###############################################################################
+def test_blast():
+    kocuria, marmoricola = parse_hits(open(hits), 'blast')
+    # The columns read #
+    assert kocuria.id == 'Kocuria'
+    assert kocuria.hit_ids == ['XXXXXXXX', 'YYYYYYYY']
+    assert kocuria.scores == [2700.0, 1000.0]
+    assert kocuria.similarity == 1484 / 1494
+    assert marmoricola.id == 'Marmoricola'
+    # A query without any hits is still reported #
+    lines = ['# BLASTN 2.11.0+\n', '# Query: empty sequence\n',
+             '# 0 hits found\n', '# BLAST processed 1 queries\n']
+    empty, = parse_hits(lines, 'blast')
+    assert empty.id == 'empty' and len(empty) == 0
+
+def test_vsearch():
+    # The identity is in the third column #
+    lines = ['a\tX\t99.0\t1\n', 'a\tY\t98.0\t1\n', 'a\tX\t97.0\t1\n',
+             'b\tZ\t96.0\t1\n']
+    a, b = parse_hits(lines, 'vsearch')
+    # Alignments on the same target are grouped together #
+    assert a.hit_ids == ['X', 'X', 'Y']
+    assert a.scores  == [0.99, 0.97, 0.98]
+    assert a.similarity == 0.99
+    assert b.id == 'b' and b.hit_ids == ['Z']
+
+###############################################################################
+if __name__ == '__main__':
+    test_blast()
+    test_vsearch()
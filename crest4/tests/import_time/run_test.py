@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `import_time` unittest.
+"""
+
+# Built-in modules #
+import os, sys, subprocess
+
+# Internal modules #
+import crest4
+
+# The most time that `import crest4` is allowed to take, in microseconds #
+budget = 100 * 1000
+
+# Dependencies that should only be loaded by the stage that uses them #
+heavy_modules = ('numpy', 'pandas', 'ete4', 'Bio', 'requests', 'seqsearch',
+                 'fasta', 'tqdm', 'rich', 'sh')
+
+###############################################################################
+def run_python(*args):
+    """Run a new python interpreter that can import this copy of crest4."""
+    package_dir = os.path.dirname(os.path.dirname(crest4.__file__))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_dir,
+                                                      env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable, *args], env=env, check=True,
+                          capture_output=True, text=True)
+
+def test_import_time():
+    # The report is written to stderr, one line per module #
+    stderr = run_python('-X', 'importtime', '-c', 'import crest4').stderr
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line: continue
+        self_time, cumulative, name = line[12:].split('|')
+        if not cumulative.strip().isdigit(): continue
+        timings[name.strip()] = int(cumulative)
+    # Check the budget #
+    assert timings['crest4'] < budget
+
+def test_no_heavy_imports():
+    # Everything needed to display `crest4 --help` #
+    code = "import sys, crest4.__main__;" \
+           "print(' '.join(m.split('.')[0] for m in sys.modules))"
+    loaded = set(run_python('-c', code).stdout.split())
+    # None of the heavy dependencies should be there #
+    assert not loaded & set(heavy_modules)
+
+###############################################################################
+if __name__ == '__main__':
+    test_import_time()
+    test_no_heavy_imports()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `kmer_search` unittest.
+"""
+
+# Built-in modules #
+import inspect, random
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.databases import CrestDatabase
+from crest4.kmer import KmerIndex, build_kmer_index, kmer_codes, encode
+from crest4.tests.helpers import make_database, make_sequences, mutate
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+
+###############################################################################
+def test_best_hits():
+    # Create the database #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    db = CrestDatabase(custom_path=output_dir + 'custom/')
+    index = db.kmer_db
+    assert len(index) == len(accessions)
+    # An identical sequence is found on both strands #
+    rand = random.Random(1)
+    for acc in rand.sample(accessions, 10):
+        for seq in (sequences[acc], reverse_complement(sequences[acc])):
+            ref, identity, shared = index.best_hits(seq)[0]
+            assert index.name(ref) == acc
+            assert identity == 1.0
+    # A few differences lower the identity but find the same sequence #
+    for acc in rand.sample(accessions, 10):
+        hits = index.best_hits(mutate(rand, sequences[acc], 4), 0.9)
+        assert index.name(hits[0][0]) == acc
+        assert 0.9 < hits[0][1] < 1.0
+    # Unrelated sequences have no hits above the minimum identity #
+    assert index.best_hits(''.join(rand.choices('ACGT', k=400)), 0.75) == []
+    # The index is loaded from the cache the second time #
+    copy = CrestDatabase(custom_path=output_dir + 'custom/').kmer_db
+    assert (copy.refs == index.refs).all()
+
+def test_common_words():
+    # Create a database where every sequence starts the same way #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand   = random.Random(3)
+    prefix = ''.join(rand.choices('ACGT', k=100))
+    fasta  = output_dir + 'custom/custom.fasta'
+    with open(fasta, 'wt') as handle:
+        for acc in accessions:
+            sequences[acc] = prefix + sequences[acc]
+            handle.write('>%s\n%s\n' % (acc, sequences[acc]))
+    # Building in chunks gives the same index #
+    whole  = build_kmer_index(fasta, max_postings=10)
+    chunks = build_kmer_index(fasta, max_postings=10, chunk_size=7)
+    assert all((whole[name] == chunks[name]).all() for name in whole)
+    # The words of the prefix are left out of the index #
+    assert set(kmer_codes(encode(prefix))) <= set(whole['common'])
+    assert not (whole['starts'][1:] - whole['starts'][:-1] > 10).any()
+    # Sequences are still found, ignoring the prefix #
+    index = KmerIndex(whole)
+    for acc in rand.sample(accessions, 10):
+        ref, identity, shared = index.best_hits(sequences[acc])[0]
+        assert index.name(ref) == acc
+        assert identity == 1.0
+        words = index.informative(kmer_codes(encode(sequences[acc])))
+        assert shared == len(words) < 500 - 12 + 1
+    # Only common words means no hits #
+    assert index.best_hits(prefix) == []
+
+def test_classify():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand  = random.Random(2)
+    picks = rand.sample(accessions, 20)
+    fasta = output_dir + 'queries.fasta'
+    with open(fasta, 'wt') as handle:
+        for acc in picks: handle.write('>%s\n%s\n' % (acc, sequences[acc]))
+        handle.write('>unrelated\n%s\n' % ''.join(rand.choices('ACGT', k=400)))
+    # Classify them #
+    c = Classify(fasta       = fasta,
+                 search_algo = 'kmer',
+                 search_db   = output_dir + 'custom/',
+                 output_dir  = output_dir + 'crest4/')
+    c()
+    # Every query is assigned to the species of its sequence #
+    for acc in picks:
+        query = c.queries_by_id[acc]
+        assert query.tax_string.endswith('; Taxon %i\n' % int(acc[3:]))
+    assert c.queries_by_id['unrelated'].assigned_node is False
+
+###############################################################################
+if __name__ == '__main__':
+    test_best_hits()
+    test_common_words()
+    test_classify()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `lca_engine` unittest.
+"""
+
+# Built-in modules #
+import inspect, itertools, random, glob
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4.databases import ssuome
+from crest4.compiled_tree import CompiledTree, parse_newick
+from crest4.lca import LCAEngine, build_sparse_table
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# Every tree that is shipped with the tests, not the ones they create #
+tree_paths = sorted(path for path in glob.glob(str(this_dir.directory) +
+                                               '/**/*.tre', recursive=True)
+                    if '/results/' not in path)
+
+###############################################################################
+def compare(ete, tree, engine, sets):
+    """Check that both methods agree on every given set of node names."""
+    # Avoid traversing the ete4 tree for every query #
+    by_name = {node.name: node for node in ete.traverse()}
+    for names in sets:
+        expected = ete.common_ancestor([by_name[n] for n in names]).name
+        got = engine.common_ancestor([tree.index(n) for n in names])
+        assert tree.name(got) == expected
+
+###############################################################################
+def test_shipped_trees():
+    from ete4 import Tree
+    # The nested tree and the two of the custom databases #
+    assert len(tree_paths) == 3
+    for path in tree_paths:
+        # Load the tree in both ways #
+        ete    = Tree(str(path), parser=8)
+        tree   = CompiledTree(parse_newick(path))
+        engine = LCAEngine(tree, build_sparse_table(tree.depth))
+        # Every pair and every triplet of nodes #
+        names = [node.name for node in ete.traverse()]
+        sets  = itertools.chain(itertools.product(names, repeat=2),
+                                itertools.combinations(names, 3))
+        compare(ete, tree, engine, sets)
+
+def test_default_database():
+    # Make sure the database is available #
+    if not ssuome.downloaded: ssuome.download()
+    # Pick random sets of nodes of various sizes #
+    names = ssuome.compiled_tree.names.tolist()
+    rng   = random.Random(0)
+    sets  = [rng.sample(names, rng.randint(1, 100)) for _ in range(200)]
+    compare(ssuome.tree, ssuome.compiled_tree, ssuome.lca, sets)
+
+###############################################################################
+if __name__ == '__main__':
+    test_shipped_trees()
+    test_default_database()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `multi_sample` unittest.
+"""
+
+# Built-in modules #
+import inspect, random, gzip
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.samples import classify_samples
+from crest4.tests.helpers import make_database, make_sequences
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_samples(output_dir):
+    """
+    Write three samples that share most of their sequences, under
+    different names, one of them gzipped, and an OTU table for the first.
+    """
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand = random.Random(5)
+    common = rand.sample(accessions, 10)
+    samples_dir = output_dir + 'samples/'
+    samples_dir.create()
+    for i, name in enumerate(('lake_1.fasta', 'lake_2.fa', 'lake_3.fna.gz')):
+        picks  = common + rand.sample(accessions, 3)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(samples_dir + name, 'wt') as handle:
+            for j, acc in enumerate(picks):
+                handle.write('>s%i_%i\n%s\n' % (i, j, sequences[acc]))
+            handle.write('>s%i_other\n%s\n' %
+                         (i, ''.join(rand.choices('ACGT', k=400))))
+    # The OTU table of the first sample #
+    tables_dir = output_dir + 'tables/'
+    tables_dir.create()
+    with open(tables_dir + 'lake_1.tsv', 'wt') as handle:
+        handle.write('otu\tjan\tfeb\n')
+        for j in range(13): handle.write('s0_%i\t%i\t%i\n' % (j, j, 2 * j))
+        handle.write('s0_other\t1\t1\n')
+    return samples_dir, tables_dir
+
+def test_same_as_alone():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    samples_dir, tables_dir = make_samples(output_dir)
+    # All samples at once #
+    paths = classify_samples(fasta       = samples_dir,
+                             output_dir  = output_dir + 'batch/',
+                             otu_table   = tables_dir,
+                             num_workers = 2,
+                             search_algo = 'kmer',
+                             search_db   = output_dir + 'custom/')
+    assert [Path(p).directory.name for p in paths] == \
+           ['lake_1', 'lake_2', 'lake_3']
+    # Only the distinct sequences were searched #
+    pooled = output_dir + 'batch/pooled/pooled.fasta'
+    assert sum(1 for line in open(pooled) if line.startswith('>')) < 3 * 14
+    # Every sample on its own #
+    for path, sample in zip(paths, sorted(samples_dir.flat_files)):
+        c = Classify(fasta       = sample,
+                     search_algo = 'kmer',
+                     search_db   = output_dir + 'custom/',
+                     output_dir  = output_dir + 'alone/' + sample.prefix,
+                     otu_table   = tables_dir + 'lake_1.tsv'
+                                   if 'lake_1' in sample else None)
+        c()
+        assert Path(path).contents == c.out_file.contents
+    # The OTU outputs are the same too #
+    alone = (output_dir + 'alone/lake_1/otus_by_rank.tsv').contents
+    batch = (output_dir + 'batch/lake_1/otus_by_rank.tsv').contents
+    assert alone == batch
+
+def test_glob():
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    samples_dir, tables_dir = make_samples(output_dir)
+    paths = classify_samples(fasta       = str(samples_dir) + 'lake_[12].*',
+                             search_algo = 'kmer',
+                             search_db   = output_dir + 'custom/')
+    assert [Path(p).directory.name for p in paths] == ['lake_1', 'lake_2']
+    assert paths[0].startswith(samples_dir + 'crest4_samples/')
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_as_alone()
+    test_glob()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `node_tables` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4.databases import CrestDatabase
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_database(newick, missing=()):
+    """
+    Write a small database with the given tree to a temporary location,
+    where every node gets a name and a similarity in the `.names` file,
+    except for the ones listed in `missing`. Return the database.
+    """
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    db_dir = output_dir + 'custom/'
+    db_dir.create()
+    with open(db_dir + 'custom.tre', 'wt') as handle: handle.write(newick)
+    from crest4.compiled_tree import parse_newick
+    names = parse_newick(db_dir + 'custom.tre')['names'].tolist()
+    with open(db_dir + 'custom.names', 'wt') as handle:
+        for i, name in enumerate(names):
+            if name in missing: continue
+            handle.write('%s,Taxon %s,%.2f\n' % (name, name, i / len(names)))
+    return CrestDatabase(custom_path=db_dir)
+
+###############################################################################
+def test_same_as_dict():
+    # A tree with branches as well as a chain deeper than the last rank #
+    chain = '(' * 14 + ')'.join(str(i) for i in range(30, 44)) + ')'
+    db = make_database('((4,5)3,(7,%s)6,9)0;' % chain)
+    tree, tables = db.compiled_tree, db.node_tables
+    for node in range(len(tree)):
+        # The lineage is the names of all ancestors starting at the root #
+        path  = [node] + list(tree.ancestors(node))
+        names = [db.node_to_name[tree.name(n)][0] for n in reversed(path)]
+        assert tables.lineage(node) == '; '.join(names)
+        assert tables.name(node) == names[-1]
+        # The similarity threshold and the rank #
+        frac = float(db.node_to_name[tree.name(node)][1])
+        assert tables.smlrty[node] == frac
+        assert tables.rank[node] == min(len(path) - 1, 11)
+    # The same string object is returned every time #
+    assert tables.lineage(5) is tables.lineage(5)
+    # The cache file was created and is reused #
+    again = CrestDatabase(custom_path=db.path.directory)
+    assert again.node_tables.lineage(5) == tables.lineage(5)
+
+def test_missing_names():
+    db = make_database('((4,5)3,6)0;', missing=['5'])
+    tables = db.node_tables
+    assert tables.lineage(2) == 'Taxon 0; Taxon 3; Taxon 4'
+    with pytest.raises(LookupError): tables.lineage(3)
+    with pytest.raises(LookupError): tables.name(3)
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_as_dict()
+    test_missing_names()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `progressive_output` unittest.
+"""
+
+# Built-in modules #
+import inspect, threading, time
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.streaming import follow, hit_blocks, in_order
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# The two sequences that have precomputed hits #
+server_dir = this_dir.directory + 'classify_server/'
+fasta      = server_dir + 'two_seqs.fasta'
+hits       = server_dir + 'precomputed.hits'
+
+###############################################################################
+def test_follow():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    path = output_dir + 'growing.txt'
+    # Another thread writes the file slowly, sometimes half a line #
+    def write():
+        with open(path, 'wt') as handle:
+            for chunk in ('first\nsec', 'ond\n', 'third'):
+                handle.write(chunk)
+                handle.flush()
+                time.sleep(0.1)
+    writer = threading.Thread(target=write)
+    writer.start()
+    lines = list(follow(path, writer.is_alive, interval=0.01))
+    assert lines == ['first\n', 'second\n', 'third']
+
+def test_hit_blocks():
+    # BLAST blocks start with comments #
+    blocks = list(hit_blocks(open(hits)))
+    assert len(blocks) == 2
+    assert blocks[0].startswith('# BLASTN') and '\nKocuria\t' in blocks[0]
+    assert blocks[1].startswith('# BLASTN') and 'Marmoricola\t' in blocks[1]
+    assert ''.join(blocks) + '# BLAST processed 2 queries\n' == \
+           open(hits).read()
+    # VSEARCH blocks are only separated by the change of name #
+    lines = ['a\tX\t99.0\n', 'a\tY\t98.0\n', 'b\tX\t97.0\n']
+    assert list(hit_blocks(lines)) == [''.join(lines[:2]), lines[2]]
+
+def test_in_order():
+    # A minimal object with a name #
+    query = lambda name: type('Fake', (), {'name': name})
+    # The results of 'b' arrive before those of 'a', and 'c' never does #
+    order = {'a': 'a', 'b': 'b', 'a2': 'a', 'c': 'c'}
+    result = in_order(map(query, ['b', 'a']), order, query)
+    assert [(seq_id, q.name) for seq_id, q in result] == \
+           [('a', 'a'), ('b', 'b'), ('a2', 'a'), ('c', 'c')]
+
+def test_progressive_run():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    # The same results are obtained #
+    c = Classify(fasta       = fasta,
+                 search_hits = hits,
+                 search_db   = this_dir.directory + 'custom_database/custom/',
+                 output_dir  = output_dir,
+                 progressive = 'True')
+    assert c.progressive is True
+    assert open(c()).read() == 'Kocuria\tNode 1\nMarmoricola\tNode 1; Node 2\n'
+
+###############################################################################
+if __name__ == '__main__':
+    test_follow()
+    test_hit_blocks()
+    test_in_order()
+    test_progressive_run()
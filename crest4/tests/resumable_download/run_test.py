@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `resumable_download` unittest.
+"""
+
+# Built-in modules #
+import inspect, io, os, hashlib, tarfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4.databases import CrestDatabase
+from crest4.download import download_and_extract
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serves the same file for every URL. Supports range requests unless
+    told otherwise, and can cut the connection after a number of bytes.
+    """
+
+    # Class attributes changed by the tests #
+    content       = b''
+    support_range = True
+    cut_after     = None
+    requests      = []
+
+    def log_message(self, *args): pass
+
+    def do_GET(self):
+        # Remember what was requested #
+        header = self.headers.get('Range')
+        self.requests.append(header)
+        # Parse the range #
+        start = 0
+        if header and self.support_range:
+            start = int(header.split('=')[1].rstrip('-'))
+        # Send headers #
+        body = self.content[start:]
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        # Only send part of the body the first time if requested #
+        cut = self.__class__.cut_after
+        if cut is not None:
+            self.__class__.cut_after = None
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+def make_tarball():
+    """Put the custom database in a compressed archive in memory."""
+    buffer = io.BytesIO()
+    source = this_dir.directory + 'custom_database/custom/'
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name in sorted(os.listdir(source)):
+            if name.startswith('.'): continue
+            extension = name.split('.')[-1]
+            archive.add(source + name, arcname='served/served.' + extension)
+        # Make it large enough to be read in several pieces #
+        padding = tarfile.TarInfo('served/padding.bin')
+        padding.size = 3 * 1024 * 1024
+        archive.addfile(padding, io.BytesIO(os.urandom(padding.size)))
+    return buffer.getvalue()
+
+@pytest.fixture
+def server():
+    """Start a local HTTP server and return its URL."""
+    Handler.content       = make_tarball()
+    Handler.support_range = True
+    Handler.cut_after     = None
+    Handler.requests      = []
+    httpd  = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%i/served.tar.gz' % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+def fresh_dir():
+    """An empty directory to download to."""
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    return output_dir
+
+###############################################################################
+def test_download(server):
+    base_dir = fresh_dir()
+    checksum = hashlib.sha256(Handler.content).hexdigest()
+    # Use the same method as for the built-in databases #
+    db = CrestDatabase(name='served', desc='Served', base_dir=base_dir)
+    assert not db.downloaded
+    db.download(url=server, sha256=checksum)
+    assert db.downloaded
+    assert db.compiled_tree.name(0) == '1'
+    # Nothing else is left behind, except the lock file #
+    assert sorted(os.listdir(base_dir)) == ['served', 'served.tar.gz.lock']
+
+def test_resume(server):
+    base_dir = fresh_dir()
+    spool = base_dir + 'served.tar.gz.part'
+    # A previous attempt got interrupted #
+    with open(spool, 'wb') as handle: handle.write(Handler.content[:50000])
+    # The connection is also cut once in the middle #
+    Handler.cut_after = 1000000
+    checksum = download_and_extract(server, base_dir, spool)
+    assert checksum == hashlib.sha256(Handler.content).hexdigest()
+    first, second = Handler.requests
+    assert first == 'bytes=50000-'
+    assert 50000 < int(second.split('=')[1].rstrip('-')) <= 1050000
+    assert os.path.exists(base_dir + 'served/served.tre')
+    assert not os.path.exists(spool)
+
+def test_no_range_support(server):
+    base_dir = fresh_dir()
+    spool = base_dir + 'served.tar.gz.part'
+    with open(spool, 'wb') as handle: handle.write(Handler.content[:50000])
+    # The server sends everything again, so what we have is skipped #
+    Handler.support_range = False
+    checksum = download_and_extract(server, base_dir, spool)
+    assert checksum == hashlib.sha256(Handler.content).hexdigest()
+    assert os.path.exists(base_dir + 'served/served.tre')
+
+def test_bad_checksum(server):
+    base_dir = fresh_dir()
+    spool = base_dir + 'served.tar.gz.part'
+    with pytest.raises(ValueError):
+        download_and_extract(server, base_dir, spool, sha256='0' * 64)
+    # Nothing was put in place #
+    assert os.listdir(base_dir) == []
+
+###############################################################################
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `resumed_search` unittest.
+"""
+
+# Built-in modules #
+import inspect, random, shutil
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.checkpoint import completed_part, append_hits
+from crest4.tests.helpers import make_database, make_sequences, mutate
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+# The two sequences that have precomputed hits #
+server_dir = this_dir.directory + 'classify_server/'
+fasta      = server_dir + 'two_seqs.fasta'
+hits       = server_dir + 'precomputed.hits'
+
+###############################################################################
+def test_completed_part():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    text = open(hits).read()
+    second = text.index('# BLASTN', 1)
+    # A finished search #
+    footer = text.index('# BLAST processed')
+    assert completed_part(hits) == (['Kocuria', 'Marmoricola'], footer, True)
+    # A search interrupted in the middle of the second sequence #
+    partial = output_dir + 'partial.hits'
+    with open(partial, 'wt') as handle: handle.write(text[:second + 200])
+    assert completed_part(partial) == (['Kocuria'], second, False)
+    # The results of the second one are added back #
+    rest = output_dir + 'rest.hits'
+    text_rest = text[second:].replace('processed 2', 'processed 1')
+    with open(rest, 'wt') as handle: handle.write(text_rest)
+    append_hits(partial, second, 1, rest)
+    assert open(partial).read() == text
+
+def test_keep_finished():
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    output_dir.create()
+    # The previous run had already finished #
+    shutil.copy(hits, output_dir + 'search.hits')
+    c = Classify(fasta        = fasta,
+                 search_db    = this_dir.directory + 'custom_database/custom/',
+                 output_dir   = output_dir,
+                 keep_partial = True)
+    # So nothing needs to be searched this time #
+    assert open(c()).read() == 'Kocuria\tNode 1\nMarmoricola\tNode 1; Node 2\n'
+    assert open(c.search_hits).read() == open(hits).read()
+
+def test_keep_finished_kmer(capsys):
+    # Create the database and the inputs, one of them without any hits #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand  = random.Random(4)
+    query = output_dir + 'queries.fasta'
+    with open(query, 'wt') as handle:
+        for acc in rand.sample(accessions, 10):
+            handle.write('>%s\n%s\n' % (acc, mutate(rand, sequences[acc], 4)))
+        handle.write('>unrelated\n%s\n' % ''.join(rand.choices('ACGT', k=400)))
+    # A first run that finishes #
+    def classify():
+        c = Classify(fasta        = query,
+                     search_algo  = 'kmer',
+                     search_db    = output_dir + 'custom/',
+                     output_dir   = output_dir + 'crest4/',
+                     keep_partial = True)
+        return c, open(c()).read()
+    first, assignments = classify()
+    hits = open(first.search_hits).read()
+    assert first.search_done.exists
+    capsys.readouterr()
+    # The next run searches nothing again, not even the last sequence
+    # reported or the one without hits #
+    second, again = classify()
+    assert again == assignments
+    assert open(second.search_hits).read() == hits
+    assert 'Resuming' not in capsys.readouterr().out
+
+###############################################################################
+if __name__ == '__main__':
+    test_completed_part()
+    test_keep_finished()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `screened_search` unittest.
+"""
+
+# Built-in modules #
+import inspect, random
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.query import Query, Assignment
+from crest4.tests.helpers import make_database, make_sequences, mutate, \
+                                 fields
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_inputs(output_dir):
+    """
+    Write a FASTA file where some sequences are identical to a reference,
+    and others are either unrelated or too different from their closest
+    reference. Also write BLAST results where every sequence hits the
+    first accession, as if BLAST had been run on all of them.
+    """
+    accessions = make_database(output_dir + 'custom/', (3, 4, 5))
+    sequences  = make_sequences(output_dir + 'custom/', accessions)
+    rand = random.Random(3)
+    # The species whose minimum similarity is 0.95 or more #
+    strict = [acc for acc in accessions if int(acc[3:]) % 20 >= 15]
+    queries = {}
+    for acc in rand.sample(accessions, 5):
+        queries['same_' + acc] = sequences[acc]
+    for acc in rand.sample(strict, 3):
+        queries['far_' + acc] = mutate(rand, sequences[acc], 40)
+    for i in range(3):
+        queries['other_%i' % i] = ''.join(rand.choices('ACGT', k=400))
+    names = list(queries)
+    rand.shuffle(names)
+    with open(output_dir + 'queries.fasta', 'wt') as handle:
+        for name in names: handle.write('>%s\n%s\n' % (name, queries[name]))
+    with open(output_dir + 'blast.hits', 'wt') as handle:
+        for name in names:
+            handle.write('# BLASTN 2.11.0+\n# Query: %s\n' % name)
+            handle.write('# Database: custom\n# Fields: %s\n' % fields)
+            handle.write('# 1 hits found\n')
+            handle.write('%s\t%s\t500\t300\t300\n' % (name, accessions[0]))
+        handle.write('# BLAST processed %i queries\n' % len(names))
+    return names, accessions
+
+def test_screening():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    names, accessions = make_inputs(output_dir)
+    blast = 'Taxon %i\n' % int(accessions[0][3:])
+    # Classify with the results of BLAST after screening #
+    outputs = []
+    for progressive in (False, True):
+        c = Classify(fasta       = output_dir + 'queries.fasta',
+                     search_hits = output_dir + 'blast.hits',
+                     search_db   = output_dir + 'custom/',
+                     output_dir  = output_dir + 'crest4/',
+                     screen_with = 'kmer',
+                     progressive = progressive)
+        c()
+        outputs.append(c.out_file.contents)
+    # Only the identical sequences were assigned by the screening #
+    assert set(c.screened) == set(n for n in names if n.startswith('same'))
+    for line in outputs[0].splitlines(True):
+        name, lineage = line.split('\t')
+        if name.startswith('same'):
+            assert lineage.endswith('Taxon %i\n' % int(name[8:]))
+        else:
+            assert lineage.endswith(blast)
+    # In the order of the FASTA file, also when progressive #
+    assert [line.split('\t')[0] for line in outputs[0].splitlines()] == names
+    assert outputs[0] == outputs[1]
+    # The queries still hold their search results unless released #
+    queries = c.parse_queries()
+    assert all(isinstance(query, Query) for query in queries)
+    assert all(len(query.query) for query in queries
+               if query.name.startswith('same'))
+    released = c.parse_queries(release=True)
+    assert all(isinstance(query, Assignment) for query in released)
+    assert [q.tax_string for q in queries] == \
+           [q.tax_string for q in released]
+    # Only the others would be searched #
+    searched = c.fasta_to_search()
+    assert [seq.id for seq in searched] == \
+           [name for name in names if not name.startswith('same')]
+
+###############################################################################
+if __name__ == '__main__':
+    test_screening()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `search_profiles` unittest.
+"""
+
+# Built-in modules #
+import inspect
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4 import Classify
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make(**kwargs):
+    db_dir = this_dir.directory + 'custom_database/custom/'
+    fasta  = this_dir.directory + 'custom_database/two_seqs.fasta'
+    return Classify(fasta      = fasta,
+                    search_db  = db_dir,
+                    output_dir = this_dir + 'results/',
+                    **kwargs)
+
+def test_params():
+    # The balanced profile keeps the options used so far #
+    blast = make().search_params
+    assert blast == {'-outfmt': '7 qseqid sseqid bitscore length nident'}
+    vsearch = make(search_algo='vsearch').search_params
+    assert vsearch == {'--id': 0.75, '--mincols': 25}
+    # The other profiles add to them #
+    fast = make(search_profile='fast', num_threads=4).search_params
+    assert fast['-word_size'] == 32 and fast['-mt_mode'] == 1
+    fast = make(search_profile='fast').search_params
+    assert '-mt_mode' not in fast
+    sensitive = make(search_algo='vsearch', search_profile='sensitive')
+    assert sensitive.search_params['--maxrejects'] == 256
+    # Results of different profiles are not mixed in the hit cache #
+    keys = set(make(search_profile=p).hit_cache_key
+               for p in ('fast', 'balanced', 'sensitive'))
+    assert len(keys) == 3
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match='profile'):
+        make(search_profile='fastest')
+
+###############################################################################
+if __name__ == '__main__':
+    test_params()
+    test_unknown_profile()
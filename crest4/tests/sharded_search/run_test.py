@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `sharded_search` unittest.
+"""
+
+# Built-in modules #
+import inspect, os
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.sharding import read_records, split_fasta, merge_hits
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def test_split_fasta():
+    # The input fasta with a hundred sequences #
+    fasta = this_dir.directory + 'gio_hundred_seqs/gio.fasta'
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    # Split #
+    parts = split_fasta(fasta, 7, output_dir)
+    assert len(parts) == 7
+    # Nothing is lost and the order is kept #
+    joined = ''.join(open(part).read() for part in parts)
+    assert joined == open(fasta).read()
+    # The shards have about the same total length #
+    totals = [sum(length for text, length in read_records(part))
+              for part in parts]
+    assert max(totals) < 1.5 * min(totals)
+
+def test_merge_hits():
+    # The inputs #
+    fasta = this_dir.directory + 'precomputed_hits/two_seqs.fasta'
+    hits  = this_dir.directory + 'precomputed_hits/precomputed.hits'
+    # The output directory #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    # One sequence per shard #
+    parts = split_fasta(fasta, 2, output_dir)
+    assert len(parts) == 2
+    # Write what BLAST would have produced for each shard #
+    text = open(hits).read()
+    body = text[:text.index('# BLAST processed')]
+    first, second = body.split('# BLASTN')[1:]
+    for part, result in zip(parts, (first, second)):
+        with open(part + '.hits', 'wt') as handle:
+            handle.write('# BLASTN' + result)
+            handle.write('# BLAST processed 1 queries\n')
+    # Merging gives back the result of a single search #
+    merged = merge_hits([part + '.hits' for part in parts],
+                        output_dir + 'search.hits')
+    assert open(merged).read() == text
+
+def test_num_shards():
+    fasta = this_dir.directory + 'precomputed_hits/two_seqs.fasta'
+    # The default is based on the number of threads #
+    c = Classify(fasta, num_threads=2, num_shards='True',
+                 output_dir=this_dir + 'results/')
+    assert c.num_shards == max(1, os.cpu_count() // 2)
+    # From the command line everything is a string #
+    c = Classify(fasta, num_shards='3', output_dir=this_dir + 'results/')
+    assert c.num_shards == 3
+
+###############################################################################
+if __name__ == '__main__':
+    test_split_fasta()
+    test_merge_hits()
+    test_num_shards()
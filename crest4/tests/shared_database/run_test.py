@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `shared_database` unittest.
+"""
+
+# Built-in modules #
+import inspect, os, pickle, random, multiprocessing
+
+# First party modules #
+from autopaths import Path
+
+# Third party modules #
+import pytest
+
+# Internal modules #
+from crest4 import Classify
+from crest4.databases import CrestDatabase
+from crest4.tests.helpers import make_database, fields
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def make_hits(path, accessions, names):
+    """Write a hits file with a few random hits per query."""
+    with open(path, 'wt') as handle:
+        for name in names:
+            rand = random.Random(name)
+            handle.write('# BLASTN 2.11.0+\n# Query: %s\n' % name)
+            handle.write('# Database: custom\n# Fields: %s\n' % fields)
+            picks = rand.sample(accessions, rand.randint(1, 5))
+            handle.write('# %i hits found\n' % len(picks))
+            for acc in picks:
+                ident = rand.randint(200, 300)
+                handle.write('%s\t%s\t500\t300\t%i\n' % (name, acc, ident))
+        handle.write('# BLAST processed %i queries\n' % len(names))
+
+def private_memory():
+    """
+    The amount of memory in kilobytes that belongs to this process only.
+    Pages of memory-mapped files are not counted, as they are shared.
+    """
+    with open('/proc/self/smaps_rollup') as handle:
+        lines = [line.split() for line in handle]
+    return sum(int(l[1]) for l in lines if l[0] == 'Anonymous:')
+
+def assign(db, fasta, hits, output_dir):
+    """
+    Run in a worker. Return the assignments and the growth in private
+    memory caused by the classification, then by loading the tree and
+    dictionaries like before.
+    """
+    # Make sure the heavy modules are imported before measuring #
+    import ete4, Bio.SearchIO, seqsearch.search
+    before = private_memory()
+    # Classify with the database received from the parent #
+    c = Classify(fasta, search_db=db, search_hits=hits, output_dir=output_dir)
+    result = [query.tax_string for query in c.queries]
+    shared = private_memory() - before
+    # Now load what used to be loaded in every process #
+    db.tree, db.node_to_name, db.acc_to_node
+    loaded = private_memory() - before - shared
+    # Return #
+    return result, shared, loaded
+
+###############################################################################
+def test_pickling():
+    db = CrestDatabase(custom_path=this_dir.directory + 'custom_database/custom/')
+    db.node_tables
+    copy = pickle.loads(pickle.dumps(db))
+    assert copy.path == db.path
+    assert copy.downloaded is True
+    assert '__cache__' not in copy.__dict__ or \
+           list(copy.__cache__) == ['downloaded']
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'),
+                    reason="Measuring memory requires Linux.")
+def test_workers():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/')
+    names = ['query_%i' % i for i in range(300)]
+    fasta = output_dir + 'queries.fasta'
+    with open(fasta, 'wt') as handle:
+        # Every query has a different sequence #
+        for i, name in enumerate(names):
+            bases = ''.join('ACGT'[i >> (2 * j) & 3] for j in range(5))
+            handle.write('>%s\nACGT%s\n' % (name, bases))
+    chunks = [names[i::3] for i in range(3)]
+    for i, chunk in enumerate(chunks):
+        make_hits(output_dir + 'chunk_%i.hits' % i, accessions, chunk)
+    make_hits(output_dir + 'all.hits', accessions, sum(chunks, []))
+    # Load the database once in the parent #
+    db = CrestDatabase(custom_path=output_dir + 'custom/').preload()
+    # The reference result in a single process #
+    expected = Classify(fasta, search_db=db,
+                        search_hits=output_dir + 'all.hits',
+                        output_dir=output_dir + 'all/').queries
+    expected = [query.tax_string for query in expected]
+    # Start workers that receive the database by pickling #
+    args = [(db, fasta, output_dir + 'chunk_%i.hits' % i,
+             output_dir + 'chunk_%i/' % i) for i in range(3)]
+    context = multiprocessing.get_context('fork')
+    with context.Pool(3) as pool: results = pool.starmap(assign, args)
+    # The assignments are identical #
+    assert sum((result for result, _, _ in results), []) == expected
+    # Each worker used much less memory than loading everything #
+    for result, shared, loaded in results:
+        assert shared * 10 < loaded
+
+###############################################################################
+if __name__ == '__main__':
+    test_pickling()
+    test_workers()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to run the `slim_queries` unittest.
+"""
+
+# Built-in modules #
+import inspect, pickle
+
+# First party modules #
+from autopaths import Path
+
+# Internal modules #
+from crest4 import Classify
+from crest4.query import Query, Assignment
+from crest4.tests.helpers import make_database, make_random_hits
+
+# Get the current directory of this python script #
+this_file = Path((inspect.stack()[0])[1])
+this_dir  = this_file.directory
+
+###############################################################################
+def test_same_assignments():
+    # Create the database and the inputs #
+    output_dir = this_dir + 'results/'
+    output_dir.remove()
+    accessions = make_database(output_dir + 'custom/')
+    names = ['query_%i' % i for i in range(200)]
+    fasta = output_dir + 'queries.fasta'
+    with open(fasta, 'wt') as handle:
+        for name in names: handle.write('>%s\nACGT\n' % name)
+    hits = output_dir + 'queries.hits'
+    make_random_hits(hits, accessions, names)
+    for bulk in (False, True):
+        c = Classify(fasta       = fasta,
+                     search_hits = hits,
+                     search_db   = output_dir + 'custom/',
+                     output_dir  = output_dir + 'crest4/',
+                     bulk_assign = bulk)
+        full = c.parse_queries()
+        slim = c.queries
+        assert all(isinstance(query, Query) for query in full)
+        assert all(isinstance(query, Assignment) for query in slim)
+        # Nothing else is kept #
+        assert not hasattr(slim[0], '__dict__')
+        assert not hasattr(slim[0], 'query')
+        # The same results #
+        for a, b in zip(full, slim):
+            assert a.name          == b.name
+            assert a.assigned_node == b.assigned_node
+            assert a.tax_string    == b.tax_string
+            assert a.taxonomy      == b.taxonomy
+            assert a.rank          == b.rank
+        # Sequences assigned to the same node share their lineage #
+        by_lineage = {}
+        for query in slim:
+            first = by_lineage.setdefault(query.lineage, query)
+            assert query.lineage is first.lineage
+        # Identical sequences under another name #
+        copy = slim[0].renamed('copy')
+        assert copy.tax_string == 'copy\t' + slim[0].lineage + '\n'
+        # They can be sent to other processes #
+        again = pickle.loads(pickle.dumps(slim[:5]))
+        assert [q.tax_string for q in again] == \
+               [q.tax_string for q in slim[:5]]
+
+###############################################################################
+if __name__ == '__main__':
+    test_same_assignments()